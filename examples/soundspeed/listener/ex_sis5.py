@@ -1,6 +1,7 @@
 import time
 import logging
 
+from hyo2.soundspeed.listener.host import ListenerHost
 from hyo2.soundspeed.listener.sis.sis5 import Sis5
 
 logging.basicConfig(level=logging.DEBUG)
@@ -11,19 +12,16 @@ listen_port = 6020
 datagrams = [b'#MRZ', b'#SPO', b'#SVP']
 
 sis5 = Sis5(ip=listen_ip, port=listen_port, datagrams=datagrams, timeout=10)
+host = ListenerHost()
 
-if not sis5.is_alive():
-    sis5.start()
-
-    time.sleep(0.1)
+if host.add(sis5):
     logger.debug("start")
 
 time.sleep(100)
 
-if sis5.is_alive():
-    sis5.stop()
-    sis5.join(2)
-    logger.debug("stop")
-
+host.remove(sis5)
+host.stop()
+logger.debug("stop")
 
-logger.debug("STOP: %s" % sis5.is_alive())
+logger.debug("STOP: %s" % host.is_listening(sis5))
+logger.debug("%s" % sis5)
@@ -1,7 +1,9 @@
 from abc import ABCMeta, abstractmethod
 from datetime import datetime as dt, date
 import logging
-from typing import Optional, Union
+from typing import List, Optional, Union
+
+import numpy as np
 
 from hyo2.soundspeed.base.geodesy import Geodesy
 from hyo2.soundspeed.profile.profilelist import ProfileList
@@ -18,6 +20,7 @@ class AbstractAtlas(metaclass=ABCMeta):
         self.data_folder = data_folder
         self.prj = prj
         self.g = Geodesy()
+        self.skip_failed_queries = False  # in query_many, a failed query only results in None
 
     @abstractmethod
     def is_present(self) -> bool:
@@ -32,6 +35,73 @@ class AbstractAtlas(metaclass=ABCMeta):
     def download_db(self) -> bool:
         pass
 
+    def query_many(self, points: List[tuple], server_mode: bool = False) -> List[Optional[ProfileList]]:
+        """Query the atlas for many (lat, lon, datestamp) points
+
+        The points are grouped by the atlas grid that they use (see '_query_group'), and the points of each group
+        are queried at once (see '_query_points'). The results are in the order of the passed points, with None for
+        the points without data.
+        """
+        results = [None] * len(points)
+
+        groups = dict()
+        for i, (lat, lon, datestamp) in enumerate(points):
+            if datestamp is None:
+                datestamp = dt.utcnow()
+            if isinstance(datestamp, dt):
+                datestamp = datestamp.date()
+            if not isinstance(datestamp, date):
+                logger.warning("invalid date passed: %s" % type(datestamp))
+                continue
+            groups.setdefault(self._query_group(datestamp), list()).append((i, (lat, lon, datestamp)))
+
+        for key in sorted(groups):
+            idxs, group_points = zip(*groups[key])
+            for i, profiles in zip(idxs, self._query_points(list(group_points), server_mode=server_mode)):
+                results[i] = profiles
+
+        return results
+
+    def _query_group(self, datestamp: date) -> object:
+        """Return the key of the atlas grid used for the passed date (by default, a daily grid)"""
+        return datestamp
+
+    def _query_points(self, points: List[tuple], server_mode: bool = False) -> List[Optional[ProfileList]]:
+        """Query the (lat, lon, date) points of a group, by default one by one
+
+        With 'skip_failed_queries' (e.g., for the atlases with remote data), a failed query results in None instead
+        of stopping the queries.
+        """
+        results = list()
+        for lat, lon, datestamp in points:
+            if not self.skip_failed_queries:
+                results.append(self.query(lat=lat, lon=lon, datestamp=datestamp, server_mode=server_mode))
+                continue
+
+            # noinspection PyBroadException
+            try:
+                results.append(self.query(lat=lat, lon=lon, datestamp=datestamp, server_mode=server_mode))
+            except Exception as e:
+                logger.warning("unable to retrieve %s data: %s" % (self.name, e))
+                results.append(None)
+        return results
+
+    @classmethod
+    def _nearest_valid(cls, dists: np.ndarray, valid: np.ndarray) -> tuple:
+        """For each level (row of valid), return the index of the nearest cell with valid values and a found flag
+
+        The arrays can be stacked for many points: (points x) cells for dists, and (points x) levels x cells for valid.
+        """
+        masked = np.where(valid, dists[..., np.newaxis, :], np.inf)
+        nearest = np.argmin(masked, axis=-1)
+        found = np.isfinite(cls._at_nearest(masked, nearest))
+        return nearest, found
+
+    @classmethod
+    def _at_nearest(cls, profiles: np.ndarray, nearest: np.ndarray) -> np.ndarray:
+        """Return the values of the (points x) levels x cells profiles at the passed nearest cells"""
+        return np.take_along_axis(profiles, nearest[..., np.newaxis], axis=-1)[..., 0]
+
     def __repr__(self) -> str:
         msg = "  <%s>\n" % self.__class__.__name__
         msg += "      <desc: %s>\n" % self.desc
@@ -1,5 +1,6 @@
 from datetime import datetime as dt, date, timedelta
 from http import client
+import os
 from urllib import parse
 import socket
 import logging
@@ -11,6 +12,9 @@ import numpy as np
 from hyo2.abc.lib.progress.cli_progress import CliProgress
 
 from hyo2.soundspeed.atlas.abstract import AbstractAtlas
+from hyo2.soundspeed.atlas.gridcache import GridCache
+from hyo2.soundspeed.atlas.gridindex import GridIndex
+from hyo2.soundspeed.atlas.prefetcher import DayPrefetcher, netcdf_lock
 from hyo2.soundspeed.profile.profile import Profile
 from hyo2.soundspeed.profile.profilelist import ProfileList
 from hyo2.soundspeed.profile.dicts import Dicts
@@ -26,26 +30,33 @@ class Gomofs(AbstractAtlas):
         super(Gomofs, self).__init__(data_folder=data_folder, prj=prj)
         self.name = self.__class__.__name__
         self.desc = "Gulf of Maine Operational Forecast System"
+        self.skip_failed_queries = True  # the remote data may be unavailable
 
         # How far are we willing to look for solutions? size in grid nodes
         self._search_window = 5
-        self._search_half_window = self._search_window // 2
         # 2000 dBar is the ref depth associated with the potential temperatures in the grid (sigma-2)
         self._ref_p = 2000
 
         self._has_data_loaded = False  # grids are "loaded" ? (netCDF files are opened)
         self._last_loaded_day = date(1900, 1, 1)  # some silly day in the past
+        self._model_day = None  # the day of the loaded data (it may be the day before the last loaded day)
         self._file = None
         self._day_idx = None
         self._d = None
         self._lat = None
         self._lon = None
-        self._lat_step = None
-        self._lat_min = None
-        self._lat_max = None
-        self._lon_step = None
-        self._lon_min = None
-        self._lon_max = None
+        self._index = None  # spatial index of the grid nodes
+
+        # a local folder to use in place of the remote server (e.g., for testing)
+        self.server_folder = None
+        # the retrieved coordinates and grid tiles are cached on disk
+        self.use_cache = True
+        self.cache = GridCache(folder=os.path.join(self.data_folder, "cache"))
+        # the data for the next day are loaded in background (see 'prefetch')
+        self.prefetch_hours = 2.0  # how long before midnight
+        self.prefetch_retry = 1800.0  # seconds between retries
+        self._prefetcher = DayPrefetcher(load_day=self._load_day, discard_day=self._discard_day,
+                                         name="GoMOFS prefetch")
 
     # ### public API ###
 
@@ -62,33 +73,21 @@ class Gomofs(AbstractAtlas):
         if not isinstance(datestamp, date):
             raise RuntimeError("invalid date passed: %s" % type(datestamp))
 
-        if not self._download_files(datestamp=datestamp, server_mode=server_mode):
-            return False
+        return self._download_files(datestamp=datestamp, server_mode=server_mode)
 
-        try:
-            # Now get latitudes, longitudes and depths for x,y,z referencing
-            self._d = self._file.variables['Depth'][:]
-            self._lat = self._file.variables['Latitude'][:]
-            self._lon = self._file.variables['Longitude'][:]
-            # logger.debug('d:(%s)\n%s' % (self._d.shape, self._d))
-            # logger.debug('lat:(%s)\n%s' % (self._lat.shape, self._lat))
-            # logger.debug('lon:(%s)\n%s' % (self._lon.shape, self._lon))
+    def prefetch(self, datestamp: dt) -> None:
+        """Load in background the data that are going to be required after the passed timestamp (server mode)
 
-        except Exception as e:
-            logger.error("troubles in variable lookup for lat/long grid and/or depth: %s" % e)
-            self.clear_data()
-            return False
+        The next day is loaded in the last 'prefetch_hours' of the day. While the previous day is used in place of
+        the current one (not yet available), the current day is retried every 'prefetch_retry' seconds.
+        """
+        next_day = (datestamp + timedelta(hours=self.prefetch_hours)).date()
+        if next_day != datestamp.date():
+            self._prefetcher.request(next_day, min_interval=self.prefetch_retry)
 
-        self._lat_min = self._lat[0, 0]
-        self._lat_max = self._lat[-1, 0]
-        self._lat_step = self._lat[1, 0] - self._lat_min
-        self._lon_min = self._lon[0, 0]
-        self._lon_max = self._lon[0, -1]
-        self._lon_step = self._lon[0, 1] - self._lon_min
-
-        logger.debug("0(%.3f, %.3f); -1(%.3f, %.3f); step(%.3f, %.3f)"
-                     % (self._lat_min, self._lon_min, self._lat_max, self._lon_max, self._lat_step, self._lon_step))
-        return True
+        if self._has_data_loaded and (self._last_loaded_day == datestamp.date()) and \
+                (self._model_day < self._last_loaded_day):
+            self._prefetcher.request(self._last_loaded_day, min_interval=self.prefetch_retry)
 
     def query(self, lat: Optional[float], lon: Optional[float], datestamp: Union[date, dt, None] = None,
               server_mode: bool = False):
@@ -117,95 +116,36 @@ class Gomofs(AbstractAtlas):
             return None
 
         logger.debug("idx > lat: %s, lon: %s" % (lat_idx, lon_idx))
-        lat_s_idx = lat_idx - self._search_half_window
-        if lat_s_idx < 0:
-            lat_s_idx = 0
-        lat_n_idx = lat_idx + self._search_half_window
-        if lat_n_idx >= self._lat.shape[0]:
-            lat_n_idx = self._lat.shape[0] - 1
-        lon_w_idx = lon_idx - self._search_half_window
-        if lon_w_idx < 0:
-            lon_w_idx = 0
-        lon_e_idx = lon_idx + self._search_half_window
-        if lon_e_idx >= self._lon.shape[1]:
-            lon_e_idx = self._lon.shape[1] - 1
+
+        # the nodes nearest to the requested position (sorted by distance)
+        _, lat_idxs, lon_idxs = self._index.query(lat, lon, k=self._search_window ** 2)
+        lat_s_idx = lat_idxs.min()
+        lat_n_idx = lat_idxs.max()
+        lon_w_idx = lon_idxs.min()
+        lon_e_idx = lon_idxs.max()
         # logger.info("indices -> %s %s %s %s" % (lat_s_idx, lat_n_idx, lon_w_idx, lon_e_idx))
-        lat_search_window = lat_n_idx - lat_s_idx + 1
-        lon_search_window = lon_e_idx - lon_w_idx + 1
-        logger.info("updated search window: (%s, %s)" % (lat_search_window, lon_search_window))
 
-        # Need +1 on the north and east indices since it is the "stop" value in these slices
-        t = self._file.variables['temp'][self._day_idx, :, lat_s_idx:lat_n_idx + 1, lon_w_idx:lon_e_idx + 1]
-        s = self._file.variables['salt'][self._day_idx, :, lat_s_idx:lat_n_idx + 1, lon_w_idx:lon_e_idx + 1]
-        # Set 'unfilled' elements to NANs (BUT when the entire array has valid data, it returns numpy.ndarray)
-        if isinstance(t, np.ma.core.MaskedArray):
-            t_mask = t.mask
-            t._sharedmask = False
-            t[t_mask] = np.nan
-        if isinstance(s, np.ma.core.MaskedArray):
-            s_mask = s.mask
-            s._sharedmask = False
-            s[s_mask] = np.nan
-
-        # Calculate distances from requested position to each of the grid node locations
-        distances = np.zeros((self._d.size, lon_search_window, lat_search_window))
-        longitudes = self._lon[lat_s_idx:lat_n_idx + 1, lon_w_idx:lon_e_idx + 1]
-        latitudes = self._lat[lat_s_idx:lat_n_idx + 1, lon_w_idx:lon_e_idx + 1]
-
-        for i in range(lat_search_window):
-
-            for j in range(lon_search_window):
-                dist = self.g.distance(longitudes[i, j], latitudes[i, j], lon, lat)
-                distances[:, i, j] = dist
-                # logger.info("node (%s %s), pos: %3.2f, %3.2f, dist: %3.1f"
-                #             % (i, j, latitudes[i, j], longitudes[i, j], distances[0, i, j]))
-
-        # Get mask of "no data" elements and replace these with NaNs in distance array
-        t_mask = np.isnan(t)
-        distances[t_mask] = np.nan
-        s_mask = np.isnan(s)
-        distances[s_mask] = np.nan
-        # logger.info("distance array:\n%s" % distances[0])
-
-        # Spin through all the depth levels
-        temp_pot = np.zeros(self._d.size)
-        temp_in_situ = np.zeros(self._d.size)
-        d = np.zeros(self._d.size)
-        sal = np.zeros(self._d.size)
-        num_values = 0
-        for i in range(self._d.size):
-
-            t_level = t[i]
-            s_level = s[i]
-            d_level = distances[i]
-
-            try:
-                ind = np.nanargmin(d_level)
-            except ValueError:
-                # logger.info("%s: all-NaN slices" % i)
-                continue
-
-            if np.isnan(ind):
-                logger.info("%s: bottom of valid data" % i)
-                break
-
-            ind2 = np.unravel_index(ind, t_level.shape)
-
-            t_closest = t_level[ind2]
-            s_closest = s_level[ind2]
-            # d_closest = d_level[ind2]
-
-            temp_pot[i] = t_closest
-            sal[i] = s_closest
-            d[i] = self._d[i]
-
-            # Calculate in-situ temperature
+        t, s = self._read_block(lat_s_idx, lat_n_idx, lon_w_idx, lon_e_idx)
+        # levels x nodes
+        t = t[:, lat_idxs - lat_s_idx, lon_idxs - lon_w_idx]
+        s = s[:, lat_idxs - lat_s_idx, lon_idxs - lon_w_idx]
+
+        # For each depth level, select the nearest node with data
+        valid = ~np.isnan(t) & ~np.isnan(s)
+        levels = np.flatnonzero(valid.any(axis=1))
+        closest = valid[levels].argmax(axis=1)
+        temp_pot = t[levels, closest].astype(np.float64)
+        sal = s[levels, closest].astype(np.float64)
+        d = self._d[levels].astype(np.float64)
+        num_values = levels.size
+
+        # Calculate in-situ temperature
+        temp_in_situ = np.zeros(num_values)
+        for i in range(num_values):
             p = Oc.d2p(d[i], lat)
-            temp_in_situ[i] = Oc.in_situ_temp(s=sal[i], t=t_closest, p=p, pr=self._ref_p)
-            # logger.info("%02d: %6.1f %6.1f > T/S/Dist: %3.1f %3.1f %3.1f [pot.temp. %3.1f]"
-            #             % (i, d[i], p, temp_in_situ[i], s_closest, d_closest, t_closest))
-
-            num_values += 1
+            temp_in_situ[i] = Oc.in_situ_temp(s=sal[i], t=temp_pot[i], p=p, pr=self._ref_p)
+            # logger.info("%02d: %6.1f %6.1f > T/S: %3.1f %3.1f [pot.temp. %3.1f]"
+            #             % (i, d[i], p, temp_in_situ[i], sal[i], temp_pot[i]))
 
         if num_values == 0:
             logger.info("no data from lookup!")
@@ -245,20 +185,16 @@ class Gomofs(AbstractAtlas):
     def clear_data(self) -> None:
         """Delete the data and reset the last loaded day"""
         logger.debug("clearing data")
+        self._prefetcher.clear()
+        self._close_file()
         if self._has_data_loaded:
-            if self._file:
-                self._file.close()
-            self._file = None
+            self._d = None
             self._lat = None
             self._lon = None
-            self._lat_step = None
-            self._lat_min = None
-            self._lat_max = None
-            self._lon_step = None
-            self._lon_min = None
-            self._lon_max = None
+            self._index = None
         self._has_data_loaded = False  # grids are "loaded" ? (netCDF files are opened)
         self._last_loaded_day = date(1900, 1, 1)  # some silly day in the past
+        self._model_day = None
         self._day_idx = None
 
     def __repr__(self):
@@ -307,58 +243,201 @@ class Gomofs(AbstractAtlas):
         """Actually, just try to connect with the remote files
         For a given queried date, we may have to use the forecast from the previous
         day since the current nowcast doesn't hold data for today (solved?)
-        """
-        progress = CliProgress()
 
+        The data loaded in background by 'prefetch' are swapped in when available, while the data in use are kept
+        (with their opened files) when the passed day is still served by the same model day.
+        """
         if not isinstance(datestamp, date):
             raise RuntimeError("invalid date passed: %s" % type(datestamp))
 
         # check if the files are loaded and that the date matches
-        if self._has_data_loaded:
-            # logger.info("%s" % self.last_loaded_day)
-            if self._last_loaded_day == datestamp:
+        if self._has_data_loaded and (self._last_loaded_day == datestamp):
+            day_data = self._prefetcher.take(datestamp)
+            if day_data is not None:
+                if day_data['model_day'] > self._model_day:  # the data for the current day are now available
+                    self._swap_day(day_data)
+                else:
+                    self._discard_day(day_data)
+            return True
+
+        day_data = self._prefetcher.take(datestamp)
+        if day_data is None:
+            if server_mode and self._has_data_loaded and self._prefetcher.is_pending(datestamp):
+                logger.info("loading data for %s in background > using %s" % (datestamp, self._last_loaded_day))
                 return True
-            else:  # the data are old
-                logger.info("cleaning data: %s %s" % (self._last_loaded_day, datestamp))
+
+            progress = CliProgress()
+            progress.start(text="Download GoMOFS", is_disabled=server_mode)
+            day_data = self._load_day(datestamp, progress=progress)
+            progress.end()
+            if day_data is None:
                 self.clear_data()
+                return False
 
-        progress.start(text="Download GoMOFS", is_disabled=server_mode)
+        if self._has_data_loaded and (day_data['model_day'] == self._model_day):  # the data in use are still valid
+            logger.info("using data for %s > %s" % (datestamp, self._model_day))
+            self._last_loaded_day = day_data['day']
+            self._discard_day(day_data)
+            return True
 
-        # check if the data are available on the RTOFS server
-        url_ck = self._build_check_url(datestamp)
-        if not self._check_url(url_ck):
+        if self._has_data_loaded:  # the data are old
+            logger.info("swapping data: %s %s" % (self._last_loaded_day, datestamp))
+        self._swap_day(day_data)
+        return True
 
-            datestamp -= timedelta(days=1)
-            url_ck = self._build_check_url(datestamp)
+    def _load_day(self, datestamp: date, progress: Optional[CliProgress] = None) -> Optional[dict]:
+        """Load the data for the passed day (from the cache, or the server) without using them yet"""
+        day_data = self._load_coords(datestamp, progress=progress)
+        if day_data is None:
+            return None
 
-            if not self._check_url(url_ck):
-                logger.warning('unable to retrieve data from GoMOFS server for date: %s and next day' % datestamp)
-                self.clear_data()
-                progress.end()
-                return False
+        try:
+            day_data['index'] = GridIndex(lat=day_data['coords']['Latitude'], lon=day_data['coords']['Longitude'])
+
+        except RuntimeError as e:
+            logger.error("troubles in indexing the lat/long grid: %s" % e)
+            self._discard_day(day_data)
+            return None
+
+        return day_data
 
-        progress.update(30)
+    def _load_coords(self, datestamp: date, progress: Optional[CliProgress] = None) -> Optional[dict]:
+        """Open the data set for the passed day (if not in the cache) and load the grid coordinates"""
+        day_data = {'day': datestamp, 'model_day': datestamp, 'file': None, 'coords': None}
+
+        # the data for this day are in the cache
+        if self.use_cache:
+            day_data['coords'] = self.cache.load_coords(datestamp)
+            if day_data['coords'] is not None:
+                return day_data
+
+        # check if the data are available on the GoMOFS server
+        model_day = datestamp
+        if not self._is_available(model_day):
+
+            model_day -= timedelta(days=1)
+
+            if not self._is_available(model_day):
+                logger.warning('unable to retrieve data from GoMOFS server for date: %s and next day' % model_day)
+                return None
+
+        if progress is not None:
+            progress.update(30)
+
+        # Try to download the data grid grids (if not in the cache)
+        day_data['model_day'] = model_day
+        if self.use_cache:
+            day_data['coords'] = self.cache.load_coords(model_day)
+        if day_data['coords'] is not None:
+            return day_data
 
-        # Try to download the data grid grids
-        url = self._build_opendap_url(datestamp)
-        # logger.debug('downloading RTOFS data for %s' % datestamp)
         try:
-            self._file = Dataset(url)
-            progress.update(70)
-            self._day_idx = 0
+            day_data['file'] = self._open_file(model_day)
+            if progress is not None:
+                progress.update(70)
 
-        except (RuntimeError, IOError) as e:
-            logger.warning("unable to access data: %s -> %s" % (datestamp.strftime("%Y%m%d"), e))
-            self.clear_data()
-            progress.end()
-            return False
+        except RuntimeError as e:
+            logger.warning("%s" % e)
+            return None
+
+        try:
+            # Now get latitudes, longitudes and depths for x,y,z referencing
+            with netcdf_lock:
+                day_data['coords'] = {
+                    'Depth': np.ma.filled(day_data['file'].variables['Depth'][:], np.nan),
+                    'Latitude': np.ma.filled(day_data['file'].variables['Latitude'][:], np.nan),
+                    'Longitude': np.ma.filled(day_data['file'].variables['Longitude'][:], np.nan),
+                }
+
+        except Exception as e:
+            logger.error("troubles in variable lookup for lat/long grid and/or depth: %s" % e)
+            self._discard_day(day_data)
+            return None
+
+        if self.use_cache:
+            self.cache.save_coords(model_day, day_data['coords'])
+        return day_data
+
+    def _swap_day(self, day_data: dict) -> None:
+        """Use the passed loaded data, in place of the current ones"""
+        self._close_file()
+        if self.use_cache:  # in the calling thread, since it also resets the tiles in memory
+            self.cache.evict()
+        self._file = day_data['file']
+        self._day_idx = 0
+
+        self._d = day_data['coords']['Depth']
+        self._lat = day_data['coords']['Latitude']
+        self._lon = day_data['coords']['Longitude']
+        # logger.debug('d:(%s)\n%s' % (self._d.shape, self._d))
+        # logger.debug('lat:(%s)\n%s' % (self._lat.shape, self._lat))
+        # logger.debug('lon:(%s)\n%s' % (self._lon.shape, self._lon))
+        self._index = day_data['index']
 
         # success!
         self._has_data_loaded = True
-        self._last_loaded_day = datestamp
+        self._last_loaded_day = day_data['day']
+        self._model_day = day_data['model_day']
         # logger.info("loaded data for %s" % datestamp)
-        progress.end()
-        return True
+
+    @classmethod
+    def _discard_day(cls, day_data: dict) -> None:
+        """Release the passed loaded data"""
+        with netcdf_lock:
+            if day_data['file']:
+                day_data['file'].close()
+            day_data['file'] = None
+
+    def _is_available(self, input_date: date) -> bool:
+        """Check if the data are available on the server for the passed date"""
+        if self.server_folder is not None:
+            return os.path.exists(self._build_local_path(input_date))
+
+        return self._check_url(self._build_check_url(input_date))
+
+    def _build_local_path(self, input_date: date) -> str:
+        """make up the path to use for salinity and temperature in the local server folder"""
+        return os.path.join(self.server_folder, input_date.strftime("%Y%m"),
+                            "nos.gomofs.regulargrid.n003.%s.t00z.nc" % input_date.strftime("%Y%m%d"))
+
+    def _open_file(self, model_day: date) -> Dataset:
+        """Open the data set for the passed model day"""
+        if self.server_folder is not None:
+            url = self._build_local_path(model_day)
+        else:
+            url = self._build_opendap_url(model_day)
+        try:  # without the netCDF lock: a remote open can take long, and it must not stall the reads of the data in use
+            return Dataset(url)
+
+        except (RuntimeError, IOError) as e:
+            raise RuntimeError("unable to access data: %s -> %s" % (model_day.strftime("%Y%m%d"), e))
+
+    def _close_file(self) -> None:
+        with netcdf_lock:
+            if self._file:
+                self._file.close()
+            self._file = None
+
+    def _read_block(self, lat_s_idx: int, lat_n_idx: int, lon_w_idx: int, lon_e_idx: int) -> tuple:
+        """Read temperature and salinity (levels x lats x lons, with NaN for no data) between the passed indices"""
+        # Need +1 on the north and east indices since it is the "stop" value in these slices
+        lat_slice = slice(lat_s_idx, lat_n_idx + 1)
+        lon_slice = slice(lon_w_idx, lon_e_idx + 1)
+        if self.use_cache:
+            block = self.cache.block(day=self._model_day, lat_slice=lat_slice, lon_slice=lon_slice,
+                                     grid_shape=self._lat.shape, read_tile=self._read_tile)
+        else:
+            block = self._read_tile(lat_slice, lon_slice)
+        return block['temp'], block['salt']
+
+    def _read_tile(self, lat_slice: slice, lon_slice: slice) -> dict:
+        if self._file is None:  # the coordinates were loaded from the cache
+            self._file = self._open_file(self._model_day)
+        with netcdf_lock:
+            t = self._file.variables['temp'][self._day_idx, :, lat_slice, lon_slice]
+            s = self._file.variables['salt'][self._day_idx, :, lat_slice, lon_slice]
+        # Set 'unfilled' elements to NANs (BUT when the entire array has valid data, it returns numpy.ndarray)
+        return {'temp': np.ma.filled(t, np.nan), 'salt': np.ma.filled(s, np.nan)}
 
     def grid_coords(self, lat: float, lon: float, datestamp: date, server_mode: Optional[bool] = False) -> tuple:
         """Convert the passed position in GOMOFS grid coords"""
@@ -368,18 +447,5 @@ class Gomofs(AbstractAtlas):
             logger.error("troubles in updating data set for timestamp: %s" % datestamp.strftime("%Y%m%d"))
             raise RuntimeError('troubles in db download')
 
-        # check validity of longitude and latitude
-        if lon < (self._lon_min - self._lon_step / 2.0):
-            return None, None
-        if lat < (self._lat_min - self._lat_step / 2.0):
-            return None, None
-        if lon > (self._lon_max + self._lon_step / 2.0):
-            return None, None
-        if lat > (self._lat_max + self._lat_step / 2.0):
-            return None, None
-
-        # This does a nearest neighbour lookup
-        lat_idx = int(round((lat - self._lat_min) / self._lat_step, 0))
-        lon_idx = int(round((lon - self._lon_min) / self._lon_step, 0))
-
-        return lat_idx, lon_idx
+        # This does a nearest neighbour lookup (None when outside of the grid)
+        return self._index.nearest(lat, lon)
@@ -0,0 +1,148 @@
+import os
+import time
+import logging
+import zipfile
+from datetime import date
+from typing import Callable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class GridCache:
+    """Disk cache of the daily grids of a forecast model (e.g., RTOFS), to reuse them across queries and sessions
+
+    For each model day, the grid coordinates and the retrieved tiles of grid nodes (tile_size x tile_size, with all
+    the depth levels) are stored as compressed .npz files. The files older than 'max_age' days are evicted, as
+    well as the least recently used ones when the cache is larger than 'max_size' bytes.
+    """
+
+    def __init__(self, folder: str, tile_size: int = 16, max_age: float = 30.0, max_size: int = 1024 ** 3) -> None:
+        self.folder = folder
+        self.tile_size = tile_size
+        self.max_age = max_age
+        self.max_size = max_size
+
+        # tiles of the latest used day, kept in memory
+        self._day = None
+        self._tiles = dict()
+
+    def load_coords(self, day: date) -> Optional[dict]:
+        """Return the cached grid coordinates for the passed model day (None if not in the cache)"""
+        return self._load(os.path.join(self._day_folder(day), "coords.npz"))
+
+    def has_coords(self, day: date) -> bool:
+        """Check whether the grid coordinates for the passed model day are in the cache"""
+        return os.path.exists(os.path.join(self._day_folder(day), "coords.npz"))
+
+    def save_coords(self, day: date, coords: dict) -> None:
+        """Store the grid coordinates for the passed model day"""
+        self._save(os.path.join(self._day_folder(day), "coords.npz"), coords)
+
+    def block(self, day: date, lat_slice: slice, lon_slice: slice, grid_shape: tuple,
+              read_tile: Callable[[slice, slice], dict]) -> dict:
+        """Return the arrays (levels x lats x lons) for the passed block of grid nodes
+
+        The tiles that are not in the cache are retrieved with read_tile(lat_slice, lon_slice), that must return
+        a dict of arrays (levels x lats x lons) for the passed tile.
+        """
+        if day != self._day:
+            self._day = day
+            self._tiles = dict()
+
+        block = dict()
+        for tile_lat in range(lat_slice.start // self.tile_size, (lat_slice.stop - 1) // self.tile_size + 1):
+            for tile_lon in range(lon_slice.start // self.tile_size, (lon_slice.stop - 1) // self.tile_size + 1):
+                tile_lat_slice = slice(tile_lat * self.tile_size, min((tile_lat + 1) * self.tile_size, grid_shape[0]))
+                tile_lon_slice = slice(tile_lon * self.tile_size, min((tile_lon + 1) * self.tile_size, grid_shape[1]))
+
+                tile = self._tiles.get((tile_lat, tile_lon))
+                if tile is None:
+                    path = os.path.join(self._day_folder(day), "%04d_%04d.npz" % (tile_lat, tile_lon))
+                    tile = self._load(path)
+                    if tile is None:
+                        tile = read_tile(tile_lat_slice, tile_lon_slice)
+                        self._save(path, tile)
+                    self._tiles[(tile_lat, tile_lon)] = tile
+
+                # copy the part of the tile that is in the block
+                lat_0 = max(lat_slice.start, tile_lat_slice.start)
+                lat_1 = min(lat_slice.stop, tile_lat_slice.stop)
+                lon_0 = max(lon_slice.start, tile_lon_slice.start)
+                lon_1 = min(lon_slice.stop, tile_lon_slice.stop)
+                for name, values in tile.items():
+                    if name not in block:
+                        block[name] = np.full((values.shape[0], lat_slice.stop - lat_slice.start,
+                                               lon_slice.stop - lon_slice.start), np.nan, dtype=values.dtype)
+                    block[name][:, lat_0 - lat_slice.start:lat_1 - lat_slice.start,
+                                lon_0 - lon_slice.start:lon_1 - lon_slice.start] = \
+                        values[:, lat_0 - tile_lat_slice.start:lat_1 - tile_lat_slice.start,
+                               lon_0 - tile_lon_slice.start:lon_1 - tile_lon_slice.start]
+
+        return block
+
+    def evict(self) -> None:
+        """Remove the files older than 'max_age', then the least recently used until within 'max_size'"""
+        if not os.path.isdir(self.folder):
+            return
+
+        files = list()
+        for day_entry in os.scandir(self.folder):
+            if not day_entry.is_dir():
+                continue
+            for entry in os.scandir(day_entry.path):
+                if entry.is_file():
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+
+        min_time = time.time() - self.max_age * 24 * 3600
+        total_size = sum(f[1] for f in files)
+        for mtime, size, path in files:
+            if (mtime >= min_time) and (total_size <= self.max_size):
+                break
+            try:
+                os.remove(path)
+                total_size -= size
+            except OSError as e:
+                logger.info("unable to evict %s: %s" % (path, e))
+
+        for day_entry in os.scandir(self.folder):
+            if day_entry.is_dir() and (len(os.listdir(day_entry.path)) == 0):
+                try:
+                    os.rmdir(day_entry.path)
+                except OSError as e:
+                    logger.info("unable to evict %s: %s" % (day_entry.path, e))
+
+        self._day = None
+        self._tiles = dict()
+
+    def _day_folder(self, day: date) -> str:
+        return os.path.join(self.folder, day.strftime("%Y%m%d"))
+
+    @classmethod
+    def _load(cls, path: str) -> Optional[dict]:
+        try:
+            with np.load(path) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+            os.utime(path)  # mark as recently used
+
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None
+
+        return arrays
+
+    @classmethod
+    def _save(cls, path: str, arrays: dict) -> None:
+        try:
+            folder = os.path.dirname(path)
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+            tmp_path = path + ".%d.tmp" % os.getpid()
+            with open(tmp_path, 'wb') as fod:
+                np.savez_compressed(fod, **arrays)
+            os.replace(tmp_path, path)
+
+        except OSError as e:
+            logger.info("unable to cache %s: %s" % (path, e))
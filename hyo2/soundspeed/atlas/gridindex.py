@@ -0,0 +1,75 @@
+import logging
+from typing import Union
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+logger = logging.getLogger(__name__)
+
+
+class GridIndex:
+    """Spatial index of the nodes of a (possibly curvilinear) model grid, to look up the nodes nearest to a position
+
+    The nodes are indexed by their earth-centered (ECEF) coordinates on the WGS84 ellipsoid, so that the returned
+    distances are in meters and the look-ups are not affected by the grid curvature or the longitude wrapping.
+    The nodes with invalid coordinates are not indexed.
+    """
+
+    # WGS84 ellipsoid
+    semi_major_axis = 6378137.0
+    eccentricity_2 = 6.69437999014e-3
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray) -> None:
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        if (lat.ndim == 1) and (lon.ndim == 1):  # regular grid
+            lon, lat = np.meshgrid(lon, lat)
+        if lat.shape != lon.shape:
+            raise RuntimeError("invalid grid coordinates: %s %s" % (lat.shape, lon.shape))
+        self.shape = lat.shape
+
+        xyz = self.ecef(lat, lon)
+        valid = np.all(np.isfinite(xyz), axis=-1)
+        self._nodes = np.flatnonzero(valid)
+        if self._nodes.size == 0:
+            raise RuntimeError("no valid grid coordinates")
+        self._tree = cKDTree(xyz[valid])
+
+        # the positions farther than the half-diagonal of the largest grid cell are outside of the grid
+        self.radius = 0.0
+        if (self.shape[0] > 1) and (self.shape[1] > 1):
+            with np.errstate(invalid='ignore'):
+                diagonals = np.concatenate([np.linalg.norm(xyz[1:, 1:] - xyz[:-1, :-1], axis=-1).ravel(),
+                                            np.linalg.norm(xyz[1:, :-1] - xyz[:-1, 1:], axis=-1).ravel()])
+            diagonals = diagonals[np.isfinite(diagonals)]
+            if diagonals.size > 0:
+                self.radius = diagonals.max() / 2.0
+        logger.debug("indexed %d nodes [radius: %.1f m]" % (self._nodes.size, self.radius))
+
+    @classmethod
+    def ecef(cls, lat: Union[float, np.ndarray], lon: Union[float, np.ndarray]) -> np.ndarray:
+        """Return the earth-centered coordinates (..., 3) of the passed positions on the WGS84 ellipsoid"""
+        lat = np.radians(lat)
+        lon = np.radians(lon)
+        sin_lat = np.sin(lat)
+        n = cls.semi_major_axis / np.sqrt(1.0 - cls.eccentricity_2 * sin_lat ** 2)
+        return np.stack([n * np.cos(lat) * np.cos(lon),
+                         n * np.cos(lat) * np.sin(lon),
+                         n * (1.0 - cls.eccentricity_2) * sin_lat], axis=-1)
+
+    def query(self, lat: Union[float, np.ndarray], lon: Union[float, np.ndarray], k: int = 1) -> tuple:
+        """Return the distances (in meters) and the grid indices of the k nodes nearest to the passed position(s)
+
+        The last axis of the returned arrays has the k nodes, sorted by increasing distance.
+        """
+        k = min(k, self._nodes.size)
+        dists, ids = self._tree.query(self.ecef(lat, lon), k=list(range(1, k + 1)))
+        lat_idx, lon_idx = np.unravel_index(self._nodes[ids], self.shape)
+        return dists, lat_idx, lon_idx
+
+    def nearest(self, lat: float, lon: float) -> tuple:
+        """Return the grid indices of the node nearest to the passed position, or (None, None) if outside"""
+        dists, lat_idx, lon_idx = self.query(lat, lon)
+        if dists[0] > self.radius:
+            return None, None
+        return int(lat_idx[0]), int(lon_idx[0])
@@ -0,0 +1,92 @@
+import threading
+import time
+import logging
+from datetime import date
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# the netCDF library is not thread-safe: the atlases loading data in background serialize with this lock the reads
+# (and the closes) of the opened data sets, while the (possibly remote) data sets are opened without holding it
+netcdf_lock = threading.RLock()
+
+
+class DayPrefetcher:
+    """Load the data of a forecast day in background, so that they can be swapped in when required
+
+    'load_day(day)' returns the loaded data (None on failure), while 'discard_day(data)' releases the loaded data
+    that are not going to be used.
+    """
+
+    def __init__(self, load_day: Callable[[date], Any], discard_day: Callable[[Any], None],
+                 name: str = "Prefetcher") -> None:
+        self.load_day = load_day
+        self.discard_day = discard_day
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._ready = dict()
+        self._requested = dict()  # time of the latest request, by day
+        self._generation = 0  # increased when cleared, to discard the data of the loads in progress
+
+    def request(self, day: date, min_interval: float = 0.0) -> bool:
+        """Start loading the passed day in background
+
+        Nothing is done if the day is loading or already loaded, or if it was requested less than 'min_interval'
+        seconds ago.
+        """
+        now = time.time()
+        with self._lock:
+            if (day in self._pending) or (day in self._ready):
+                return False
+            if now - self._requested.get(day, 0.0) < min_interval:
+                return False
+            self._requested = {d: t for d, t in self._requested.items() if d >= day}
+            self._requested[day] = now
+            self._pending.add(day)
+            generation = self._generation
+
+        logger.debug("%s: loading %s" % (self.name, day))
+        threading.Thread(target=self._load, args=(day, generation), name="%s %s" % (self.name, day),
+                         daemon=True).start()
+        return True
+
+    def is_pending(self, day: date) -> bool:
+        """Check whether the passed day is loading in background"""
+        with self._lock:
+            return day in self._pending
+
+    def take(self, day: date) -> Optional[Any]:
+        """Return the data loaded for the passed day (if any), that are then removed from the prefetcher"""
+        with self._lock:
+            return self._ready.pop(day, None)
+
+    def clear(self) -> None:
+        """Discard the loaded data, as well as the data of the loads in progress"""
+        with self._lock:
+            ready = list(self._ready.values())
+            self._ready = dict()
+            self._requested = dict()
+            self._generation += 1
+
+        for data in ready:
+            self.discard_day(data)
+
+    def _load(self, day: date, generation: int) -> None:
+        data = None
+        # noinspection PyBroadException
+        try:
+            data = self.load_day(day)
+        except Exception as e:
+            logger.warning("%s: unable to load %s: %s" % (self.name, day, e))
+
+        with self._lock:
+            self._pending.discard(day)
+            if (data is not None) and (generation == self._generation):
+                self._ready[day] = data
+                data = None
+
+        if data is not None:
+            self.discard_day(data)
+        logger.debug("%s: loaded %s" % (self.name, day))
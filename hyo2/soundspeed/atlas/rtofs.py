@@ -1,5 +1,6 @@
 from datetime import datetime as dt, date, timedelta
 from http import client
+import os
 from urllib import parse
 import socket
 import logging
@@ -11,6 +12,8 @@ import numpy as np
 from hyo2.abc.lib.progress.cli_progress import CliProgress
 
 from hyo2.soundspeed.atlas.abstract import AbstractAtlas
+from hyo2.soundspeed.atlas.gridcache import GridCache
+from hyo2.soundspeed.atlas.prefetcher import DayPrefetcher, netcdf_lock
 from hyo2.soundspeed.profile.profile import Profile
 from hyo2.soundspeed.profile.profilelist import ProfileList
 from hyo2.soundspeed.profile.dicts import Dicts
@@ -26,6 +29,7 @@ class Rtofs(AbstractAtlas):
         super(Rtofs, self).__init__(data_folder=data_folder, prj=prj)
         self.name = self.__class__.__name__
         self.desc = "Global Real-Time Ocean Forecast System"
+        self.skip_failed_queries = True  # the remote data may be unavailable
 
         # How far are we willing to look for solutions? size in grid nodes
         self._search_window = 5
@@ -35,6 +39,7 @@ class Rtofs(AbstractAtlas):
 
         self._has_data_loaded = False  # grids are "loaded" ? (netCDF files are opened)
         self._last_loaded_day = date(1900, 1, 1)  # some silly day in the past
+        self._model_day = None  # the day of the loaded data (it may be the day before the last loaded day)
         self._file_temp = None
         self._file_sal = None
         self._day_idx = None
@@ -46,6 +51,16 @@ class Rtofs(AbstractAtlas):
         self._lon_step = None
         self._lon_0 = None
 
+        # a local folder to use in place of the remote server (e.g., for testing)
+        self.server_folder = None
+        # the retrieved coordinates and grid tiles are cached on disk
+        self.use_cache = True
+        self.cache = GridCache(folder=os.path.join(self.data_folder, "cache"))
+        # the data for the next day are loaded in background (see 'prefetch')
+        self.prefetch_hours = 2.0  # how long before midnight
+        self.prefetch_retry = 1800.0  # seconds between retries
+        self._prefetcher = DayPrefetcher(load_day=self._load_day, discard_day=self._discard_day, name="RTOFS prefetch")
+
     # ### public API ###
 
     def is_present(self) -> bool:
@@ -61,30 +76,21 @@ class Rtofs(AbstractAtlas):
         if not isinstance(datestamp, date):
             raise RuntimeError("invalid date passed: %s" % type(datestamp))
 
-        if not self._download_files(datestamp=datestamp, server_mode=server_mode):
-            return False
+        return self._download_files(datestamp=datestamp, server_mode=server_mode)
 
-        try:
-            # Now get latitudes, longitudes and depths for x,y,z referencing
-            self._d = self._file_temp.variables['lev'][:]
-            self._lat = self._file_temp.variables['lat'][:]
-            self._lon = self._file_temp.variables['lon'][:]
-            # logger.debug('d:(%s)\n%s' % (self._d.shape, self._d))
-            # logger.debug('lat:(%s)\n%s' % (self._lat.shape, self._lat))
-            # logger.debug('lon:(%s)\n%s' % (self._lon.shape, self._lon))
+    def prefetch(self, datestamp: dt) -> None:
+        """Load in background the data that are going to be required after the passed timestamp (server mode)
 
-        except Exception as e:
-            logger.error("troubles in variable lookup for lat/long grid and/or depth: %s" % e)
-            self.clear_data()
-            return False
-
-        self._lat_0 = self._lat[0]
-        self._lat_step = self._lat[1] - self._lat_0
-        self._lon_0 = self._lon[0]
-        self._lon_step = self._lon[1] - self._lon_0
+        The next day is loaded in the last 'prefetch_hours' of the day. While the previous day is used in place of
+        the current one (not yet available), the current day is retried every 'prefetch_retry' seconds.
+        """
+        next_day = (datestamp + timedelta(hours=self.prefetch_hours)).date()
+        if next_day != datestamp.date():
+            self._prefetcher.request(next_day, min_interval=self.prefetch_retry)
 
-        # logger.debug("0(%.3f, %.3f); step(%.3f, %.3f)" % (self.lat_0, self.lon_0, self.lat_step, self.lon_step))
-        return True
+        if self._has_data_loaded and (self._last_loaded_day == datestamp.date()) and \
+                (self._model_day < self._last_loaded_day):
+            self._prefetcher.request(self._last_loaded_day, min_interval=self.prefetch_retry)
 
     def query(self, lat: Optional[float], lon: Optional[float], datestamp: Union[date, dt, None] = None,
               server_mode: bool = False):
@@ -121,19 +127,7 @@ class Rtofs(AbstractAtlas):
         if (lon_e_idx < self._lon.size) and (lon_w_idx >= 0):
             # logger.info("safe case")
 
-            # Need +1 on the north and east indices since it is the "stop" value in these slices
-            t = self._file_temp.variables['temperature'][self._day_idx, :, lat_s_idx:lat_n_idx + 1,
-                lon_w_idx:lon_e_idx + 1]
-            s = self._file_sal.variables['salinity'][self._day_idx, :, lat_s_idx:lat_n_idx + 1, lon_w_idx:lon_e_idx + 1]
-            # Set 'unfilled' elements to NANs (BUT when the entire array has valid data, it returns numpy.ndarray)
-            if isinstance(t, np.ma.core.MaskedArray):
-                t_mask = t.mask
-                t._sharedmask = False
-                t[t_mask] = np.nan
-            if isinstance(s, np.ma.core.MaskedArray):
-                s_mask = s.mask
-                s._sharedmask = False
-                s[s_mask] = np.nan
+            t, s = self._read_block(lat_s_idx, lat_n_idx, lon_w_idx, lon_e_idx)
 
             lons = self._lon[lon_w_idx:lon_e_idx + 1]
             for i in range(self._search_window):
@@ -148,18 +142,7 @@ class Rtofs(AbstractAtlas):
                 lon_w_idx = lon_w_idx + self._lon.size
             # logger.info("using lon west/east indices -> %s %s" % (lon_w_idx, lon_e_idx))
 
-            # Need +1 on the north and east indices since it is the "stop" value in these slices
-            t_left = self._file_temp.variables['temperature'][self._day_idx, :, lat_s_idx:lat_n_idx + 1,
-                     lon_w_idx:lon_e_idx + 1]
-            s_left = self._file_sal.variables['salinity'][self._day_idx, :, lat_s_idx:lat_n_idx + 1,
-                     lon_w_idx:lon_e_idx + 1]
-            # Set 'unfilled' elements to NANs (BUT when the entire array has valid data, it returns numpy.ndarray)
-            if isinstance(t_left, np.ma.core.MaskedArray):
-                t_mask = t_left.mask
-                t_left[t_mask] = np.nan
-            if isinstance(s_left, np.ma.core.MaskedArray):
-                s_mask = s_left.mask
-                s_left[s_mask] = np.nan
+            t_left, s_left = self._read_block(lat_s_idx, lat_n_idx, lon_w_idx, lon_e_idx)
 
             lons_left = self._lon[lon_w_idx:lon_e_idx + 1]
             for i in range(self._search_window):
@@ -171,45 +154,28 @@ class Rtofs(AbstractAtlas):
             lon_w_idx = 0
             lon_e_idx = self._search_window - lons_left.size - 1
 
-            # Need +1 on the north and east indices since it is the "stop" value in these slices
-            t_right = self._file_temp.variables['temperature'][self._day_idx, :, lat_s_idx:lat_n_idx + 1,
-                      lon_w_idx:lon_e_idx + 1]
-            s_right = self._file_sal.variables['salinity'][self._day_idx, :, lat_s_idx:lat_n_idx + 1,
-                      lon_w_idx:lon_e_idx + 1]
-            # Set 'unfilled' elements to NANs (BUT when the entire array has valid data, it returns numpy.ndarray)
-            if isinstance(t_right, np.ma.core.MaskedArray):
-                t_mask = t_right.mask
-                t_right[t_mask] = np.nan
-            if isinstance(s_right, np.ma.core.MaskedArray):
-                s_mask = s_right.mask
-                s_right[s_mask] = np.nan
+            t_right, s_right = self._read_block(lat_s_idx, lat_n_idx, lon_w_idx, lon_e_idx)
 
             lons_right = self._lon[lon_w_idx:lon_e_idx + 1]
             for i in range(self._search_window):
                 longitudes[i, lons_left.size:self._search_window] = lons_right
 
             # merge data
-            t = np.zeros((self._file_temp.variables['lev'].size, self._search_window, self._search_window))
+            t = np.zeros((self._d.size, self._search_window, self._search_window))
             t[:, :, 0:lons_left.size] = t_left
             t[:, :, lons_left.size:self._search_window] = t_right
-            s = np.zeros((self._file_temp.variables['lev'].size, self._search_window, self._search_window))
+            s = np.zeros((self._d.size, self._search_window, self._search_window))
             s[:, :, 0:lons_left.size] = s_left
             s[:, :, lons_left.size:self._search_window] = s_right
 
         # Calculate distances from requested position to each of the grid node locations
-        distances = np.zeros((self._d.size, self._search_window, self._search_window))
         latitudes = np.zeros((self._search_window, self._search_window))
         lats = self._lat[lat_s_idx:lat_n_idx + 1]
         for i in range(self._search_window):
             latitudes[:, i] = lats
 
-        for i in range(self._search_window):
-
-            for j in range(self._search_window):
-                dist = self.g.distance(longitudes[i, j], latitudes[i, j], lon, lat)
-                distances[:, i, j] = dist
-                # logger.info("node %s, pos: %3.1f, %3.1f, dist: %3.1f"
-                #             % (i, latitudes[i, j], longitudes[i, j], distances[0, i, j]))
+        dists = self.g.distance_many(lon, lat, longitudes, latitudes)
+        distances = np.repeat(dists[np.newaxis, :, :], self._d.size, axis=0)
         # logger.info("distance array:\n%s" % distances[0])
         # Get mask of "no data" elements and replace these with NaNs in distance array
         t_mask = np.isnan(t)
@@ -295,13 +261,10 @@ class Rtofs(AbstractAtlas):
     def clear_data(self) -> None:
         """Delete the data and reset the last loaded day"""
         logger.debug("clearing data")
+        self._prefetcher.clear()
+        self._close_files()
         if self._has_data_loaded:
-            if self._file_temp:
-                self._file_temp.close()
-            self._file_temp = None
-            if self._file_sal:
-                self._file_sal.close()
-            self._file_sal = None
+            self._d = None
             self._lat = None
             self._lon = None
             self._lat_step = None
@@ -310,6 +273,7 @@ class Rtofs(AbstractAtlas):
             self._lon_0 = None
         self._has_data_loaded = False  # grids are "loaded" ? (netCDF files are opened)
         self._last_loaded_day = date(1900, 1, 1)  # some silly day in the past
+        self._model_day = None
         self._day_idx = None
 
     def __repr__(self) -> str:
@@ -366,60 +330,207 @@ class Rtofs(AbstractAtlas):
         """Actually, just try to connect with the remote files
         For a given queried date, we may have to use the forecast from the previous
         day since the current nowcast doesn't hold data for today (solved?)
-        """
-        progress = CliProgress()
 
+        The data loaded in background by 'prefetch' are swapped in when available, while the data in use are kept
+        (with their opened files) when the passed day is still served by the same model day.
+        """
         if not isinstance(datestamp, date):
             raise RuntimeError("invalid date passed: %s" % type(datestamp))
 
         # check if the files are loaded and that the date matches
-        if self._has_data_loaded:
-            # logger.info("%s" % self.last_loaded_day)
-            if self._last_loaded_day == datestamp:
+        if self._has_data_loaded and (self._last_loaded_day == datestamp):
+            day_data = self._prefetcher.take(datestamp)
+            if day_data is not None:
+                if day_data['model_day'] > self._model_day:  # the data for the current day are now available
+                    self._swap_day(day_data)
+                else:
+                    self._discard_day(day_data)
+            return True
+
+        day_data = self._prefetcher.take(datestamp)
+        if day_data is None:
+            if server_mode and self._has_data_loaded and self._prefetcher.is_pending(datestamp):
+                logger.info("loading data for %s in background > using %s" % (datestamp, self._last_loaded_day))
                 return True
-            else:  # the data are old
-                logger.info("cleaning data: %s %s" % (self._last_loaded_day, datestamp))
+
+            progress = CliProgress()
+            progress.start(text="Download RTOFS", is_disabled=server_mode)
+            day_data = self._load_day(datestamp, progress=progress)
+            progress.end()
+            if day_data is None:
                 self.clear_data()
+                return False
+
+        if self._has_data_loaded and (day_data['model_day'] == self._model_day):  # the data in use are still valid
+            logger.info("using data for %s > %s" % (datestamp, self._model_day))
+            self._last_loaded_day = day_data['day']
+            self._discard_day(day_data)
+            return True
+
+        if self._has_data_loaded:  # the data are old
+            logger.info("swapping data: %s %s" % (self._last_loaded_day, datestamp))
+        self._swap_day(day_data)
+        return True
+
+    def _load_day(self, datestamp: date, progress: Optional[CliProgress] = None) -> Optional[dict]:
+        """Load the data for the passed day (from the cache, or the server) without using them yet"""
+        day_data = {'day': datestamp, 'model_day': datestamp, 'file_temp': None, 'file_sal': None, 'coords': None}
 
-        progress.start(text="Download RTOFS", is_disabled=server_mode)
+        # the data for this day are in the cache
+        if self.use_cache:
+            day_data['coords'] = self.cache.load_coords(datestamp)
+            if day_data['coords'] is not None:
+                return day_data
 
         # check if the data are available on the RTOFS server
-        url_ck_temp, url_ck_sal = self._build_check_urls(datestamp)
-        if not self._check_url(url_ck_temp) or not self._check_url(url_ck_sal):
+        model_day = datestamp
+        if not self._is_available(model_day):
 
-            datestamp -= timedelta(days=1)
-            url_ck_temp, url_ck_sal = self._build_check_urls(datestamp)
+            model_day -= timedelta(days=1)
 
-            if not self._check_url(url_ck_temp) or not self._check_url(url_ck_sal):
-                logger.warning('unable to retrieve data from RTOFS server for date: %s and next day' % datestamp)
-                self.clear_data()
-                progress.end()
-                return False
+            if not self._is_available(model_day):
+                logger.warning('unable to retrieve data from RTOFS server for date: %s and next day' % model_day)
+                return None
 
-        progress.update(30)
+        if progress is not None:
+            progress.update(30)
+
+        # Try to download the data grid grids (if not in the cache)
+        day_data['model_day'] = model_day
+        if self.use_cache:
+            day_data['coords'] = self.cache.load_coords(model_day)
+        if day_data['coords'] is not None:
+            return day_data
 
-        # Try to download the data grid grids
-        url_temp, url_sal = self._build_opendap_urls(datestamp)
-        # logger.debug('downloading RTOFS data for %s' % datestamp)
         try:
-            self._file_temp = Dataset(url_temp)
-            progress.update(60)
-            self._file_sal = Dataset(url_sal)
-            progress.update(80)
-            self._day_idx = 2  # usually 3 1-day steps
-
-        except (RuntimeError, IOError):
-            logger.warning("unable to access data: %s" % datestamp.strftime("%Y%m%d"))
-            self.clear_data()
-            progress.end()
-            return False
+            day_data['file_temp'], day_data['file_sal'] = self._open_files(model_day)
+            if progress is not None:
+                progress.update(80)
+
+        except RuntimeError as e:
+            logger.warning("%s" % e)
+            return None
+
+        try:
+            # Now get latitudes, longitudes and depths for x,y,z referencing
+            with netcdf_lock:
+                day_data['coords'] = {
+                    'lev': np.ma.filled(day_data['file_temp'].variables['lev'][:], np.nan),
+                    'lat': np.ma.filled(day_data['file_temp'].variables['lat'][:], np.nan),
+                    'lon': np.ma.filled(day_data['file_temp'].variables['lon'][:], np.nan),
+                }
+
+        except Exception as e:
+            logger.error("troubles in variable lookup for lat/long grid and/or depth: %s" % e)
+            self._discard_day(day_data)
+            return None
+
+        if self.use_cache:
+            self.cache.save_coords(model_day, day_data['coords'])
+        return day_data
+
+    def _swap_day(self, day_data: dict) -> None:
+        """Use the passed loaded data, in place of the current ones"""
+        self._close_files()
+        if self.use_cache:  # in the calling thread, since it also resets the tiles in memory
+            self.cache.evict()
+        self._file_temp = day_data['file_temp']
+        self._file_sal = day_data['file_sal']
+        self._day_idx = 2  # usually 3 1-day steps
+
+        self._d = day_data['coords']['lev']
+        self._lat = day_data['coords']['lat']
+        self._lon = day_data['coords']['lon']
+        # logger.debug('d:(%s)\n%s' % (self._d.shape, self._d))
+        # logger.debug('lat:(%s)\n%s' % (self._lat.shape, self._lat))
+        # logger.debug('lon:(%s)\n%s' % (self._lon.shape, self._lon))
+
+        self._lat_0 = self._lat[0]
+        self._lat_step = self._lat[1] - self._lat_0
+        self._lon_0 = self._lon[0]
+        self._lon_step = self._lon[1] - self._lon_0
+        # logger.debug("0(%.3f, %.3f); step(%.3f, %.3f)" % (self.lat_0, self.lon_0, self.lat_step, self.lon_step))
 
         # success!
         self._has_data_loaded = True
-        self._last_loaded_day = datestamp
+        self._last_loaded_day = day_data['day']
+        self._model_day = day_data['model_day']
         # logger.info("loaded data for %s" % datestamp)
-        progress.end()
-        return True
+
+    @classmethod
+    def _discard_day(cls, day_data: dict) -> None:
+        """Release the passed loaded data"""
+        with netcdf_lock:
+            for name in ['file_temp', 'file_sal']:
+                if day_data[name]:
+                    day_data[name].close()
+                day_data[name] = None
+
+    def _is_available(self, input_date: date) -> bool:
+        """Check if the data are available on the server for the passed date"""
+        if self.server_folder is not None:
+            return all([os.path.exists(path) for path in self._build_local_paths(input_date)])
+
+        url_ck_temp, url_ck_sal = self._build_check_urls(input_date)
+        return self._check_url(url_ck_temp) and self._check_url(url_ck_sal)
+
+    def _build_local_paths(self, input_date: date) -> tuple:
+        """make up the paths to use for salinity and temperature in the local server folder"""
+        path_temp = os.path.join(self.server_folder, "rtofs_global%s" % input_date.strftime("%Y%m%d"),
+                                 "rtofs_glo_3dz_nowcast_daily_temp.nc")
+        path_sal = os.path.join(self.server_folder, "rtofs_global%s" % input_date.strftime("%Y%m%d"),
+                                "rtofs_glo_3dz_nowcast_daily_salt.nc")
+        return path_temp, path_sal
+
+    def _open_files(self, model_day: date) -> tuple:
+        """Open the temperature and salinity data sets for the passed model day"""
+        if self.server_folder is not None:
+            url_temp, url_sal = self._build_local_paths(model_day)
+        else:
+            url_temp, url_sal = self._build_opendap_urls(model_day)
+
+        file_temp = None
+        try:  # without the netCDF lock: a remote open can take long, and it must not stall the reads of the data in use
+            file_temp = Dataset(url_temp)
+            file_sal = Dataset(url_sal)
+
+        except (RuntimeError, IOError) as e:
+            if file_temp:
+                with netcdf_lock:
+                    file_temp.close()
+            raise RuntimeError("unable to access data: %s -> %s" % (model_day.strftime("%Y%m%d"), e))
+
+        return file_temp, file_sal
+
+    def _close_files(self) -> None:
+        with netcdf_lock:
+            if self._file_temp:
+                self._file_temp.close()
+            self._file_temp = None
+            if self._file_sal:
+                self._file_sal.close()
+            self._file_sal = None
+
+    def _read_block(self, lat_s_idx: int, lat_n_idx: int, lon_w_idx: int, lon_e_idx: int) -> tuple:
+        """Read temperature and salinity (levels x lats x lons, with NaN for no data) between the passed indices"""
+        # Need +1 on the north and east indices since it is the "stop" value in these slices
+        lat_slice = slice(lat_s_idx, lat_n_idx + 1)
+        lon_slice = slice(lon_w_idx, lon_e_idx + 1)
+        if self.use_cache:
+            block = self.cache.block(day=self._model_day, lat_slice=lat_slice, lon_slice=lon_slice,
+                                     grid_shape=(self._lat.size, self._lon.size), read_tile=self._read_tile)
+        else:
+            block = self._read_tile(lat_slice, lon_slice)
+        return block['temperature'], block['salinity']
+
+    def _read_tile(self, lat_slice: slice, lon_slice: slice) -> dict:
+        if self._file_temp is None:  # the coordinates were loaded from the cache
+            self._file_temp, self._file_sal = self._open_files(self._model_day)
+        with netcdf_lock:
+            t = self._file_temp.variables['temperature'][self._day_idx, :, lat_slice, lon_slice]
+            s = self._file_sal.variables['salinity'][self._day_idx, :, lat_slice, lon_slice]
+        # Set 'unfilled' elements to NANs (BUT when the entire array has valid data, it returns numpy.ndarray)
+        return {'temperature': np.ma.filled(t, np.nan), 'salinity': np.ma.filled(s, np.nan)}
 
     def grid_coords(self, lat: float, lon: float, datestamp: date, server_mode: Optional[bool] = False) -> tuple:
         """Convert the passed position in RTOFS grid coords"""
@@ -1,10 +1,9 @@
 import os
-import math
 import numpy as np
 from netCDF4 import Dataset
 import logging
 from datetime import datetime as dt, date
-from typing import Union
+from typing import List, Optional, Union
 
 from hyo2.abc.lib.ftp import Ftp
 
@@ -43,6 +42,18 @@ class Woa09(AbstractAtlas):
         self.month_idx = 0
         self.season_idx = 0
 
+        # coordinates and land-sea mask (cached in the 'cache' folder to avoid opening the netCDF files at start)
+        self.lat = None
+        self.lon = None
+        self.depth = None
+        self.month_days = None
+        self.season_days = None
+
+        # month-over-season grids are cached (as memory-mapped .npy files) on first use
+        self.use_grid_cache = True
+        self.cache_folder = os.path.join(self.data_folder, "cache")
+        self._grids = dict()
+
     def is_present(self) -> bool:
         """Check the presence of one of the db file
 
@@ -88,37 +99,100 @@ class Woa09(AbstractAtlas):
             return False
 
     def load_grids(self) -> bool:
-        """Load atlas grids"""
+        """Load atlas coordinates and land-sea mask (the netCDF files are opened only when required)"""
+        coords_path = os.path.join(self.cache_folder, "woa09_coords.npz")
+        cached = False
+        if self.use_grid_cache:
+            try:
+                with np.load(coords_path) as coords:
+                    self.lat = coords['lat']
+                    self.lon = coords['lon']
+                    self.depth = coords['depth']
+                    self.month_days = coords['month_days']
+                    self.season_days = coords['season_days']
+                    self.landsea = coords['landsea']
+                cached = True
+
+            except (OSError, ValueError, KeyError):
+                logger.debug("unable to load the cached atlas coordinates")
+
+        if not cached:
+            if not self.open_datasets():
+                return False
+
+            self.lat = np.ma.filled(self.t_monthly.variables['lat'][:], np.nan).astype(np.float64)
+            self.lon = np.ma.filled(self.t_monthly.variables['lon'][:], np.nan).astype(np.float64)
+            self.depth = np.ma.filled(self.t_seasonal.variables['depth'][:], np.nan)
+            self.month_days = np.ma.filled(self.t_monthly.variables['time'][:], np.nan).astype(np.float64)
+            self.season_days = np.ma.filled(self.t_seasonal.variables['time'][:], np.nan).astype(np.float64)
+            try:
+                landsea = np.genfromtxt((os.path.join(self.data_folder, "landsea.msk")))
+                self.landsea = landsea.reshape((180, 360))
+                # basin = np.genfromtxt((os.path.join(self.folder, "basin.msk")))
+                # self.basin = basin.reshape((33, 180, 360))
+
+            except Exception as e:
+                logger.error("issue in reading the land-sea mask: %s" % e)
+                return False
+
+            if self.use_grid_cache:
+                try:
+                    if not os.path.exists(self.cache_folder):
+                        os.makedirs(self.cache_folder)
+                    tmp_path = coords_path + ".%d.tmp" % os.getpid()
+                    with open(tmp_path, 'wb') as fod:
+                        np.savez(fod, lat=self.lat, lon=self.lon, depth=self.depth, month_days=self.month_days,
+                                 season_days=self.season_days, landsea=self.landsea)
+                    os.replace(tmp_path, coords_path)
+
+                except OSError as e:
+                    logger.info("unable to cache the atlas coordinates: %s" % e)
+
+        # What's our grid interval in lat/long
+        self.lat_step = self.lat[1] - self.lat[0]
+        self.lat_0 = self.lat[0]
+        self.lon_step = self.lon[1] - self.lon[0]
+        self.lon_0 = self.lon[0]
+        # How many depth levels do we have?
+        self.num_levels = self.depth.size
+        logger.debug("0(%.3f, %.3f); step(%.3f, %.3f); depths: %s"
+                     % (self.lat_0, self.lon_0, self.lat_step, self.lon_step, self.num_levels))
+
+        self.has_data_loaded = True
+        return True
+
+    def open_datasets(self) -> bool:
+        """Open the atlas netCDF files (if not already open)"""
+        if self.t_annual is not None:
+            return True
+
         try:
             self.t_annual = Dataset(os.path.join(self.data_folder, "temperature_annual_1deg.nc"))
             self.t_monthly = Dataset(os.path.join(self.data_folder, "temperature_monthly_1deg.nc"))
             self.t_seasonal = Dataset(os.path.join(self.data_folder, "temperature_seasonal_1deg.nc"))
             self.s_monthly = Dataset(os.path.join(self.data_folder, "salinity_monthly_1deg.nc"))
             self.s_seasonal = Dataset(os.path.join(self.data_folder, "salinity_seasonal_1deg.nc"))
-            landsea = np.genfromtxt((os.path.join(self.data_folder, "landsea.msk")))
-            self.landsea = landsea.reshape((180, 360))
-            # basin = np.genfromtxt((os.path.join(self.folder, "basin.msk")))
-            # self.basin = basin.reshape((33, 180, 360))
 
         except Exception as e:
             logger.error("issue in reading the netCDF data: %s" % e)
+            self.close_datasets()
             return False
 
-        # What's our grid interval in lat/long
-        self.lat_step = self.t_monthly.variables['lat'][1] - self.t_monthly.variables['lat'][0]
-        self.lat_0 = self.t_monthly.variables['lat'][0]
-        self.lon_step = self.t_monthly.variables['lon'][1] - self.t_monthly.variables['lon'][0]
-        self.lon_0 = self.t_monthly.variables['lon'][0]
-        # How many depth levels do we have?
-        self.num_levels = self.t_seasonal.variables['depth'].size
-        logger.debug("0(%.3f, %.3f); step(%.3f, %.3f); depths: %s"
-                     % (self.lat_0, self.lon_0, self.lat_step, self.lon_step, self.num_levels))
-
         return True
 
+    def close_datasets(self) -> None:
+        """Close the atlas netCDF files"""
+        for name in ['t_annual', 't_monthly', 't_seasonal', 's_monthly', 's_seasonal']:
+            ds = getattr(self, name)
+            if ds:
+                ds.close()
+            setattr(self, name, None)
+
     def get_depth(self, lat: float, lon: float) -> float:
         """This helper method retrieve the max valid depth based on location"""
         lat_idx, lon_idx = self.grid_coords(lat, lon)
+        if not self.open_datasets():
+            raise RuntimeError('troubles in db load')
         t_profile = self.t_annual.variables['t_an'][0, :, lat_idx, lon_idx]
         index = 0
         for sample in range(t_profile.size):
@@ -128,23 +202,11 @@ class Woa09(AbstractAtlas):
 
     def calc_month_idx(self, jday: int) -> None:
         """Calculate the month index based on the julian day"""
-        min_value = 367
-        i = 0
-        for d in self.t_monthly.variables['time'][:]:
-            if math.fabs(d - jday) < min_value:
-                min_value = math.fabs(d - jday)
-                self.month_idx = int(i)
-            i += 1
+        self.month_idx = int(np.argmin(np.abs(self.month_days - jday)))
 
     def calc_season_idx(self, jday: int) -> None:
         """Calculate the season index based on the julian day"""
-        min_value = 367
-        i = 0
-        for d in self.t_seasonal.variables['time'][:]:
-            if math.fabs(d - jday) < min_value:
-                min_value = math.fabs(d - jday)
-                self.season_idx = int(i)
-            i += 1
+        self.season_idx = int(np.argmin(np.abs(self.season_days - jday)))
 
     def grid_coords(self, lat: float, lon: float) -> tuple:
         """This does a nearest neighbour lookup"""
@@ -157,6 +219,61 @@ class Woa09(AbstractAtlas):
         lon_idx = int(round((lon - self.lon_0) / self.lon_step, 0))
         return lat_idx, lon_idx
 
+    def _read_grids(self) -> np.ndarray:
+        """Read t_an, s_an, t_sd and s_sd (4 x levels x lats x lons) for the current month and season
+
+        The top of the seasonal grids is overwritten with the monthly grids. Null values are set to NaN.
+        """
+        if not self.open_datasets():
+            raise RuntimeError('troubles in db load')
+
+        grids = np.full((4, self.num_levels, self.lat.size, self.lon.size), np.nan, dtype=np.float32)
+        for k, (monthly_ds, seasonal_ds, var) in enumerate([(self.t_monthly, self.t_seasonal, 't_an'),
+                                                            (self.s_monthly, self.s_seasonal, 's_an'),
+                                                            (self.t_monthly, self.t_seasonal, 't_sd'),
+                                                            (self.s_monthly, self.s_seasonal, 's_sd')]):
+            seasonal = seasonal_ds.variables[var][self.season_idx]
+            monthly = monthly_ds.variables[var][self.month_idx]
+            seasonal[0:monthly.shape[0]] = monthly
+            grids[k, 0:seasonal.shape[0]] = np.ma.filled(seasonal.astype(np.float32), np.nan)
+        return grids
+
+    def _month_grids(self) -> np.ndarray:
+        """Return the (memory-mapped) month-over-season grids for the current month and season"""
+        key = (self.month_idx, self.season_idx)
+        grids = self._grids.get(key)
+        if grids is not None:
+            return grids
+
+        if not self.use_grid_cache:
+            self._grids = {key: self._read_grids()}  # only keep the latest grids in memory
+            return self._grids[key]
+
+        path = os.path.join(self.cache_folder, "woa09_%02d_%02d.npy" % key)
+        try:
+            grids = np.load(path, mmap_mode='r')
+
+        except (OSError, ValueError):
+            grids = self._read_grids()
+            try:
+                if not os.path.exists(self.cache_folder):
+                    os.makedirs(self.cache_folder)
+                tmp_path = path + ".%d.tmp" % os.getpid()
+                with open(tmp_path, 'wb') as fod:
+                    np.save(fod, grids)
+                os.replace(tmp_path, path)
+                grids = np.load(path, mmap_mode='r')
+
+            except OSError as e:
+                logger.info("unable to cache the grids, keep them in memory: %s" % e)
+
+        self._grids[key] = grids
+        return grids
+
+    def _query_group(self, datestamp: date) -> object:
+        """The month-over-season grids are selected by the julian day"""
+        return int(datestamp.strftime("%j"))
+
     def query(self, lat: float, lon: float, datestamp: Union[date, dt, None] = None, server_mode: bool = False):
         """Query WOA09 for passed location and timestamp"""
         if datestamp is None:
@@ -165,124 +282,103 @@ class Woa09(AbstractAtlas):
             datestamp = datestamp.date()
         if not isinstance(datestamp, date):
             raise RuntimeError("invalid date passed: %s" % type(datestamp))
-        logger.debug("query: %s @ (%.6f, %.6f)" % (datestamp, lon, lat))
 
-        # check the inputs
-        if (lat is None) or (lon is None) or (datestamp is None):
-            logger.error("invalid query: %s @ (%s, %s)" % (datestamp.strftime("%Y%m%d"), lon, lat))
-            return None
+        return self._query_points([(lat, lon, datestamp)], server_mode=server_mode)[0]
+
+    def _search_cells(self, lat: float, lon: float) -> Optional[tuple]:
+        """Return the indices of the grid nodes at sea around the passed position, with their distances"""
         if lon < 0:  # Make all longitudes positive
             lon += 360.0
 
-        if not self.has_data_loaded:
-            if not self.load_grids():
-                return None
-
-        # calculate month and season indices (based on julian day)
-        jd = int(datestamp.strftime("%j"))
-        self.calc_month_idx(jday=jd)
-        self.calc_season_idx(jday=jd)
-
         # Find the nearest grid node
         lat_base_idx, lon_base_idx = self.grid_coords(lat, lon)
-        lat_offsets = range(lat_base_idx - self.search_radius, lat_base_idx + self.search_radius + 1)
-        lon_offsets = range(lon_base_idx - self.search_radius, lon_base_idx + self.search_radius + 1)
+        lat_offsets = np.arange(lat_base_idx - self.search_radius, lat_base_idx + self.search_radius + 1)
+        lon_offsets = np.arange(lon_base_idx - self.search_radius, lon_base_idx + self.search_radius + 1)
+        lat_offsets = lat_offsets[(lat_offsets >= 0) & (lat_offsets < self.lat.size)]
+        lon_offsets %= self.lon.size
 
         # Search nodes surrounding the requested position to find the closest non-land
-        t = np.zeros(self.num_levels)
-        s = np.zeros(self.num_levels)
-        t_min = np.zeros(self.num_levels)
-        s_min = np.zeros(self.num_levels)
-        t_max = np.zeros(self.num_levels)
-        s_max = np.zeros(self.num_levels)
-        dist_arr = np.zeros(self.num_levels)
-        dist_t_sd = np.zeros(self.num_levels)
-        dist_s_sd = np.zeros(self.num_levels)
-        dist_arr[:] = 99999999
-        dist_t_sd[:] = 99999999
-        dist_s_sd[:] = 99999999
-        min_dist = 999999999
-        num_visited = 0
-        # These keep track of the closest node found, this will also
-        # be used to populate lat/lon of the cast to be delivered
-        lat_idx = -1
-        lon_idx = -1
-        for this_lat_index in lat_offsets:
-            for this_lon_index in lon_offsets:
-
-                if this_lon_index >= self.t_monthly.variables['lon'].size:
-                    this_lon_index -= self.t_monthly.variables['lon'].size
-
-                # Check to see if we're at sea or on land
-                if self.landsea[this_lat_index][this_lon_index] == 1:
-                    # logger.debug("at land: %s, %s" % (this_lat_index, this_lon_index))
-                    continue
-
-                # calculate the distance to the grid node
-                dist = self.g.distance(lon, lat, self.t_monthly.variables['lon'][this_lon_index],
-                                       self.t_monthly.variables['lat'][this_lat_index])
-
-                # Keep track of the closest valid grid node to report the pseudo-cast position
-                if dist < min_dist:
-                    min_dist = dist
-                    lat_idx = this_lat_index
-                    lon_idx = this_lon_index
-
-                # Extract monthly temperature and salinity profile for this location
-                t_profile = self.t_monthly.variables['t_an'][self.month_idx, :, this_lat_index, this_lon_index]
-                s_profile = self.s_monthly.variables['s_an'][self.month_idx, :, this_lat_index, this_lon_index]
-                # Extract seasonal temperature and salinity profile for this location
-                t_profile2 = self.t_seasonal.variables['t_an'][self.season_idx, :, this_lat_index, this_lon_index]
-                s_profile2 = self.s_seasonal.variables['s_an'][self.season_idx, :, this_lat_index, this_lon_index]
-
-                # Now do the same for the standard deviation profiles
-                t_sd_profile = self.t_monthly.variables['t_sd'][self.month_idx, :, this_lat_index, this_lon_index]
-                s_sd_profile = self.s_monthly.variables['s_sd'][self.month_idx, :, this_lat_index, this_lon_index]
-                t_sd_profile2 = self.t_seasonal.variables['t_sd'][self.season_idx, :, this_lat_index, this_lon_index]
-                s_sd_profile2 = self.s_seasonal.variables['s_sd'][self.season_idx, :, this_lat_index, this_lon_index]
-
-                # Overwrite the top of the seasonal profiles with the monthly profiles
-                t_profile2[0:t_profile.size] = t_profile
-                s_profile2[0:s_profile.size] = s_profile
-                t_sd_profile2[0:t_sd_profile.size] = t_sd_profile
-                s_sd_profile2[0:s_sd_profile.size] = s_sd_profile
-
-                # For each element in the profile, only keep those whose distance is closer than values
-                # found from previous iterations (maintain the closest value at each depth level)
-                for i in range(t_profile2.size):
-                    if (dist < dist_arr[i]) and (t_profile2[i] < 50.0) and \
-                            (s_profile2[i] < 500.0) and (s_profile2[i] >= 0):
-                        t[i] = t_profile2[i]
-                        s[i] = s_profile2[i]
-                        dist_arr[i] = dist
-
-                # Now do the same thing for the temperature standard deviations
-                for i in range(t_sd_profile2.size):
-                    if (dist < dist_t_sd[i]) and (t_sd_profile2[i] < 50.0) and (t_sd_profile2[i] > -2):
-                        t_min[i] = t_profile2[i] - t_sd_profile2[i]
-                        if t_min[i] < -2.0:  # can't have overly cold water
-                            t_min[i] = -2.0
-                        t_max[i] = t_profile2[i] + t_sd_profile2[i]
-                        dist_t_sd[i] = dist
-
-                # Now do the same thing for the salinity standard deviations
-                for i in range(s_sd_profile2.size):
-                    if (dist < dist_s_sd[i]) and (s_sd_profile2[i] < 500.0) and (s_sd_profile2[i] >= 0):
-                        s_min[i] = s_profile2[i] - s_sd_profile2[i]
-                        if s_min[i] < 0:  # Can't have a negative salinity
-                            s_min[i] = 0
-                        s_max[i] = s_profile2[i] + s_sd_profile2[i]
-                        dist_s_sd[i] = dist
-
-                num_visited += 1
-
-        # logger.debug("visited: %s" % num_visited)
-
-        if (lat_idx == -1) and (lon_idx == -1):
+        lat_idxs, lon_idxs = [idxs.ravel() for idxs in np.meshgrid(lat_offsets, lon_offsets, indexing='ij')]
+        at_sea = self.landsea[lat_idxs, lon_idxs] != 1
+        if not at_sea.any():
             logger.info("possible request on land")
             return None
+        lat_idxs = lat_idxs[at_sea]
+        lon_idxs = lon_idxs[at_sea]
 
-        valid = dist_arr != 99999999
+        # calculate the distance to the grid nodes
+        dists = self.g.distance_many(lon, lat, self.lon[lon_idxs], self.lat[lat_idxs])
+        return lat_idxs, lon_idxs, dists
+
+    def _query_points(self, points: List[tuple], server_mode: bool = False) -> List[Optional[ProfileList]]:
+        """Query the points of a julian day at once, gathering the profiles of all their grid nodes together"""
+        results = [None] * len(points)
+
+        if not self.has_data_loaded:
+            if not self.load_grids():
+                logger.error("No data")
+                return results
+
+        # calculate month and season indices (based on julian day)
+        jd = int(points[0][2].strftime("%j"))
+        self.calc_month_idx(jday=jd)
+        self.calc_season_idx(jday=jd)
+
+        queried = list()
+        for i, (lat, lon, datestamp) in enumerate(points):
+            logger.debug("query: %s @ (%s, %s)" % (datestamp, lon, lat))
+            # check the inputs
+            if (lat is None) or (lon is None):
+                logger.error("invalid query: %s @ (%s, %s)" % (datestamp.strftime("%Y%m%d"), lon, lat))
+                continue
+            cells = self._search_cells(lat=lat, lon=lon)
+            if cells is not None:
+                queried.append((i, cells))
+        if len(queried) == 0:
+            return results
+
+        # the grid nodes of all the points (points x nodes), padded by repeating their nodes at infinite distance
+        num_cells = max([cells[2].size for _, cells in queried])
+        lat_idxs = np.array([np.resize(cells[0], num_cells) for _, cells in queried])
+        lon_idxs = np.array([np.resize(cells[1], num_cells) for _, cells in queried])
+        dists = np.full((len(queried), num_cells), np.inf)
+        for j, (_, cells) in enumerate(queried):
+            dists[j, :cells[2].size] = cells[2]
+
+        # month-over-season profiles (points x levels x nodes)
+        profiles = self._month_grids()[:, :, lat_idxs, lon_idxs]
+        t_profiles, s_profiles, t_sd_profiles, s_sd_profiles = np.moveaxis(profiles, 2, 1)
+
+        # For each depth level, only keep the values from the closest grid node with valid values
+        nearest, found = self._nearest_valid(dists, (t_profiles < 50.0) & (s_profiles < 500.0) & (s_profiles >= 0))
+        t = np.where(found, self._at_nearest(t_profiles, nearest), 0.0).astype(np.float64)
+        s = np.where(found, self._at_nearest(s_profiles, nearest), 0.0).astype(np.float64)
+
+        # Now do the same thing for the temperature standard deviations
+        nearest, found_t_sd = self._nearest_valid(dists, (t_sd_profiles < 50.0) & (t_sd_profiles > -2))
+        t_an = self._at_nearest(t_profiles, nearest)
+        t_sd = self._at_nearest(t_sd_profiles, nearest)
+        t_min = np.where(found_t_sd, np.maximum(t_an - t_sd, -2.0), 0.0).astype(np.float64)  # not overly cold
+        t_max = np.where(found_t_sd, t_an + t_sd, 0.0).astype(np.float64)
+
+        # Now do the same thing for the salinity standard deviations
+        nearest, found_s_sd = self._nearest_valid(dists, (s_sd_profiles < 500.0) & (s_sd_profiles >= 0))
+        s_an = self._at_nearest(s_profiles, nearest)
+        s_sd = self._at_nearest(s_sd_profiles, nearest)
+        s_min = np.where(found_s_sd, np.maximum(s_an - s_sd, 0.0), 0.0).astype(np.float64)  # not negative
+        s_max = np.where(found_s_sd, s_an + s_sd, 0.0).astype(np.float64)
+
+        for j, (i, _) in enumerate(queried):
+            lat, lon, datestamp = points[i]
+            results[i] = self._build_profiles(lat=lat, lon=lon, datestamp=datestamp, t=t[j], s=s[j], valid=found[j],
+                                              t_min=t_min[j], t_max=t_max[j], s_min=s_min[j], s_max=s_max[j],
+                                              found_sd=found_t_sd[j] & found_s_sd[j])
+        return results
+
+    def _build_profiles(self, lat: float, lon: float, datestamp: date, t: np.ndarray, s: np.ndarray,
+                        valid: np.ndarray, t_min: np.ndarray, t_max: np.ndarray, s_min: np.ndarray,
+                        s_max: np.ndarray, found_sd: np.ndarray) -> ProfileList:
+        """Populate the mean, min and max profiles from the values of the nearest valid grid nodes by level"""
         num_values = t[valid].size
 
         if lon > 180.0:  # Go back to negative longitude
@@ -297,7 +393,7 @@ class Woa09(AbstractAtlas):
         ssp.meta.utc_time = dt(year=datestamp.year, month=datestamp.month, day=datestamp.day)
         ssp.meta.original_path = "WOA09_%s" % datestamp.strftime("%Y%m%d")
         ssp.init_data(num_values)
-        ssp.data.depth = self.t_seasonal.variables['depth'][0:num_values]
+        ssp.data.depth = self.depth[0:num_values]
         ssp.data.temp = t[valid]
         ssp.data.sal = s[valid]
         ssp.calc_data_speed()
@@ -306,11 +402,9 @@ class Woa09(AbstractAtlas):
 
         # - min/max
         # Isolate realistic values
-        for i in range(t_min.size):
-
-            if dist_t_sd[i] == 99999999 or dist_s_sd[i] == 99999999:
-                num_values = i
-                break
+        missing_sd = np.flatnonzero(~found_sd)
+        if len(missing_sd) > 0:
+            num_values = missing_sd[0]
 
         # -- min
         ssp_min = Profile()
@@ -321,7 +415,7 @@ class Woa09(AbstractAtlas):
         ssp_min.meta.utc_time = dt(year=datestamp.year, month=datestamp.month, day=datestamp.day)
         if num_values > 0:
             ssp_min.init_data(num_values)
-            ssp_min.data.depth = self.t_seasonal.variables['depth'][0:num_values]
+            ssp_min.data.depth = self.depth[0:num_values]
             ssp_min.data.temp = t_min[valid][0:num_values]
             ssp_min.data.sal = s_min[valid][0:num_values]
             ssp_min.calc_data_speed()
@@ -339,7 +433,7 @@ class Woa09(AbstractAtlas):
         ssp_max.meta.utc_time = dt(year=datestamp.year, month=datestamp.month, day=datestamp.day)
         if num_values > 0:
             ssp_max.init_data(num_values)
-            ssp_max.data.depth = self.t_seasonal.variables['depth'][0:num_values].astype(np.float64)
+            ssp_max.data.depth = self.depth[0:num_values].astype(np.float64)
             ssp_max.data.temp = t_max[valid][0:num_values]
             ssp_max.data.sal = s_max[valid][0:num_values]
             ssp_max.calc_data_speed()
@@ -361,24 +455,15 @@ class Woa09(AbstractAtlas):
     def clear_data(self) -> None:
         """Delete the data and reset the last loaded day"""
         logger.debug("clearing data")
+        self.close_datasets()
         if self.has_data_loaded:
-            if self.t_annual:
-                self.t_annual.close()
-            self.t_annual = None
-            if self.t_monthly:
-                self.t_monthly.close()
-            self.t_monthly = None
-            if self.t_seasonal:
-                self.t_seasonal.close()
-            self.t_seasonal = None
-            if self.s_monthly:
-                self.s_monthly.close()
-            self.s_monthly = None
-            if self.s_seasonal:
-                self.s_seasonal.close()
-            self.s_seasonal = None
             self.landsea = None
             # self.basin = None
+            self.lat = None
+            self.lon = None
+            self.depth = None
+            self.month_days = None
+            self.season_days = None
             self.lat_step = None
             self.lon_step = None
             self.lat_0 = None
@@ -386,6 +471,7 @@ class Woa09(AbstractAtlas):
             self.num_levels = None
             self.month_idx = 0
             self.season_idx = 0
+        self._grids = dict()
         self.has_data_loaded = False
 
     # --- repr
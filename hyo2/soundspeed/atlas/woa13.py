@@ -4,7 +4,7 @@ import numpy as np
 from netCDF4 import Dataset
 import logging
 from datetime import datetime as dt, date
-from typing import Union
+from typing import List, Optional, Union
 
 from hyo2.abc.lib.ftp import Ftp
 
@@ -39,6 +39,12 @@ class Woa13(AbstractAtlas):
         self.month_idx = 0
         self.season_idx = 0
 
+        # month-over-season grids are cached (as memory-mapped .npy tiles) on first use
+        self.use_grid_cache = True
+        self.cache_folder = os.path.join(self.data_folder, "cache")
+        self.tile_size = 32  # grid cells per tile side
+        self._tiles = dict()
+
     def is_present(self) -> bool:
         """Check the presence of one of the db file
 
@@ -124,6 +130,7 @@ class Woa13(AbstractAtlas):
             logger.error("issue in reading the netCDF data: %s" % e)
             return False
 
+        self.has_data_loaded = True
         return True
 
     def get_depth(self, lat: float, lon: float) -> float:
@@ -162,6 +169,85 @@ class Woa13(AbstractAtlas):
         logger.debug("grid coords: %s %s" % (lat_idx, lon_idx))
         return lat_idx, lon_idx
 
+    def _read_grids(self, lat_slice: slice, lon_slice: slice) -> np.ndarray:
+        """Read t_an, s_an, t_sd and s_sd (4 x levels x lats x lons) for the current month and season
+
+        The top of the seasonal grids is overwritten with the monthly grids. Null values are set to NaN.
+        """
+        grids = np.full((4, self.num_levels, lat_slice.stop - lat_slice.start, lon_slice.stop - lon_slice.start),
+                        np.nan, dtype=np.float32)
+        for k, (dss, var) in enumerate([(self.t, 't_an'), (self.s, 's_an'), (self.t, 't_sd'), (self.s, 's_sd')]):
+            seasonal = dss[self.season_idx].variables[var][0, :, lat_slice, lon_slice]
+            monthly = dss[self.month_idx].variables[var][0, :, lat_slice, lon_slice]
+            seasonal[0:monthly.shape[0]] = monthly
+            grids[k, 0:seasonal.shape[0]] = np.ma.filled(seasonal.astype(np.float32), np.nan)
+        return grids
+
+    def _tile(self, tile_lat: int, tile_lon: int) -> np.ndarray:
+        """Return the (memory-mapped) cache tile for the current month and season, creating it on first use"""
+        key = (self.month_idx, self.season_idx, tile_lat, tile_lon)
+        tile = self._tiles.get(key)
+        if tile is not None:
+            return tile
+
+        path = os.path.join(self.cache_folder, "woa13_%02d_%02d_%03d_%03d.npy" % key)
+        try:
+            tile = np.load(path, mmap_mode='r')
+
+        except (OSError, ValueError):
+            tile = self._read_grids(slice(tile_lat * self.tile_size,
+                                          min((tile_lat + 1) * self.tile_size, self.lat.size)),
+                                    slice(tile_lon * self.tile_size,
+                                          min((tile_lon + 1) * self.tile_size, self.lon.size)))
+            try:
+                if not os.path.exists(self.cache_folder):
+                    os.makedirs(self.cache_folder)
+                tmp_path = path + ".%d.tmp" % os.getpid()
+                with open(tmp_path, 'wb') as fod:
+                    np.save(fod, tile)
+                os.replace(tmp_path, path)
+                tile = np.load(path, mmap_mode='r')
+
+            except OSError as e:
+                logger.info("unable to cache the grid tile, keep it in memory: %s" % e)
+
+        self._tiles[key] = tile
+        return tile
+
+    def _grid_profiles(self, lat_idxs: np.ndarray, lon_idxs: np.ndarray) -> np.ndarray:
+        """Return t_an, s_an, t_sd and s_sd profiles (4 x levels x cells) for the passed grid cells"""
+        profiles = np.empty((4, self.num_levels, len(lat_idxs)), dtype=np.float32)
+
+        if self.use_grid_cache:
+            tile_ids = (lat_idxs // self.tile_size) * self.lon.size + lon_idxs // self.tile_size
+            for tile_id in np.unique(tile_ids):
+                in_tile = tile_ids == tile_id
+                tile = self._tile(int(lat_idxs[in_tile][0] // self.tile_size),
+                                  int(lon_idxs[in_tile][0] // self.tile_size))
+                profiles[:, :, in_tile] = tile[:, :, lat_idxs[in_tile] % self.tile_size,
+                                               lon_idxs[in_tile] % self.tile_size]
+            return profiles
+
+        # read the block of grid cells with the passed cells (in up to two slices across the anti-meridian)
+        lat_slice = slice(int(lat_idxs.min()), int(lat_idxs.max()) + 1)
+        if lon_idxs.max() - lon_idxs.min() < self.lon.size // 2:
+            lon_slices = [slice(int(lon_idxs.min()), int(lon_idxs.max()) + 1)]
+        else:
+            lon_slices = [slice(0, int(lon_idxs[lon_idxs < self.lon.size // 2].max()) + 1),
+                          slice(int(lon_idxs[lon_idxs >= self.lon.size // 2].min()), self.lon.size)]
+        for lon_slice in lon_slices:
+            in_slice = (lon_idxs >= lon_slice.start) & (lon_idxs < lon_slice.stop)
+            if not in_slice.any():
+                continue
+            block = self._read_grids(lat_slice, lon_slice)
+            profiles[:, :, in_slice] = block[:, :, lat_idxs[in_slice] - lat_slice.start,
+                                             lon_idxs[in_slice] - lon_slice.start]
+        return profiles
+
+    def _query_group(self, datestamp: date) -> object:
+        """The month-over-season grids only depend on the month"""
+        return datestamp.month
+
     def query(self, lat: float, lon: float, datestamp: Union[date, dt, None] = None, server_mode: bool = False):
         """Query WOA13 for passed location and timestamp"""
         if datestamp is None:
@@ -170,131 +256,102 @@ class Woa13(AbstractAtlas):
             datestamp = datestamp.date()
         if not isinstance(datestamp, date):
             raise RuntimeError("invalid date passed: %s" % type(datestamp))
-        logger.debug("query: %s @ (%.6f, %.6f)" % (datestamp, lon, lat))
-
-        # check the inputs
-        if (lat is None) or (lon is None) or (datestamp is None):
-            logger.error("invalid query: %s @ (%s, %s)" % (datestamp.strftime("%Y%m%d"), lon, lat))
-            return None
-
-        if not self.has_data_loaded:
-            if not self.load_grids():
-                logger.error("No data")
-                return None
 
-        self.calc_indices(month=datestamp.month)
+        return self._query_points([(lat, lon, datestamp)], server_mode=server_mode)[0]
 
+    def _search_cells(self, lat: float, lon: float) -> Optional[tuple]:
+        """Return the indices of the grid nodes at sea around the passed position, with their distances"""
         # Find the nearest grid node
         lat_base_idx, lon_base_idx = self.grid_coords(lat=lat, lon=lon)
-        lat_offsets = range(lat_base_idx - self.search_radius, lat_base_idx + self.search_radius + 1)
-        lon_offsets = range(lon_base_idx - self.search_radius, lon_base_idx + self.search_radius + 1)
+        lat_offsets = np.arange(lat_base_idx - self.search_radius, lat_base_idx + self.search_radius + 1)
+        lon_offsets = np.arange(lon_base_idx - self.search_radius, lon_base_idx + self.search_radius + 1)
+        lat_offsets = lat_offsets[(lat_offsets >= 0) & (lat_offsets < self.lat.size)]
+        lon_offsets %= self.lon.size
 
         # Search nodes surrounding the requested position to find the closest non-land
-        t = np.zeros(self.num_levels)
-        s = np.zeros(self.num_levels)
-        t_min = np.zeros(self.num_levels)
-        s_min = np.zeros(self.num_levels)
-        t_max = np.zeros(self.num_levels)
-        s_max = np.zeros(self.num_levels)
-        dist_arr = np.zeros(self.num_levels)
-        dist_t_sd = np.zeros(self.num_levels)
-        dist_s_sd = np.zeros(self.num_levels)
-        dist_arr[:] = 99999999
-        dist_t_sd[:] = 99999999
-        dist_s_sd[:] = 99999999
-        min_dist = 999999999
-        num_visited = 0
-        # These keep track of the closest node found, this will also
-        # be used to populate lat/lon of the cast to be delivered
-        lat_idx = -1
-        lon_idx = -1
-        for this_lat_index in lat_offsets:
-            for this_lon_index in lon_offsets:
-
-                if this_lon_index >= self.lon.size:
-                    # logger.debug("[%s] >= [%s]" % (this_lon_index, self.t[self.month_idx].variables['lon'].size))
-                    this_lon_index -= self.lat.size
-
-                # Check to see if we're at sea or on land
-                if self.landsea[this_lat_index][this_lon_index] == 1:
-                    # logger.debug("at land: %s, %s" % (this_lat_index, this_lon_index))
-                    # from matplotlib import pyplot
-                    # pyplot.imshow(self.landsea, origin='lower')
-                    # pyplot.scatter([this_lon_index], [this_lat_index], c='r', s=40)
-                    # pyplot.show()
-
-                    continue
-
-                # calculate the distance to the grid node
-                dist = self.g.distance(lon, lat, self.lon[this_lon_index], self.lat[this_lat_index])
-                # logger.debug("[%s %s] [%s %s]" % (self.lon.shape, self.lat.shape, this_lon_index, this_lat_index))
-                # logger.debug("dist: %s" % dist)
-
-                # Keep track of the closest valid grid node to report the pseudo-cast position
-                if dist < min_dist:
-                    min_dist = dist
-                    lat_idx = this_lat_index
-                    lon_idx = this_lon_index
-
-                # Extract monthly temperature and salinity profile for this location
-                t_profile = self.t[self.month_idx].variables['t_an'][0, :, this_lat_index, this_lon_index]
-                s_profile = self.s[self.month_idx].variables['s_an'][0, :, this_lat_index, this_lon_index]
-                # Extract seasonal temperature and salinity profile for this location
-                t_profile2 = self.t[self.season_idx].variables['t_an'][0, :, this_lat_index, this_lon_index]
-                s_profile2 = self.s[self.season_idx].variables['s_an'][0, :, this_lat_index, this_lon_index]
-
-                # Now do the same for the standard deviation profiles
-                t_sd_profile = self.t[self.month_idx].variables['t_sd'][0, :, this_lat_index, this_lon_index]
-                s_sd_profile = self.s[self.month_idx].variables['s_sd'][0, :, this_lat_index, this_lon_index]
-                t_sd_profile2 = self.t[self.season_idx].variables['t_sd'][0, :, this_lat_index, this_lon_index]
-                s_sd_profile2 = self.s[self.season_idx].variables['s_sd'][0, :, this_lat_index, this_lon_index]
-
-                # Overwrite the top of the seasonal profiles with the monthly profiles
-                t_profile2[0:t_profile.size] = t_profile
-                s_profile2[0:s_profile.size] = s_profile
-                t_sd_profile2[0:t_sd_profile.size] = t_sd_profile
-                s_sd_profile2[0:s_sd_profile.size] = s_sd_profile
-
-                # For each element in the profile, only keep those whose distance is closer than values
-                # found from previous iterations (maintain the closest value at each depth level)
-                # logger.debug("profile sz: %d\n%s" % (t_profile2.size, t_profile2))
-                for i in range(t_profile2.size):
-                    if dist >= dist_arr[i]:
-                        continue
-                    if (t_profile2[i] < 50.0) and (s_profile2[i] < 500.0) and (s_profile2[i] >= 0):
-                        t[i] = t_profile2[i]
-                        s[i] = s_profile2[i]
-                        dist_arr[i] = dist
-
-                # Now do the same thing for the temperature standard deviations
-                for i in range(t_sd_profile2.size):
-                    if dist >= dist_t_sd[i]:
-                        continue
-                    if (t_sd_profile2[i] < 50.0) and (t_sd_profile2[i] > -2):
-                        t_min[i] = t_profile2[i] - t_sd_profile2[i]
-                        if t_min[i] < -2.0:  # can't have overly cold water
-                            t_min[i] = -2.0
-                        t_max[i] = t_profile2[i] + t_sd_profile2[i]
-                        dist_t_sd[i] = dist
-
-                # Now do the same thing for the salinity standard deviations
-                for i in range(s_sd_profile2.size):
-                    if dist >= dist_s_sd[i]:
-                        continue
-                    if (s_sd_profile2[i] < 500.0) and (s_sd_profile2[i] >= 0):
-                        s_min[i] = s_profile2[i] - s_sd_profile2[i]
-                        if s_min[i] < 0:  # Can't have a negative salinity
-                            s_min[i] = 0
-                        s_max[i] = s_profile2[i] + s_sd_profile2[i]
-                        dist_s_sd[i] = dist
-
-                num_visited += 1
-
-        if (lat_idx == -1) and (lon_idx == -1):
+        lat_idxs, lon_idxs = [idxs.ravel() for idxs in np.meshgrid(lat_offsets, lon_offsets, indexing='ij')]
+        at_sea = self.landsea[lat_idxs, lon_idxs] != 1
+        if not at_sea.any():
             logger.info("possible request on land")
             return None
+        lat_idxs = lat_idxs[at_sea]
+        lon_idxs = lon_idxs[at_sea]
+
+        # calculate the distance to the grid nodes
+        dists = self.g.distance_many(lon, lat, self.lon[lon_idxs], self.lat[lat_idxs])
+        return lat_idxs, lon_idxs, dists
+
+    def _query_points(self, points: List[tuple], server_mode: bool = False) -> List[Optional[ProfileList]]:
+        """Query the points of a month at once, gathering the profiles of all their grid nodes together"""
+        results = [None] * len(points)
 
-        valid = dist_arr != 99999999
+        if not self.has_data_loaded:
+            if not self.load_grids():
+                logger.error("No data")
+                return results
+
+        self.calc_indices(month=points[0][2].month)
+
+        queried = list()
+        for i, (lat, lon, datestamp) in enumerate(points):
+            logger.debug("query: %s @ (%s, %s)" % (datestamp, lon, lat))
+            # check the inputs
+            if (lat is None) or (lon is None):
+                logger.error("invalid query: %s @ (%s, %s)" % (datestamp.strftime("%Y%m%d"), lon, lat))
+                continue
+            cells = self._search_cells(lat=lat, lon=lon)
+            if cells is not None:
+                queried.append((i, cells))
+        if len(queried) == 0:
+            return results
+
+        # the grid nodes of all the points (points x nodes), padded by repeating their nodes at infinite distance
+        num_cells = max([cells[2].size for _, cells in queried])
+        lat_idxs = np.array([np.resize(cells[0], num_cells) for _, cells in queried])
+        lon_idxs = np.array([np.resize(cells[1], num_cells) for _, cells in queried])
+        dists = np.full((len(queried), num_cells), np.inf)
+        for j, (_, cells) in enumerate(queried):
+            dists[j, :cells[2].size] = cells[2]
+
+        # month-over-season profiles (points x levels x nodes)
+        if self.use_grid_cache:  # gathered from the cached tiles at once
+            profiles = self._grid_profiles(lat_idxs.ravel(), lon_idxs.ravel())
+        else:  # read by block around each point
+            profiles = np.concatenate([self._grid_profiles(point_lat_idxs, point_lon_idxs)
+                                       for point_lat_idxs, point_lon_idxs in zip(lat_idxs, lon_idxs)], axis=2)
+        profiles = profiles.reshape((4, self.num_levels) + lat_idxs.shape)
+        t_profiles, s_profiles, t_sd_profiles, s_sd_profiles = np.moveaxis(profiles, 2, 1)
+
+        # For each depth level, only keep the values from the closest grid node with valid values
+        nearest, found = self._nearest_valid(dists, (t_profiles < 50.0) & (s_profiles < 500.0) & (s_profiles >= 0))
+        t = np.where(found, self._at_nearest(t_profiles, nearest), 0.0).astype(np.float64)
+        s = np.where(found, self._at_nearest(s_profiles, nearest), 0.0).astype(np.float64)
+
+        # Now do the same thing for the temperature standard deviations
+        nearest, found_t_sd = self._nearest_valid(dists, (t_sd_profiles < 50.0) & (t_sd_profiles > -2))
+        t_an = self._at_nearest(t_profiles, nearest)
+        t_sd = self._at_nearest(t_sd_profiles, nearest)
+        t_min = np.where(found_t_sd, np.maximum(t_an - t_sd, -2.0), 0.0).astype(np.float64)  # not overly cold
+        t_max = np.where(found_t_sd, t_an + t_sd, 0.0).astype(np.float64)
+
+        # Now do the same thing for the salinity standard deviations
+        nearest, found_s_sd = self._nearest_valid(dists, (s_sd_profiles < 500.0) & (s_sd_profiles >= 0))
+        s_an = self._at_nearest(s_profiles, nearest)
+        s_sd = self._at_nearest(s_sd_profiles, nearest)
+        s_min = np.where(found_s_sd, np.maximum(s_an - s_sd, 0.0), 0.0).astype(np.float64)  # not negative
+        s_max = np.where(found_s_sd, s_an + s_sd, 0.0).astype(np.float64)
+
+        for j, (i, _) in enumerate(queried):
+            lat, lon, datestamp = points[i]
+            results[i] = self._build_profiles(lat=lat, lon=lon, datestamp=datestamp, t=t[j], s=s[j], valid=found[j],
+                                              t_min=t_min[j], t_max=t_max[j], s_min=s_min[j], s_max=s_max[j],
+                                              found_sd=found_t_sd[j] & found_s_sd[j])
+        return results
+
+    def _build_profiles(self, lat: float, lon: float, datestamp: date, t: np.ndarray, s: np.ndarray,
+                        valid: np.ndarray, t_min: np.ndarray, t_max: np.ndarray, s_min: np.ndarray,
+                        s_max: np.ndarray, found_sd: np.ndarray) -> ProfileList:
+        """Populate the mean, min and max profiles from the values of the nearest valid grid nodes by level"""
         num_values = t[valid].size
         logger.debug("valid: %s" % num_values)
 
@@ -318,11 +375,9 @@ class Woa13(AbstractAtlas):
 
         # - min/max
         # Isolate realistic values
-        for i in range(t_min.size):
-
-            if dist_t_sd[i] == 99999999 or dist_s_sd[i] == 99999999:
-                num_values = i
-                break
+        missing_sd = np.flatnonzero(~found_sd)
+        if len(missing_sd) > 0:
+            num_values = missing_sd[0]
 
         # -- min
         ssp_min = Profile()
@@ -393,6 +448,7 @@ class Woa13(AbstractAtlas):
             self.num_levels = None
             self.month_idx = 0
             self.season_idx = 0
+        self._tiles = dict()
         self.has_data_loaded = False
 
     # --- repr
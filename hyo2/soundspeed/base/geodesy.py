@@ -164,13 +164,17 @@ class Geodesy:
         # print(point)
         return point.GetX(), point.GetY()
 
-    def __init__(self):
-        """ Initialization """
+    def __init__(self, ellps='WGS84'):
+        """ Initialization
+
+        Args:
+            ellps:              Ellipsoid (as named by pyproj) used by the geodetic methods
+        """
 
         GdalAux.check_gdal_data()
         GdalAux.check_proj4_data()
 
-        self.geo = Geod(ellps='WGS84')
+        self.geo = Geod(ellps=ellps)
 
     @classmethod
     def _convert_to_meter(cls, dist, units):
@@ -201,6 +205,18 @@ class Geodesy:
         r = 6371000  # Radius of earth in meters. Use 3956 for miles
         return c * r
 
+    @classmethod
+    def haversine_many(cls, longs_1, lats_1, longs_2, lats_2):
+        """ Calculate the great circle distances between two (broadcast) arrays of points on a spherical Earth"""
+        longs_1, lats_1, longs_2, lats_2 = map(np.radians, [longs_1, lats_1, longs_2, lats_2])
+
+        dlon = longs_2 - longs_1
+        dlat = lats_2 - lats_1
+        a = np.sin(dlat / 2) ** 2 + np.cos(lats_1) * np.cos(lats_2) * np.sin(dlon / 2) ** 2
+        c = 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+        r = 6371000  # Radius of earth in meters
+        return c * r
+
     def distance(self, long_1, lat_1, long_2, lat_2, units="m"):
         """ Returns distance in 'units' (default m) between two Lat Lon point sets
 
@@ -222,6 +238,76 @@ class Geodesy:
 
         return self._convert_to_meter(dist=dist, units=units)
 
+    def distance_many(self, long_0, lat_0, longs, lats, units="m", spherical=False):
+        """ Returns the distances in 'units' (default m) between a point and an array of points
+
+        Args:
+            long_0:             Longitude of the point
+            lat_0:              Latitude of the point
+            longs:              Longitudes of the other points
+            lats:               Latitudes of the other points
+            units:              Units (optional) can be "m", "km", "sm", or "nm"
+            spherical:          Use a spherical Earth (faster, less accurate)
+        Returns:
+            ndarray:            Distances (in the selected unit of measure), with the shape of the other points
+        """
+        return self.distance_broadcast(longs_1=long_0, lats_1=lat_0, longs_2=longs, lats_2=lats,
+                                       units=units, spherical=spherical)
+
+    def distance_broadcast(self, longs_1, lats_1, longs_2, lats_2, units="m", spherical=False):
+        """ Returns the distances in 'units' (default m) between the points of two arrays, element by element
+
+        The arrays are broadcast against each other (e.g., a point against an array of points).
+
+        Args:
+            longs_1:            Longitudes of the first points
+            lats_1:             Latitudes of the first points
+            longs_2:            Longitudes of the second points
+            lats_2:             Latitudes of the second points
+            units:              Units (optional) can be "m", "km", "sm", or "nm"
+            spherical:          Use a spherical Earth (faster, less accurate)
+        Returns:
+            ndarray:            Distances (in the selected unit of measure), with the broadcast shape
+        """
+        longs_1, lats_1, longs_2, lats_2 = np.broadcast_arrays(*[np.asarray(values, dtype=np.float64) for values in
+                                                                 (longs_1, lats_1, longs_2, lats_2)])
+        if longs_1.size == 0:
+            return np.zeros(longs_1.shape)
+
+        if spherical:
+            dist = self.haversine_many(longs_1=longs_1, lats_1=lats_1, longs_2=longs_2, lats_2=lats_2)
+
+        else:
+            try:
+                _, _, dist = self.geo.inv(lons1=np.ascontiguousarray(longs_1).ravel(),
+                                          lats1=np.ascontiguousarray(lats_1).ravel(),
+                                          lons2=np.ascontiguousarray(longs_2).ravel(),
+                                          lats2=np.ascontiguousarray(lats_2).ravel(), radians=False)
+                dist = np.asarray(dist, dtype=np.float64).reshape(longs_1.shape)
+
+            except ValueError:
+                dist = self.haversine_many(longs_1=longs_1, lats_1=lats_1, longs_2=longs_2, lats_2=lats_2)
+
+        return self._convert_to_meter(dist=dist, units=units)
+
+    def distance_pairwise(self, longs_1, lats_1, longs_2, lats_2, units="m", spherical=False):
+        """ Returns the distances in 'units' (default m) between each point of a set and each point of another set
+
+        Args:
+            longs_1:            Longitudes of the first set of points
+            lats_1:             Latitudes of the first set of points
+            longs_2:            Longitudes of the second set of points
+            lats_2:             Latitudes of the second set of points
+            units:              Units (optional) can be "m", "km", "sm", or "nm"
+            spherical:          Use a spherical Earth (faster, less accurate)
+        Returns:
+            ndarray:            Distances (in the selected unit of measure), first set x second set
+        """
+        longs_1 = np.ravel(longs_1)[:, np.newaxis]
+        lats_1 = np.ravel(lats_1)[:, np.newaxis]
+        return self.distance_broadcast(longs_1=longs_1, lats_1=lats_1, longs_2=np.ravel(longs_2)[np.newaxis, :],
+                                       lats_2=np.ravel(lats_2)[np.newaxis, :], units=units, spherical=spherical)
+
     def forward(self, long_1, lat_1, bearing, dist, units="m"):
         """ Returns forward point in 'units' (default m) based on bearing and range in km
 
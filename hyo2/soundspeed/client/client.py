@@ -15,6 +15,8 @@ logger = logging.getLogger(__name__)
 
 class Client:
     UDP_DATA_LIMIT = (2 ** 16) - 28
+    KNG_SAMPLE_MAX_SIZE = 32  # worst-case size of a Kongsberg sample line (e.g., "12000.00,1675.8,-2.00,40.00,\r\n")
+    KNG_EXTRA_MAX_SIZE = 256  # worst-case size of the Kongsberg header and trailer
 
     def __init__(self, client: str) -> None:
         # print(client)
@@ -54,15 +56,21 @@ class Client:
 
         apply_thin = True
         apply_12k = True
-        tolerances = [0.1, 0.5]
+        tolerance = 0.1
         if self.protocol == "QINSY":
             apply_12k = False
-            tolerances = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5]
+            tolerance = 0.001
+
+        # thin to the number of samples that surely fits in a datagram
+        max_points = (self.UDP_DATA_LIMIT - self.KNG_EXTRA_MAX_SIZE) // self.KNG_SAMPLE_MAX_SIZE
+        if self.protocol in ["SIS", "KCTRL"]:  # and that is accepted by the listened Kongsberg system
+            max_points = min(max_points, prj.kng_max_points())
 
         tx_data = None
-        for tolerance in tolerances:
+        while max_points > 2:
 
-            if not prj.prepare_sis(apply_thin=apply_thin, apply_12k=apply_12k, thin_tolerance=tolerance):
+            if not prj.prepare_sis(apply_thin=apply_thin, apply_12k=apply_12k, thin_tolerance=tolerance,
+                                   thin_max_points=max_points):
                 logger.info("issue in preparing the data")
                 return False
 
@@ -70,10 +78,14 @@ class Client:
             tx_data = asvp.convert(prj.ssp, fmt=kng_fmt)
             # print(tx_data)
             tx_data_size = len(tx_data)
-            logger.debug("tx data size: %d (with tolerance: %.3f)" % (tx_data_size, tolerance))
+            logger.debug("tx data size: %d (with tolerance: %.3f, max points: %d)"
+                         % (tx_data_size, tolerance, max_points))
             if tx_data_size < self.UDP_DATA_LIMIT:
                 break
 
+            # this should never happen with worst-case sizes, but just in case: shrink the budget
+            max_points = int(max_points * self.UDP_DATA_LIMIT / tx_data_size) - 1
+
         return self._transmit(tx_data)
 
     def send_hyp_format(self, prj: 'SoundSpeedLibrary') -> bool:
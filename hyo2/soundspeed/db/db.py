@@ -1,6 +1,8 @@
 import sqlite3
 import os
 import datetime
+import itertools
+import math
 # import traceback
 import numpy as np
 import logging
@@ -16,9 +18,25 @@ logger = logging.getLogger(__name__)
 
 
 class ProjectDb:
-    """Class that provides an interface to a SQLite db with Sound Speed data"""
+    """Class that provides an interface to a SQLite db with Sound Speed data
 
-    def __init__(self, projects_folder=None, project_name=None):
+    The samples of each profile are stored in the 'data', 'proc' and 'sis' tables (one row per sample). With
+    'compact_storage', each of these sample sets is instead stored as a single binary blob in the 'samples_blob'
+    table. Profiles stored with both modes can be read back.
+
+    'compact_storage' is an API-only option (e.g., for scripts storing large numbers of casts): it is not part of the
+    project setup, and SoundSpeedLibrary always opens the project databases with the default storage, so that the
+    stored samples can also be read by the releases of the library before the blob storage.
+    """
+
+    sample_tables = ('data', 'proc', 'sis')
+    # fields of the 'data', 'proc' and 'sis' tables with the corresponding Samples attribute
+    sample_fields = (('pressure', 'pressure'), ('depth', 'depth'), ('speed', 'speed'), ('temperature', 'temp'),
+                     ('conductivity', 'conductivity'), ('salinity', 'sal'), ('source', 'source'), ('flag', 'flag'))
+    # layout of the samples stored as blob
+    sample_dtype = np.dtype([(field, '<f8') for field, _ in sample_fields])
+
+    def __init__(self, projects_folder=None, project_name=None, compact_storage=False):
 
         # in case that no data folder is passed
         if projects_folder is None:
@@ -43,7 +61,12 @@ class ProjectDb:
         self.tmp_data = None
         self.tmp_ssp_pk = None
 
-        self.cur_version = 3
+        # store the samples of each profile as binary blobs
+        self.compact_storage = compact_storage
+        # spatio-temporal index through the SQLite R*Tree module (if available)
+        self.has_rtree = False
+
+        self.cur_version = 6
 
         self.reconnect_or_create()
 
@@ -155,8 +178,23 @@ class ProjectDb:
                 # noinspection SqlResolve
                 ret = self.conn.execute("""SELECT version FROM library""").fetchone()
                 if ret[0] < 3:
-                    logger.debug("updated old library version from %s to %s" % (ret[0], self.cur_version))
+                    logger.debug("updated old library version from %s to %s" % (ret[0], 3))
                     self._updates_to_version_3(old_version=ret[0])
+                    # noinspection SqlResolve
+                    ret = self.conn.execute("""SELECT version FROM library""").fetchone()
+                if ret[0] < 4:
+                    logger.debug("updated old library version from %s to %s" % (ret[0], 4))
+                    self._updates_to_version_4(old_version=ret[0])
+                    # noinspection SqlResolve
+                    ret = self.conn.execute("""SELECT version FROM library""").fetchone()
+                if ret[0] < 5:
+                    logger.debug("updated old library version from %s to %s" % (ret[0], 5))
+                    self._updates_to_version_5(old_version=ret[0])
+                    # noinspection SqlResolve
+                    ret = self.conn.execute("""SELECT version FROM library""").fetchone()
+                if ret[0] < 6:
+                    logger.debug("updated old library version from %s to %s" % (ret[0], 6))
+                    self._updates_to_version_6(old_version=ret[0])
 
                 self.conn.execute("""
                                   CREATE TABLE IF NOT EXISTS ssp_pk(
@@ -238,6 +276,10 @@ class ProjectDb:
                                         REFERENCES ssp(pk))
                                   """)
 
+                self._create_samples_blob_table()
+                self._create_ssp_summary_table()
+                self._create_ssp_index_tables()
+
                 # noinspection SqlResolve
                 self.conn.execute("""
                                   CREATE VIEW IF NOT EXISTS ssp_view AS
@@ -267,6 +309,19 @@ class ProjectDb:
             logger.error("during building tables, %s: %s" % (type(e), e))
             return False
 
+    def _create_samples_blob_table(self):
+        # noinspection SqlResolve
+        self.conn.execute("""
+                          CREATE TABLE IF NOT EXISTS samples_blob(
+                             ssp_pk integer NOT NULL,
+                             kind text NOT NULL,
+                             num_samples integer NOT NULL,
+                             samples blob NOT NULL,
+                             PRIMARY KEY (ssp_pk, kind),
+                             FOREIGN KEY(ssp_pk)
+                                REFERENCES ssp(pk))
+                          """)
+
     def remove_casts(self, ssp):
         if not isinstance(ssp, ProfileList):
             raise RuntimeError("not passed a ProfileList, but %s" % type(ssp))
@@ -328,6 +383,12 @@ class ProjectDb:
                         if not self._add_sis():
                             raise sqlite3.Error("unable to add ssp sis data samples")
 
+                    if not self._add_summary():
+                        raise sqlite3.Error("unable to add ssp summary")
+
+                    if not self._add_index():
+                        raise sqlite3.Error("unable to add ssp to the spatio-temporal index")
+
             return True
 
         except sqlite3.Error as e:
@@ -420,6 +481,36 @@ class ProjectDb:
             logger.error("during deletion from sis, %s: %s" % (type(e), e))
             return False
 
+        try:
+            # noinspection SqlResolve
+            self.conn.execute("""DELETE FROM samples_blob WHERE ssp_pk=?""", (self.tmp_ssp_pk,))
+            # logger.info("deleted %s pk entries from samples_blob" % self.tmp_ssp_pk)
+
+        except sqlite3.Error as e:
+            logger.error("during deletion from samples_blob, %s: %s" % (type(e), e))
+            return False
+
+        try:
+            # noinspection SqlResolve
+            self.conn.execute("""DELETE FROM ssp_summary WHERE pk=?""", (self.tmp_ssp_pk,))
+            # logger.info("deleted %s pk entry from ssp_summary" % self.tmp_ssp_pk)
+
+        except sqlite3.Error as e:
+            logger.error("during deletion from ssp_summary, %s: %s" % (type(e), e))
+            return False
+
+        try:
+            # noinspection SqlResolve
+            self.conn.execute("""DELETE FROM ssp_index WHERE pk=?""", (self.tmp_ssp_pk,))
+            if self.has_rtree:
+                # noinspection SqlResolve
+                self.conn.execute("""DELETE FROM ssp_rtree WHERE pk=?""", (self.tmp_ssp_pk,))
+            # logger.info("deleted %s pk entry from ssp_index" % self.tmp_ssp_pk)
+
+        except sqlite3.Error as e:
+            logger.error("during deletion from ssp_index, %s: %s" % (type(e), e))
+            return False
+
         try:
             # noinspection SqlResolve
             self.conn.execute("""DELETE FROM ssp WHERE pk=?""", (self.tmp_ssp_pk,))
@@ -479,112 +570,172 @@ class ProjectDb:
         return True
 
     def _add_data(self):
+        if not self._add_samples(table='data', samples=self.tmp_data.data):
+            logger.error("during adding ssp raw samples")
+            return False
+        return True
 
-        sz = self.tmp_data.data.num_samples
-        # logger.info("num samples to add: %s" % sz)
+    def _add_proc(self):
+        if not self._add_samples(table='proc', samples=self.tmp_data.proc):
+            logger.error("during adding ssp processed samples")
+            return False
+        return True
 
-        added_samples = 0
-        for i in range(sz):
+    def _add_sis(self):
+        if not self._add_samples(table='sis', samples=self.tmp_data.sis):
+            logger.error("during adding ssp sis samples")
+            return False
+        return True
 
-            try:
-                # first check if the sample is already present with exactly the same values
+    def _add_samples(self, table, samples):
+        """Bulk insertion of the passed samples in the 'data', 'proc' or 'sis' table (or as a blob)"""
+
+        array = self._samples_to_array(samples)
+        # logger.info("num samples to add: %s" % len(array))
+        if len(array) < samples.num_samples:
+            logger.info("skipping %d %s rows with invalid depth, source or flag"
+                        % (samples.num_samples - len(array), table))
+
+        try:
+            if self.compact_storage:
                 # noinspection SqlResolve
                 self.conn.execute("""
-                                  INSERT INTO data VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                                  """, (self.tmp_ssp_pk,
-                                        self.tmp_data.data.pressure[i],
-                                        self.tmp_data.data.depth[i],
-                                        self.tmp_data.data.speed[i],
-                                        self.tmp_data.data.temp[i],
-                                        self.tmp_data.data.conductivity[i],
-                                        self.tmp_data.data.sal[i],
-                                        self.tmp_data.data.source[i],
-                                        self.tmp_data.data.flag[i],
-                                        ))
-                added_samples += 1
-            except sqlite3.IntegrityError as e:
-                logger.info("skipping row #%s due to %s: %s" % (i, type(e), e))
-                continue
-            except sqlite3.Error as e:
-                print(self.tmp_data.data.depth[i], type(self.tmp_data.data.depth[i]))
-                # traceback.print_stack()
-                logger.error("during adding ssp raw samples, %s: %s" % (type(e), e))
-                return False
+                                  INSERT INTO samples_blob VALUES (?, ?, ?, ?)
+                                  """, (self.tmp_ssp_pk, table, len(array), array.tobytes()))
+
+            else:
+                # noinspection SqlResolve
+                self.conn.executemany("""
+                                      INSERT INTO %s VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                      """ % table,
+                                      zip(itertools.repeat(self.tmp_ssp_pk),
+                                          *[array[field].tolist() for field, _ in self.sample_fields]))
 
-        # logger.info("added %s raw samples" % added_samples)
+        except sqlite3.Error as e:
+            logger.error("during adding ssp %s samples, %s: %s" % (table, type(e), e))
+            return False
+
+        # logger.info("added %s %s samples" % (len(array), table))
         return True
 
-    def _add_proc(self):
+    @classmethod
+    def _samples_to_array(cls, samples):
+        """Return the samples to store as a structured array
 
-        sz = self.tmp_data.proc.num_samples
-        # logger.info("max processed samples to add: %s" % sz)
+        The samples that violate the NOT NULL constraints of the sample tables (NaN is stored as NULL) are skipped.
+        """
+        sz = samples.num_samples
+        if sz == 0:  # the sample arrays may not be initialized
+            return np.empty(0, dtype=cls.sample_dtype)
 
-        added_samples = 0
-        for i in range(sz):
+        valid = ~(np.isnan(samples.depth[:sz]) | np.isnan(samples.source[:sz]) | np.isnan(samples.flag[:sz]))
 
-            try:
-                # first check if the sample is already present with exactly the same values
-                # noinspection SqlResolve
-                self.conn.execute("""
-                                  INSERT INTO proc VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                                  """, (self.tmp_ssp_pk,
-                                        self.tmp_data.proc.pressure[i],
-                                        self.tmp_data.proc.depth[i],
-                                        self.tmp_data.proc.speed[i],
-                                        self.tmp_data.proc.temp[i],
-                                        self.tmp_data.proc.conductivity[i],
-                                        self.tmp_data.proc.sal[i],
-                                        self.tmp_data.proc.source[i],
-                                        self.tmp_data.proc.flag[i],
-                                        ))
-                added_samples += 1
-
-            except sqlite3.IntegrityError as e:
-                logger.info("skipping row #%s due to %s: %s" % (i, type(e), e))
-                continue
-            except sqlite3.Error as e:
-                logger.error("during adding ssp processed samples, %s: %s" % (type(e), e))
-                return False
+        array = np.empty(np.count_nonzero(valid), dtype=cls.sample_dtype)
+        for field, attr in cls.sample_fields:
+            array[field] = getattr(samples, attr)[:sz][valid]
+        return array
 
-        # logger.info("added %s processed samples" % added_samples)
-        return True
+    def _add_summary(self):
+        """Store the values listed for each profile (computed from the processed samples)"""
 
-    def _add_sis(self):
+        summary = self._summary_from_proc(self._samples_to_array(self.tmp_data.proc))
 
-        sz = self.tmp_data.sis.num_samples
-        # logger.info("max sis samples to add: %s" % sz)
+        try:
+            # noinspection SqlResolve
+            self.conn.execute("""
+                              INSERT INTO ssp_summary VALUES (?, ?, ?, ?, ?)
+                              """, (self.tmp_ssp_pk,) + summary)
 
-        added_samples = 0
-        for i in range(sz):
+        except sqlite3.Error as e:
+            logger.error("during ssp summary addition, %s: %s" % (type(e), e))
+            return False
 
-            try:
-                # first check if the sample is already present with exactly the same values
+        return True
+
+    def _add_index(self):
+        """Add the cast position and time to the spatio-temporal index"""
+        return self._index_cast(pk=self.tmp_ssp_pk, longitude=self.tmp_data.meta.longitude,
+                                latitude=self.tmp_data.meta.latitude, utc_time=self.tmp_data.meta.utc_time)
+
+    def _index_cast(self, pk, longitude, latitude, utc_time):
+        timestamp = self._timestamp(utc_time)
+
+        try:
+            # noinspection SqlResolve
+            self.conn.execute("""
+                              INSERT OR REPLACE INTO ssp_index VALUES (?, ?, ?, ?)
+                              """, (pk, longitude, latitude, timestamp))
+            if self.has_rtree:
                 # noinspection SqlResolve
                 self.conn.execute("""
-                                  INSERT INTO sis VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                                  """, (self.tmp_ssp_pk,
-                                        self.tmp_data.sis.pressure[i],
-                                        self.tmp_data.sis.depth[i],
-                                        self.tmp_data.sis.speed[i],
-                                        self.tmp_data.sis.temp[i],
-                                        self.tmp_data.sis.conductivity[i],
-                                        self.tmp_data.sis.sal[i],
-                                        self.tmp_data.sis.source[i],
-                                        self.tmp_data.sis.flag[i],
-                                        ))
-                added_samples += 1
-
-            except sqlite3.IntegrityError as e:
-                logger.info("skipping row #%s due to %s: %s" % (i, type(e), e))
-                continue
+                                  INSERT OR REPLACE INTO ssp_rtree VALUES (?, ?, ?, ?, ?, ?, ?)
+                                  """, (pk, longitude, longitude, latitude, latitude, timestamp, timestamp))
 
-            except sqlite3.Error as e:
-                logger.error("during adding ssp sis samples, %s: %s" % (type(e), e))
-                return False
+        except sqlite3.Error as e:
+            logger.error("during ssp index addition, %s: %s" % (type(e), e))
+            return False
 
-        # logger.info("added %s sis samples" % added_samples)
         return True
 
+    @classmethod
+    def _timestamp(cls, utc_time):
+        """Convert a (naive) UTC datetime to the seconds since the epoch used by the spatio-temporal index"""
+        if utc_time.tzinfo is not None:
+            utc_time = utc_time.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return (utc_time - datetime.datetime(1970, 1, 1)).total_seconds()
+
+    @classmethod
+    def _summary_from_proc(cls, proc):
+        """Return surface sound speed, min depth, max depth and max raw (not extended) depth
+
+        The values are taken from the first and the last valid samples (None if not available).
+        """
+        proc = proc[proc['flag'] == Dicts.flags['valid']]
+        if len(proc) == 0:
+            return None, None, None, None
+
+        raw = proc[~np.isin(proc['source'], (Dicts.sources['woa09_ext'], Dicts.sources['woa13_ext'],
+                                             Dicts.sources['woa18_ext'],
+                                             Dicts.sources['rtofs_ext'], Dicts.sources['gomofs_ext'],
+                                             Dicts.sources['ref_ext'],))]
+        max_raw_depth = None
+        if len(raw) > 0:
+            max_raw_depth = float(raw['depth'][-1])
+
+        return float(proc['speed'][0]), float(proc['depth'][0]), float(proc['depth'][-1]), max_raw_depth
+
+    def _samples_blob(self, pk, table):
+        """Return the samples stored as blob for the passed pk and table (None if stored as rows)"""
+        # noinspection SqlResolve
+        ret = self.conn.execute("SELECT num_samples, samples FROM samples_blob WHERE ssp_pk=? AND kind=?",
+                                (pk, table)).fetchone()
+        if ret is None:
+            return None
+
+        return np.frombuffer(ret['samples'], dtype=self.sample_dtype, count=ret['num_samples'])
+
+    def _load_samples(self, pk, table):
+        """Return the samples for the passed pk and table as a structured array (with a single query)"""
+        samples = self._samples_blob(pk, table)
+        if samples is not None:
+            return samples
+
+        cursor = self.conn.cursor()
+        cursor.row_factory = None  # plain tuples
+        # noinspection SqlResolve
+        rows = cursor.execute("SELECT %s FROM %s WHERE ssp_pk=? ORDER BY rowid"
+                              % (", ".join(field for field, _ in self.sample_fields), table), (pk,)).fetchall()
+        if len(rows) == 0:
+            return np.empty(0, dtype=self.sample_dtype)
+
+        # the NULL values become NaN
+        return np.array(rows, dtype=np.float64).astype('<f8', copy=False).view(self.sample_dtype)[:, 0]
+
+    @classmethod
+    def _array_to_samples(cls, array, samples):
+        for field, attr in cls.sample_fields:
+            getattr(samples, attr)[:] = array[field]
+
     def timestamp_list(self):
         """Create and return the timestamp list (and the pk)"""
 
@@ -606,6 +757,132 @@ class ProjectDb:
                 logger.error("retrieving the time stamp list, %s: %s" % (type(e), e))
                 return None
 
+    def query_casts(self, bbox=None, time_range=None, sensor_types=None):
+        """Return the pks of the casts (sorted by time) in the passed bounding box, time range and sensor types
+
+        Args:
+            bbox:           (min_lon, min_lat, max_lon, max_lat) in decimal degrees, with min_lon > max_lon for boxes
+                            crossing the anti-meridian
+            time_range:     (start, end) as UTC datetimes, both included (None for an open range)
+            sensor_types:   list of sensor types (as in Dicts.sensor_types)
+        Returns:
+            list:           The selected pks (None in case of issues)
+        """
+        if not self.conn:
+            logger.error("missing db connection")
+            return None
+
+        tables = ["ssp_index i"]
+        conditions = list()
+        args = list()
+
+        if bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            conditions.append("i.latitude BETWEEN ? AND ?")
+            args.extend([min_lat, max_lat])
+            if min_lon <= max_lon:
+                conditions.append("i.longitude BETWEEN ? AND ?")
+                args.extend([min_lon, max_lon])
+            else:  # across the anti-meridian
+                conditions.append("(i.longitude >= ? OR i.longitude <= ?)")
+                args.extend([min_lon, max_lon])
+
+            if self.has_rtree:
+                tables.append("ssp_rtree r")
+                conditions.append("r.pk=i.pk AND r.max_lat>=? AND r.min_lat<=?")
+                args.extend([min_lat, max_lat])
+                if min_lon <= max_lon:
+                    conditions.append("r.max_lon>=? AND r.min_lon<=?")
+                    args.extend([min_lon, max_lon])
+
+        if time_range is not None:
+            start, end = time_range
+            if start is not None:
+                conditions.append("i.timestamp>=?")
+                args.append(self._timestamp(start))
+            if end is not None:
+                conditions.append("i.timestamp<=?")
+                args.append(self._timestamp(end))
+
+        if sensor_types is not None:
+            sensor_types = list(sensor_types)
+            if len(sensor_types) == 0:
+                return list()
+            tables.append("ssp s")
+            conditions.append("s.pk=i.pk AND s.sensor_type IN (%s)" % ", ".join("?" * len(sensor_types)))
+            args.extend(sensor_types)
+
+        sql = "SELECT i.pk FROM %s" % ", ".join(tables)
+        if len(conditions) > 0:
+            sql += " WHERE %s" % " AND ".join(conditions)
+        sql += " ORDER BY i.timestamp"
+
+        try:
+            # noinspection SqlResolve
+            return [row[0] for row in self.conn.execute(sql, args).fetchall()]
+
+        except sqlite3.Error as e:
+            logger.error("querying the casts, %s: %s" % (type(e), e))
+            return None
+
+    def nearest_cast(self, longitude, latitude, time_range=None, sensor_types=None):
+        """Return the pk of the cast nearest (on a sphere) to the passed position, among the ones in the time range
+
+        The search window is expanded until the nearest cast found is certainly the nearest one.
+        """
+        if not self.conn:
+            logger.error("missing db connection")
+            return None
+
+        radius = 0.1  # angular radius of the search window, in degrees
+        while True:
+
+            # bounding box of the spherical cap with the current radius
+            if radius >= 180.0:
+                bbox = None
+            else:
+                min_lat = max(latitude - radius, -90.0)
+                max_lat = min(latitude + radius, 90.0)
+                if (min_lat == -90.0) or (max_lat == 90.0) or \
+                        (math.sin(math.radians(radius)) >= math.cos(math.radians(latitude))):
+                    half_width = 180.0
+                else:
+                    half_width = math.degrees(math.asin(math.sin(math.radians(radius)) /
+                                                        math.cos(math.radians(latitude))))
+                if half_width >= 180.0:
+                    bbox = (-180.0, min_lat, 180.0, max_lat)
+                else:
+                    bbox = ((longitude - half_width + 180.0) % 360.0 - 180.0, min_lat,
+                            (longitude + half_width + 180.0) % 360.0 - 180.0, max_lat)
+
+            pks = self.query_casts(bbox=bbox, time_range=time_range, sensor_types=sensor_types)
+            if pks is None:
+                return None
+
+            if len(pks) > 0:
+                # noinspection SqlResolve
+                rows = self.conn.execute("SELECT pk, longitude, latitude FROM ssp_index WHERE pk IN (%s)"
+                                         % ", ".join("?" * len(pks)), pks).fetchall()
+                positions = np.array([(row[1], row[2]) for row in rows], dtype=np.float64)
+                distances = self._angular_distances(longitude, latitude, positions[:, 0], positions[:, 1])
+                nearest = int(np.argmin(distances))
+                # any cast within the radius is in the search window
+                if (distances[nearest] <= radius) or (bbox is None):
+                    return rows[nearest][0]
+
+            elif bbox is None:
+                return None
+
+            radius *= 4.0
+
+    @classmethod
+    def _angular_distances(cls, long_1, lat_1, longs_2, lats_2):
+        """Great circle distances (in degrees) between a point and the passed arrays of points"""
+        long_1, lat_1 = math.radians(long_1), math.radians(lat_1)
+        longs_2, lats_2 = np.radians(longs_2), np.radians(lats_2)
+        a = np.sin((lats_2 - lat_1) / 2) ** 2 + math.cos(lat_1) * np.cos(lats_2) * np.sin((longs_2 - long_1) / 2) ** 2
+        return np.degrees(2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0))))
+
     def list_profiles(self):
         if not self.conn:
             logger.error("missing db connection")
@@ -613,7 +890,10 @@ class ProjectDb:
 
         ssp_list = list()
         # noinspection SqlResolve
-        sql = self.conn.execute("SELECT * FROM ssp_view")
+        sql = self.conn.execute("""
+                                SELECT a.*, b.ss_at_min_depth, b.min_depth, b.max_depth, b.max_raw_depth
+                                   FROM ssp_view a LEFT OUTER JOIN ssp_summary b ON a.pk=b.pk
+                                """)
 
         try:
             with self.conn:
@@ -630,31 +910,17 @@ class ProjectDb:
                         probe_type = Dicts.probe_types['Future']
 
                     # special handling for surface sound speed, min depth, max depth
-                    # noinspection SqlResolve
-                    ssp_samples = self.conn.execute("SELECT * FROM proc WHERE ssp_pk=? AND flag=?",
-                                                    (row['pk'], Dicts.flags['valid'])).fetchall()
-                    try:
-                        ss_at_min_depth = '%0.2f' % ssp_samples[0]['speed']
-                        min_depth = '%0.2f' % ssp_samples[0]['depth']
-                        max_depth = '%0.2f' % ssp_samples[-1]['depth']
-                    except Exception as e:
+                    if row['ss_at_min_depth'] is None:
                         logger.warning("unable to import profile: %s -> skipping" % row['pk'])
                         continue
+                    ss_at_min_depth = '%0.2f' % row['ss_at_min_depth']
+                    min_depth = '%0.2f' % row['min_depth']
+                    max_depth = '%0.2f' % row['max_depth']
 
-                    # noinspection SqlResolve
-                    ssp_samples = self.conn.execute("SELECT * FROM proc WHERE ssp_pk=? AND flag=? "
-                                                    "AND source!=? AND source!=? AND source!=? AND source!=? "
-                                                    "AND source!=? AND source!=?",
-                                                    (row['pk'], Dicts.flags['valid'],
-                                                     Dicts.sources['woa09_ext'], Dicts.sources['woa13_ext'],
-                                                     Dicts.sources['woa18_ext'],
-                                                     Dicts.sources['rtofs_ext'], Dicts.sources['gomofs_ext'],
-                                                     Dicts.sources['ref_ext'],
-                                                     )).fetchall()
-                    try:
-                        max_raw_depth = '%0.2f' % ssp_samples[-1]['depth']
-                    except:
+                    if row['max_raw_depth'] is None:
                         max_raw_depth = ''
+                    else:
+                        max_raw_depth = '%0.2f' % row['max_raw_depth']
 
                     ssp_list.append((row['pk'],  # 0
                                      row['cast_datetime'],  # 1
@@ -687,11 +953,22 @@ class ProjectDb:
             logger.error("%s: %s" % (type(e), e))
             return ssp_list
 
-    def profile_by_pk(self, pk):
+    def profile_by_pk(self, pk, tables=None):
+        """Retrieve the profile with the passed pk
+
+        With 'tables', only the listed sample tables (among 'data', 'proc' and 'sis') are loaded. Such a partial
+        profile is meant for read-only uses (e.g., DQA on the processed samples), and it should not be stored back.
+        """
         if not self.conn:
             logger.error("missing db connection")
             return None
 
+        if tables is None:
+            tables = self.sample_tables
+        for table in tables:
+            if table not in self.sample_tables:
+                raise RuntimeError("invalid sample table: %s" % table)
+
         # logger.info("retrieve profile with pk: %s" % pk)
 
         ssp = ProfileList()
@@ -747,72 +1024,18 @@ class ProjectDb:
                 logger.error("ssp meta for %s pk > %s: %s" % (pk, type(e), e))
                 return None
 
-            # raw data
-            try:
-                # noinspection SqlResolve
-                ssp_samples = self.conn.execute("SELECT * FROM data WHERE ssp_pk=?", (pk,)).fetchall()
-                num_samples = len(ssp_samples)
-                ssp.cur.init_data(num_samples)
-                # logger.debug("raw data samples: %s" % num_samples)
-                for i in range(num_samples):
-                    # print(ssp_samples[i])
-
-                    ssp.cur.data.pressure[i] = ssp_samples[i]['pressure']
-                    ssp.cur.data.depth[i] = ssp_samples[i]['depth']
-                    ssp.cur.data.speed[i] = ssp_samples[i]['speed']
-                    ssp.cur.data.temp[i] = ssp_samples[i]['temperature']
-                    ssp.cur.data.conductivity[i] = ssp_samples[i]['conductivity']
-                    ssp.cur.data.sal[i] = ssp_samples[i]['salinity']
-                    ssp.cur.data.source[i] = ssp_samples[i]['source']
-                    ssp.cur.data.flag[i] = ssp_samples[i]['flag']
-
-            except sqlite3.Error as e:
-                logger.error("reading raw samples for %s pk, %s: %s" % (pk, type(e), e))
-                return None
-
-            # proc data
-            try:
-                # noinspection SqlResolve
-                ssp_samples = self.conn.execute("SELECT * FROM proc WHERE ssp_pk=?", (pk,)).fetchall()
-                num_samples = len(ssp_samples)
-                ssp.cur.init_proc(num_samples)
-                # logger.debug("proc data samples: %s" % num_samples)
-                for i in range(num_samples):
-                    # print(ssp_samples[i])
-                    ssp.cur.proc.pressure[i] = ssp_samples[i]['pressure']
-                    ssp.cur.proc.depth[i] = ssp_samples[i]['depth']
-                    ssp.cur.proc.speed[i] = ssp_samples[i]['speed']
-                    ssp.cur.proc.temp[i] = ssp_samples[i]['temperature']
-                    ssp.cur.proc.conductivity[i] = ssp_samples[i]['conductivity']
-                    ssp.cur.proc.sal[i] = ssp_samples[i]['salinity']
-                    ssp.cur.proc.source[i] = ssp_samples[i]['source']
-                    ssp.cur.proc.flag[i] = ssp_samples[i]['flag']
-
-            except sqlite3.Error as e:
-                logger.error("reading raw samples for %s pk, %s: %s" % (pk, type(e), e))
-                return None
-
-            # sis data
-            try:
-                # noinspection SqlResolve
-                ssp_samples = self.conn.execute("SELECT * FROM sis WHERE ssp_pk=?", (pk,)).fetchall()
-                num_samples = len(ssp_samples)
-                ssp.cur.init_sis(num_samples)
-                # logger.debug("sis data samples: %s" % num_samples)
-                for i in range(num_samples):
-                    # print(ssp_samples[i])
-                    ssp.cur.sis.pressure[i] = ssp_samples[i]['depth']
-                    ssp.cur.sis.depth[i] = ssp_samples[i]['depth']
-                    ssp.cur.sis.speed[i] = ssp_samples[i]['speed']
-                    ssp.cur.sis.temp[i] = ssp_samples[i]['temperature']
-                    ssp.cur.sis.conductivity[i] = ssp_samples[i]['conductivity']
-                    ssp.cur.sis.sal[i] = ssp_samples[i]['salinity']
-                    ssp.cur.sis.source[i] = ssp_samples[i]['source']
-                    ssp.cur.sis.flag[i] = ssp_samples[i]['flag']
+            # samples
+            for table in tables:
+                try:
+                    samples = self._load_samples(pk, table)
+                    getattr(ssp.cur, 'init_%s' % table)(len(samples))
+                    if len(samples) > 0:
+                        self._array_to_samples(samples, getattr(ssp.cur, table))
+                    # logger.debug("%s samples: %s" % (table, len(samples)))
 
-            except sqlite3.Error as e:
-                logger.error("reading sis samples for %s pk, %s: %s" % (pk, type(e), e))
-                return None
+                except sqlite3.Error as e:
+                    logger.error("reading %s samples for %s pk, %s: %s" % (table, pk, type(e), e))
+                    return None
 
         # This is the only way for the library to load a profile from the project database
         ssp.loaded_from_db = True
@@ -847,7 +1070,110 @@ class ProjectDb:
         # noinspection SqlResolve
         self.conn.execute("""
                           INSERT INTO library VALUES (?, ?, ?)
-                          """, (self.cur_version, "%s v.%s" % (lib_info.lib_name, lib_info.lib_version),
+                          """, (3, "%s v.%s" % (lib_info.lib_name, lib_info.lib_version),
+                                datetime.datetime.utcnow(),))
+
+    def _create_ssp_summary_table(self):
+        # noinspection SqlResolve
+        self.conn.execute("""
+                          CREATE TABLE IF NOT EXISTS ssp_summary(
+                             pk integer NOT NULL,
+                             ss_at_min_depth real,
+                             min_depth real,
+                             max_depth real,
+                             max_raw_depth real,
+                             PRIMARY KEY (pk),
+                             FOREIGN KEY(pk) REFERENCES ssp(pk))
+                          """)
+
+    def _create_ssp_index_tables(self):
+        # noinspection SqlResolve
+        self.conn.execute("""
+                          CREATE TABLE IF NOT EXISTS ssp_index(
+                             pk integer NOT NULL,
+                             longitude real NOT NULL,
+                             latitude real NOT NULL,
+                             timestamp real NOT NULL,
+                             PRIMARY KEY (pk),
+                             FOREIGN KEY(pk) REFERENCES ssp(pk))
+                          """)
+        # noinspection SqlResolve
+        self.conn.execute("""CREATE INDEX IF NOT EXISTS ssp_index_timestamp ON ssp_index(timestamp)""")
+        # noinspection SqlResolve
+        self.conn.execute("""CREATE INDEX IF NOT EXISTS ssp_index_position ON ssp_index(latitude, longitude)""")
+
+        # the R*Tree stores 32-bit coordinates: its results are refined with the exact values in 'ssp_index'
+        try:
+            # noinspection SqlResolve
+            self.conn.execute("""
+                              CREATE VIRTUAL TABLE IF NOT EXISTS ssp_rtree USING rtree(
+                                 pk,
+                                 min_lon, max_lon,
+                                 min_lat, max_lat,
+                                 min_time, max_time)
+                              """)
+            self.has_rtree = True
+
+        except sqlite3.OperationalError as e:
+            logger.info("spatial index not available: %s" % e)
+            self.has_rtree = False
+
+    def _updates_to_version_4(self, old_version):
+
+        # - 'samples_blob' table
+        self._create_samples_blob_table()
+
+        # - 'library' table
+        # noinspection SqlResolve
+        self.conn.execute("""DELETE FROM library WHERE version=?""", (old_version,))
+        # noinspection SqlResolve
+        self.conn.execute("""
+                          INSERT INTO library VALUES (?, ?, ?)
+                          """, (4, "%s v.%s" % (lib_info.lib_name, lib_info.lib_version),
+                                datetime.datetime.utcnow(),))
+
+    def _updates_to_version_5(self, old_version):
+
+        # - 'ssp_summary' table (backfilled from the stored processed samples)
+        self._create_ssp_summary_table()
+        # noinspection SqlResolve
+        pks = [row['pk'] for row in self.conn.execute("""SELECT pk FROM ssp""").fetchall()]
+        for pk in pks:
+            # noinspection SqlResolve
+            self.conn.execute("""
+                              INSERT OR REPLACE INTO ssp_summary VALUES (?, ?, ?, ?, ?)
+                              """, (pk,) + self._summary_from_proc(self._load_samples(pk, 'proc')))
+
+        # - 'library' table
+        # noinspection SqlResolve
+        self.conn.execute("""DELETE FROM library WHERE version=?""", (old_version,))
+        # noinspection SqlResolve
+        self.conn.execute("""
+                          INSERT INTO library VALUES (?, ?, ?)
+                          """, (5, "%s v.%s" % (lib_info.lib_name, lib_info.lib_version),
+                                datetime.datetime.utcnow(),))
+
+    def _updates_to_version_6(self, old_version):
+
+        # - 'ssp_index' table and 'ssp_rtree' spatial index (backfilled from the stored casts)
+        self._create_ssp_index_tables()
+        # noinspection SqlResolve
+        rows = self.conn.execute("""
+                                 SELECT pk, cast_datetime, cast_position FROM ssp a
+                                    LEFT OUTER JOIN ssp_pk b ON a.pk=b.id
+                                 """).fetchall()
+        for row in rows:
+            if not self._index_cast(pk=row['pk'], longitude=row['cast_position'].x,
+                                    latitude=row['cast_position'].y, utc_time=row['cast_datetime']):
+                raise sqlite3.Error("unable to index ssp with pk: %s" % row['pk'])
+
+        # - 'library' table
+        # noinspection SqlResolve
+        self.conn.execute("""DELETE FROM library WHERE version=?""", (old_version,))
+        # noinspection SqlResolve
+        self.conn.execute("""
+                          INSERT INTO library VALUES (?, ?, ?)
+                          """, (6, "%s v.%s" % (lib_info.lib_name, lib_info.lib_version),
                                 datetime.datetime.utcnow(),))
 
     def __repr__(self):
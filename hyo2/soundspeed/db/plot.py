@@ -1,4 +1,5 @@
 import os
+import datetime
 import numpy as np
 
 from PySide2 import QtWidgets
@@ -217,12 +218,12 @@ class PlotDb:
         if not save_fig:
             plt.ion()
 
-        ts_list = self.db.list_profiles()
-
-        if ts_list is None:
-            raise RuntimeError("Unable to retrieve the day list > Empty database?")
-        if len(ts_list) == 0:
-            raise RuntimeError("Unable to retrieve the day list > Empty database?")
+        pks = self.db.query_casts(time_range=(datetime.datetime.combine(dates[0], datetime.time.min),
+                                              datetime.datetime.combine(dates[1], datetime.time.max)))
+        if pks is None:
+            raise RuntimeError("Unable to retrieve the profiles between the passed dates")
+        if len(pks) == 0:
+            raise RuntimeError("Unable to retrieve the profiles between the passed dates > Empty database?")
 
         # start a new figure
         plt.close("Aggregate Plot")
@@ -239,16 +240,10 @@ class PlotDb:
         avg_ssp = PlotDb.AvgSsp()
 
         ssp_count = 0
-        for ts_pk in ts_list:
-
-            tmp_date = ts_pk[1].date()
-
-            if (tmp_date < dates[0]) or (tmp_date > dates[1]):
-                continue
+        for pk in pks:
 
             ssp_count += 1
-            # print(ts_pk[1], ts_pk[0])
-            tmp_ssp = self.db.profile_by_pk(ts_pk[0])
+            tmp_ssp = self.db.profile_by_pk(pk, tables=('proc', ))
             # print(tmp_ssp)
             ax.plot(tmp_ssp.cur.proc.speed[tmp_ssp.cur.proc_valid], tmp_ssp.cur.proc.depth[tmp_ssp.cur.proc_valid], '.',
                     color=(0.85, 0.85, 0.85), markersize=2
@@ -317,7 +312,7 @@ class PlotDb:
             date_plots[row_date] += 1
 
             fig = plt.figure(date_list.index(row_date))
-            row_ssp = self.db.profile_by_pk(row[0])
+            row_ssp = self.db.profile_by_pk(row[0], tables=('proc', ))
             fig.get_axes()[0].plot(row_ssp.cur.proc.speed[row_ssp.cur.proc_valid],
                                    row_ssp.cur.proc.depth[row_ssp.cur.proc_valid],
                                    label='%s [%04d]' % (row[1].time(), row[0]))
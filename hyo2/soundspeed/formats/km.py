@@ -292,6 +292,8 @@ class KmInstallation(Km):
 
 
 class KmSsp(Km):
+    entry_dtype = np.dtype([('time_offset', '<u2'), ('speed', '<u2')])
+
     def __init__(self, data):
 
         super(KmSsp, self).__init__(data)
@@ -299,14 +301,9 @@ class KmSsp(Km):
         # break it into its bits
         self.num_entries = struct.unpack("<H", self.data[16:18])[0]
 
-        self.time_offset = np.zeros(self.num_entries)
-        self.speed = np.zeros(self.num_entries)
-
-        offset = 18
-        for count in range(self.num_entries):
-            self.time_offset[count], self.speed[count] = struct.unpack("<HH", self.data[offset:offset + 4])
-            self.speed[count] /= 10.0
-            offset += 4
+        entries = np.frombuffer(self.data, dtype=self.entry_dtype, count=self.num_entries, offset=18)
+        self.time_offset = entries['time_offset'].astype(np.float64)
+        self.speed = entries['speed'] / 10.0
 
     def __str__(self):
 
@@ -360,6 +357,8 @@ class KmBist(Km):
 
 
 class KmSvp(Km):
+    entry_dtype = np.dtype([('depth', '<u4'), ('speed', '<u4')])
+
     def __init__(self, data):
 
         super(KmSvp, self).__init__(data)
@@ -375,15 +374,9 @@ class KmSvp(Km):
         self.num_entries = svp[2]
         self.depth_resolution_cms = svp[3]
 
-        self.depth = np.zeros(self.num_entries)
-        self.speed = np.zeros(self.num_entries)
-
-        offset = 28
-        for count in range(self.num_entries):
-            self.depth[count], self.speed[count] = struct.unpack("<II", self.data[offset:offset + 8])
-            self.depth[count] = 0.01 * self.depth[count] / self.depth_resolution_cms
-            self.speed[count] /= 10.0
-            offset += 8
+        entries = np.frombuffer(self.data, dtype=self.entry_dtype, count=self.num_entries, offset=28)
+        self.depth = 0.01 * entries['depth'] / self.depth_resolution_cms
+        self.speed = entries['speed'] / 10.0
 
     def convert_ssp(self):
         from ..profile.profile import Profile
@@ -418,6 +411,15 @@ class KmSvp(Km):
 
 
 class KmRangeAngle78(Km):
+    sector_dtype = np.dtype([('tilt_angle', '<i2'), ('focus_range', '<u2'), ('signal_length', '<f4'),
+                             ('transmit_delay', '<f4'), ('center_frequency', '<f4'),
+                             ('absorption_coefficient', '<u2'), ('signal_waveform_id', 'u1'),
+                             ('transmit_sector_number', 'u1'), ('signal_bandwidth', '<f4')])
+    beam_dtype = np.dtype([('angle', '<i2'), ('sector_number', 'u1'), ('detection_information', 'u1'),
+                           ('detection_window', '<u2'), ('quality_factor', 'u1'), ('d_corr', 'i1'),
+                           ('travel_time', '<f4'), ('reflectivity', '<i2'),
+                           ('realtime_cleaning_information', 'i1'), ('spare', 'u1')])
+
     def __init__(self, data):
 
         super(KmRangeAngle78, self).__init__(data)
@@ -431,56 +433,30 @@ class KmRangeAngle78(Km):
         self.sampling_frequency = range_angle78[4]
         self.d_scale = range_angle78[5]
 
-        self.tilt_angle = np.zeros(self.number_sectors)
-        self.focus_range = np.zeros(self.number_sectors)
-        self.signal_length = np.zeros(self.number_sectors)
-        self.transmit_delay = np.zeros(self.number_sectors)
-        self.center_frequency = np.zeros(self.number_sectors)
-        self.absorption_coefficient = np.zeros(self.number_sectors)
-        self.signal_waveform_id = np.zeros(self.number_sectors)
-        self.transmit_sector_number = np.zeros(self.number_sectors)
-        self.signal_bandwidth = np.zeros(self.number_sectors)
-
         offset = 32
-        bytes_per_sector = 24
-        for count in range(self.number_sectors):
-            sector = struct.unpack("<hH3fH2Bf", self.data[offset:offset + bytes_per_sector])
-            self.tilt_angle[count] = sector[0] / 100.0
-            self.focus_range[count] = sector[1] / 10.0
-            self.signal_length[count] = sector[2]
-            self.transmit_delay[count] = sector[3]
-            self.center_frequency[count] = sector[4]
-            self.absorption_coefficient[count] = sector[5] / 100.0
-            self.signal_waveform_id[count] = sector[6]
-            self.transmit_sector_number[count] = sector[7]
-            self.signal_bandwidth[count] = sector[8]
-            offset += bytes_per_sector
-
-        self.angle = np.zeros(self.number_beams)
-        self.sector_number = np.zeros(self.number_beams)
-        self.detection_information = np.zeros(self.number_beams)
-        self.detection_window = np.zeros(self.number_beams)
-        self.quality_factor = np.zeros(self.number_beams)
-        self.d_corr = np.zeros(self.number_beams)
-        self.travel_time = np.zeros(self.number_beams)
-        self.reflectivity = np.zeros(self.number_beams)
-        self.realtime_cleaning_information = np.zeros(self.number_beams)
-        self.spare = np.zeros(self.number_beams)
-
-        bytes_per_beam = 16
-        for count in range(self.number_beams):
-            beam = struct.unpack("<h2BHBbfhbB", self.data[offset:offset + bytes_per_beam])
-            self.angle[count] = beam[0] / 100.0
-            self.sector_number[count] = int(beam[1])
-            self.detection_information[count] = beam[2]
-            self.detection_window[count] = beam[3]
-            self.quality_factor[count] = beam[4]
-            self.d_corr[count] = beam[5]
-            self.travel_time[count] = beam[6]
-            self.reflectivity[count] = beam[7] / 10.0
-            self.realtime_cleaning_information[count] = beam[8]
-            self.spare[count] = beam[9]
-            offset += bytes_per_beam
+        sectors = np.frombuffer(self.data, dtype=self.sector_dtype, count=self.number_sectors, offset=offset)
+        self.tilt_angle = sectors['tilt_angle'] / 100.0
+        self.focus_range = sectors['focus_range'] / 10.0
+        self.signal_length = sectors['signal_length'].astype(np.float64)
+        self.transmit_delay = sectors['transmit_delay'].astype(np.float64)
+        self.center_frequency = sectors['center_frequency'].astype(np.float64)
+        self.absorption_coefficient = sectors['absorption_coefficient'] / 100.0
+        self.signal_waveform_id = sectors['signal_waveform_id'].astype(np.float64)
+        self.transmit_sector_number = sectors['transmit_sector_number'].astype(np.float64)
+        self.signal_bandwidth = sectors['signal_bandwidth'].astype(np.float64)
+
+        offset += self.number_sectors * self.sector_dtype.itemsize
+        beams = np.frombuffer(self.data, dtype=self.beam_dtype, count=self.number_beams, offset=offset)
+        self.angle = beams['angle'] / 100.0
+        self.sector_number = beams['sector_number'].astype(np.float64)
+        self.detection_information = beams['detection_information'].astype(np.float64)
+        self.detection_window = beams['detection_window'].astype(np.float64)
+        self.quality_factor = beams['quality_factor'].astype(np.float64)
+        self.d_corr = beams['d_corr'].astype(np.float64)
+        self.travel_time = beams['travel_time'].astype(np.float64)
+        self.reflectivity = beams['reflectivity'] / 10.0
+        self.realtime_cleaning_information = beams['realtime_cleaning_information'].astype(np.float64)
+        self.spare = beams['spare'].astype(np.float64)
 
     def __str__(self):
 
@@ -497,6 +473,11 @@ class KmRangeAngle78(Km):
 
 
 class KmXyz88(Km):
+    beam_dtype = np.dtype([('depth', '<f4'), ('across', '<f4'), ('along', '<f4'), ('detection_window', '<u2'),
+                           ('quality_factor', 'u1'), ('beam_incidence_angle_adjustment', 'i1'),
+                           ('detection_information', 'u1'), ('realtime_cleaning_information', 'i1'),
+                           ('reflectivity', '<i2')])
+
     def __init__(self, data):
 
         super(KmXyz88, self).__init__(data)
@@ -511,30 +492,16 @@ class KmXyz88(Km):
         self.sampling_frequency = xyz88[5]
         self.spare = xyz88[6]
 
-        self.depth = np.zeros(self.number_beams)
-        self.across = np.zeros(self.number_beams)
-        self.along = np.zeros(self.number_beams)
-        self.detection_window = np.zeros(self.number_beams)
-        self.quality_factor = np.zeros(self.number_beams)
-        self.beam_incidence_angle_adjustment = np.zeros(self.number_beams)
-        self.detection_information = np.zeros(self.number_beams)
-        self.realtime_cleaning_information = np.zeros(self.number_beams)
-        self.reflectivity = np.zeros(self.number_beams)
-
-        offset = 36
-        bytes_per_beam = 20
-        for count in range(self.number_beams):
-            beam = struct.unpack("<fffHBbBbh", self.data[offset:offset + bytes_per_beam])
-            self.depth[count] = beam[0]
-            self.across[count] = beam[1]
-            self.along[count] = beam[2]
-            self.detection_window[count] = beam[3]
-            self.quality_factor[count] = beam[4]
-            self.beam_incidence_angle_adjustment[count] = beam[5] / 10.0
-            self.detection_information[count] = beam[6]
-            self.realtime_cleaning_information[count] = beam[7]
-            self.reflectivity[count] = beam[8] / 10.0
-            offset += bytes_per_beam
+        beams = np.frombuffer(self.data, dtype=self.beam_dtype, count=self.number_beams, offset=36)
+        self.depth = beams['depth'].astype(np.float64)
+        self.across = beams['across'].astype(np.float64)
+        self.along = beams['along'].astype(np.float64)
+        self.detection_window = beams['detection_window'].astype(np.float64)
+        self.quality_factor = beams['quality_factor'].astype(np.float64)
+        self.beam_incidence_angle_adjustment = beams['beam_incidence_angle_adjustment'] / 10.0
+        self.detection_information = beams['detection_information'].astype(np.float64)
+        self.realtime_cleaning_information = beams['realtime_cleaning_information'].astype(np.float64)
+        self.reflectivity = beams['reflectivity'] / 10.0
 
     @property
     def mean_depth(self):
@@ -542,18 +509,10 @@ class KmXyz88(Km):
                 (self.detection_information is None):
             return None
 
-        mean_depth = 0.0
-        depth_count = 0
-        for beam in range(self.number_beams):
-            if int(self.detection_information[beam]) & 0x80 != 0:
-                # We skip beams without valid detections
-                continue
-            mean_depth = mean_depth + self.depth[beam]
-            depth_count += 1
-
-        if depth_count > 0:
-            mean_depth = mean_depth / depth_count + self.transducer_draft
-            return mean_depth
+        # We skip beams without valid detections
+        valid = (self.detection_information[:self.number_beams].astype(np.int64) & 0x80) == 0
+        if valid.any():
+            return self.depth[:self.number_beams][valid].mean() + self.transducer_draft
         return None
 
     def __str__(self):
@@ -581,6 +540,9 @@ class KmXyz88(Km):
 
 
 class KmSeabedImage89(Km):
+    beam_dtype = np.dtype([('sorting_direction', 'i1'), ('detection_information', 'u1'),
+                           ('number_samples', '<u2'), ('center_sample', '<u2')])
+
     def __init__(self, data, remote=True):
 
         super(KmSeabedImage89, self).__init__(data, remote=remote)
@@ -598,36 +560,21 @@ class KmSeabedImage89(Km):
         self.tvg_crossover_angle = float(image_head[5]) / 10.0
         self.number_beams = image_head[6]
 
-        self.sorting_direction = np.zeros(self.number_beams, dtype=np.int)
-        self.detection_information = np.zeros(self.number_beams, dtype=np.int)
-        self.number_samples = np.zeros(self.number_beams, dtype=np.int)
-        self.center_sample = np.zeros(self.number_beams, dtype=np.int)
-
         if remote:
             offset = 32
         else:
             offset = 36
-        bytes_per_beam = 6
-        self.snippets_nr = 0
-        for b in range(self.number_beams):
-            beam = struct.unpack("<bB2H", self.data[offset:offset + bytes_per_beam])
-            self.sorting_direction[b] = beam[0]
-            self.detection_information[b] = beam[1]
-            self.number_samples[b] = beam[2]
-            self.center_sample[b] = beam[3]
-            self.snippets_nr += self.number_samples[b]
-            offset += bytes_per_beam
-
-        self.snippets = []
-        for b in range(self.number_beams):
-            parse_string = "<%dh" % (self.number_samples[b])
-            bytes_to_read = int(2 * self.number_samples[b])
-            raw_samples = struct.unpack(parse_string, self.data[offset:offset + bytes_to_read])
-            samples = np.zeros(self.number_samples[b])
-            for s in range(int(self.number_samples[b])):
-                samples[s] = float(raw_samples[s]) / 10.0
-            self.snippets.append(samples)
-            offset += bytes_to_read
+        beams = np.frombuffer(self.data, dtype=self.beam_dtype, count=self.number_beams, offset=offset)
+        self.sorting_direction = beams['sorting_direction'].astype(int)
+        self.detection_information = beams['detection_information'].astype(int)
+        self.number_samples = beams['number_samples'].astype(int)
+        self.center_sample = beams['center_sample'].astype(int)
+        self.snippets_nr = self.number_samples.sum()
+
+        # the samples of all the beams are read at once, then split by beam
+        offset += self.number_beams * self.beam_dtype.itemsize
+        samples = np.frombuffer(self.data, dtype='<i2', count=self.snippets_nr, offset=offset) / 10.0
+        self.snippets = np.split(samples, np.cumsum(self.number_samples)[:-1]) if self.number_beams > 0 else []
 
     def __str__(self):
 
@@ -652,6 +599,10 @@ class KmSeabedImage89(Km):
 
 
 class KmWatercolumn(Km):
+    sector_dtype = np.dtype([('tilt_angle', '<i2'), ('frequency', '<u2'), ('number', 'u1'), ('spare', 'u1')])
+    beam_dtype = np.dtype([('pointing_angle', '<i2'), ('start_range', '<u2'), ('num_samples', '<u2'),
+                           ('detected_range', '<u2'), ('sector_number', 'u1'), ('number', 'u1')])
+
     def __init__(self, data):
 
         super(KmWatercolumn, self).__init__(data)
@@ -672,43 +623,35 @@ class KmWatercolumn(Km):
         self.spare2 = wc_header[12]
         self.spare3 = wc_header[13]
 
-        self.sector_tilt_angle = np.zeros(self.number_tx_sectors)
-        self.sector_frequency = np.zeros(self.number_tx_sectors)
-        self.sector_number = np.zeros(self.number_tx_sectors)
-        self.sector_spare = np.zeros(self.number_tx_sectors)
-
         offset = 40
-        for s in range(self.number_tx_sectors):
-            sector = struct.unpack("<hHBB", self.data[offset:offset + 6])
-            self.sector_tilt_angle[s] = float(sector[0]) / 100.0
-            self.sector_frequency[s] = float(sector[1]) * 10
-            self.sector_number[s] = sector[2]
-            self.sector_spare[s] = sector[3]
-            offset += 6
-
-        self.beam_pointing_angle = np.zeros(self.number_beams)
-        self.beam_start_range = np.zeros(self.number_beams)
-        self.beam_num_samples = np.zeros(self.number_beams)
-        self.beam_detected_range = np.zeros(self.number_beams)
-        self.beam_sector_number = np.zeros(self.number_beams)
-        self.beam_number = np.zeros(self.number_beams)
-
+        sectors = np.frombuffer(self.data, dtype=self.sector_dtype, count=self.number_tx_sectors, offset=offset)
+        self.sector_tilt_angle = sectors['tilt_angle'] / 100.0
+        self.sector_frequency = sectors['frequency'] * 10.0
+        self.sector_number = sectors['number'].astype(np.float64)
+        self.sector_spare = sectors['spare'].astype(np.float64)
+        offset += self.number_tx_sectors * self.sector_dtype.itemsize
+
+        # each beam header is followed by its samples: only the beam offsets are found with a loop
+        bytes_per_beam = self.beam_dtype.itemsize
+        beam_offsets = list()
         self.samples = []
-
-        bytes_per_beam = 10
         for b in range(self.number_beams):
-            beam = struct.unpack("<h3H2B", self.data[offset:offset + bytes_per_beam])
-            self.beam_pointing_angle[b] = float(beam[0]) / 100.0
-            self.beam_start_range[b] = beam[1]
-            self.beam_num_samples[b] = beam[2]
-            self.beam_detected_range[b] = beam[3]
-            self.beam_sector_number[b] = beam[4]
-            self.beam_number[b] = beam[5]
-
+            beam_offsets.append(offset)
+            num_samples = int.from_bytes(self.data[offset + 4:offset + 6], byteorder='little')
             offset += bytes_per_beam
-            samples = self.data[offset:offset + int(self.beam_num_samples[b])]
-            self.samples.append(samples)
-            offset += int(self.beam_num_samples[b])
+            self.samples.append(self.data[offset:offset + num_samples])
+            offset += num_samples
+
+        # then all the beam headers are gathered at once
+        beam_bytes = np.frombuffer(self.data, dtype=np.uint8)[np.add.outer(np.array(beam_offsets, dtype=np.int64),
+                                                                           np.arange(bytes_per_beam))]
+        beams = beam_bytes.view(self.beam_dtype).reshape(self.number_beams)
+        self.beam_pointing_angle = beams['pointing_angle'] / 100.0
+        self.beam_start_range = beams['start_range'].astype(np.float64)
+        self.beam_num_samples = beams['num_samples'].astype(np.float64)
+        self.beam_detected_range = beams['detected_range'].astype(np.float64)
+        self.beam_sector_number = beams['sector_number'].astype(np.float64)
+        self.beam_number = beams['number'].astype(np.float64)
 
     def __str__(self):
 
@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
 import logging
 import struct
+from typing import Optional
+
 import numpy as np
 
 logger = logging.getLogger(__name__)
@@ -48,7 +50,7 @@ class Kmall:
 
     def _parse_header(self):
         """Parse header"""
-        hdr_data = struct.unpack("<I4cBBHII", self.data[:20])
+        hdr_data = struct.unpack_from("<I4cBBHII", self.data, 0)
         self.length = hdr_data[0]
         # logger.debug('length: %s' % self.length)
         self.id = b''.join(hdr_data[1:5])
@@ -77,18 +79,33 @@ class Kmall:
 
 
 class KmallMRZ(Kmall):
+    # each sounding (120 B, in the datagram version 0)
+    sounding_dtype = np.dtype([
+        ('sounding_index', '<u2'), ('tx_sector_nr', 'u1'), ('detection_type', 'u1'), ('detection_method', 'u1'),
+        ('rejection_info_1', 'u1'), ('rejection_info_2', 'u1'), ('post_processing_info', 'u1'),
+        ('detection_class', 'u1'), ('detection_confidence_level', 'u1'), ('padding', '<u2'),
+        ('range_factor', '<f4'), ('quality_factor', '<f4'), ('detection_uncertainty_ver_m', '<f4'),
+        ('detection_uncertainty_hor_m', '<f4'), ('detection_window_length_sec', '<f4'), ('echo_length_sec', '<f4'),
+        ('wc_beam_nr', '<u2'), ('wc_range_samples', '<u2'), ('wc_nom_beam_angle_across_deg', '<f4'),
+        ('mean_abs_coeff_db_per_km', '<f4'), ('reflectivity_1_db', '<f4'), ('reflectivity_2_db', '<f4'),
+        ('receiver_sensitivity_applied_db', '<f4'), ('source_level_applied_db', '<f4'),
+        ('bs_calibration_db', '<f4'), ('tvg_db', '<f4'), ('beam_angle_re_rx_deg', '<f4'),
+        ('beam_angle_correction_deg', '<f4'), ('two_way_travel_time_sec', '<f4'),
+        ('two_way_travel_time_correction_sec', '<f4'), ('delta_latitude_deg', '<f4'), ('delta_longitude_deg', '<f4'),
+        ('z_re_ref_point_m', '<f4'), ('y_re_ref_point_m', '<f4'), ('x_re_ref_point_m', '<f4'),
+        ('beam_inc_angle_adj_deg', '<f4'), ('real_time_clean_info', '<u2'), ('si_start_range_samples', '<u2'),
+        ('si_centre_sample', '<u2'), ('si_num_samples', '<u2')])
+
     def __init__(self, data):
         super().__init__(data)
 
-        # partition
-        # partition = struct.unpack("<2H", self.data[20:24])
-        # nr_of_datagrams = partition[0]
-        # datagram_nr = partition[1]
-        # logger.debug('datagram: %s/%s' % (datagram_nr, nr_of_datagrams))
+        # partition (a datagram split in several partitions must be reassembled, see KmallPartitions)
+        self.nr_of_datagrams, self.datagram_nr = struct.unpack_from("<2H", self.data, 20)
+        # logger.debug('datagram: %s/%s' % (self.datagram_nr, self.nr_of_datagrams))
 
         # common
-        # common = struct.unpack("<2H8B", self.data[24:36])
-        # common_length = common[0]
+        common_length = struct.unpack_from("<H", self.data, 24)[0]
+        # common = struct.unpack_from("<2H8B", self.data, 24)
         # logger.debug("common part -> length: %d/%d" % (common_length, self.length))
         # ping_count = common[1]
         # logger.debug("common part -> ping #%d" % (ping_count, ))
@@ -108,8 +125,9 @@ class KmallMRZ(Kmall):
         # logger.debug("common part -> algorithm type: %d" % (algorithm_type,))
 
         # ping info                  12 89 20  24   30  34  44 47
-        ping_info = struct.unpack("<2Hf6BH11f2h2BHI3f2Hf2H6f4B2df", self.data[36:180])  # 144 bytes
-        # ping_info_length = ping_info[0]
+        start_of_ping_info = 24 + common_length
+        ping_info = struct.unpack_from("<2Hf6BH11f2h2BHI3f2Hf2H6f4B2df", self.data, start_of_ping_info)  # 144 bytes
+        ping_info_length = ping_info[0]
         # logger.debug("ping info part -> length: %d/%d" % (ping_info_length, self.length))
         nr_or_tx_sectors = ping_info[33]
         bytes_per_tx_sector = ping_info[34]
@@ -124,56 +142,52 @@ class KmallMRZ(Kmall):
         # vrp_longitude = ping_info[46]
         # logger.debug('VRP pos: %s, %s' % (vrp_latitude, vrp_longitude))
 
-        end_of_tx_sectors = 180 + nr_or_tx_sectors * bytes_per_tx_sector
-        end_of_rx_info = end_of_tx_sectors + 32
+        end_of_tx_sectors = start_of_ping_info + ping_info_length + nr_or_tx_sectors * bytes_per_tx_sector
 
         # rx info
-        rx_info = struct.unpack("<4H4f4H", self.data[end_of_tx_sectors:end_of_rx_info])
-        # rx_info_length = rx_info[0]
+        rx_info = struct.unpack_from("<4H4f4H", self.data, end_of_tx_sectors)
+        rx_info_length = rx_info[0]
         # logger.debug("rx info part -> length: %d/%d" % (rx_info_length, self.length))
         nr_of_soundings = rx_info[1]
         # logger.debug("rx info part -> nr of soundings: %d" % (nr_of_soundings, ))
+        bytes_per_sounding = rx_info[3]
         nr_extra_detection_classes = rx_info[10]
         nr_bytes_per_class = rx_info[11]
         # logger.debug("rx info part -> extra det. classes: %d [%d B]"
         #              % (nr_extra_detection_classes, nr_bytes_per_class))
 
+        end_of_rx_info = end_of_tx_sectors + rx_info_length
         end_of_extra_det_class_info = end_of_rx_info + nr_extra_detection_classes * nr_bytes_per_class
 
-        # each sounding       8 15   35 39
-        sounding_struct = '<H8BH6f2H18f4H'
-        depths_valid = 0
-        depths_sum = 0.0
-        for i in range(nr_of_soundings):
-            start_sounding = end_of_extra_det_class_info + i * 120
-            end_sounding = end_of_extra_det_class_info + (i + 1) * 120
-            sounding = struct.unpack(sounding_struct, self.data[start_sounding:end_sounding])
-            # sounding_idx = sounding[0]
-            # logger.debug("sounding -> #%d" % (sounding_idx, ))
-            sounding_detection_type = sounding[2]
-            # logger.debug("sounding -> detection type: %s" % (sounding_detection_type, ))
-            sounding_detection_method = sounding[3]
-            # logger.debug("sounding -> detection method: %s" % (sounding_detection_method, ))
-            sounding_z = sounding[32]
-            # sounding_y = sounding[33]
-            # sounding_x = sounding[34]
-            # logger.debug("sounding -> z: %s, y: %s, x: %s" % (sounding_z, sounding_y, sounding_x))
-
-            if (sounding_detection_type == 0) and (sounding_detection_method != 0):
-                depths_valid += 1
-                depths_sum += sounding_z
+        # all the soundings, as a structured view on the datagram
+        self.soundings = np.frombuffer(self.data, dtype=self.sounding_dtype_for(bytes_per_sounding),
+                                       count=nr_of_soundings, offset=end_of_extra_det_class_info)
+
+        valid = (self.soundings['detection_type'] == 0) & (self.soundings['detection_method'] != 0)
+        depths_valid = np.count_nonzero(valid)
 
         self.mean_depth = None
         if depths_valid > 0:
-            self.mean_depth = (depths_sum / depths_valid) - z_water_level_re_ref_point_m
+            depths_sum = self.soundings['z_re_ref_point_m'][valid].sum(dtype=np.float64)
+            self.mean_depth = float(depths_sum / depths_valid) - z_water_level_re_ref_point_m
             # logger.debug("sounding -> mean depth: %s" % (self.mean_depth, ))
 
         # footer
-        final_length = struct.unpack("<I", self.data[-4:])
+        final_length = struct.unpack_from("<I", self.data, len(self.data) - 4)
         # logger.debug('final length: %s' % final_length)
         self.is_valid = final_length != self.length
         # logger.debug('#MRZ is valid: %s' % self.is_valid)
 
+    @classmethod
+    def sounding_dtype_for(cls, bytes_per_sounding: int) -> np.dtype:
+        """Return the sounding dtype for the passed sounding size (later datagram versions may append fields)"""
+        if bytes_per_sounding <= cls.sounding_dtype.itemsize:
+            return cls.sounding_dtype
+        return np.dtype({'names': cls.sounding_dtype.names,
+                         'formats': [cls.sounding_dtype.fields[name][0] for name in cls.sounding_dtype.names],
+                         'offsets': [cls.sounding_dtype.fields[name][1] for name in cls.sounding_dtype.names],
+                         'itemsize': bytes_per_sounding})
+
     def __str__(self):
         output = Kmall.__str__(self)
         output += '\ttss: %s\n\tmean depth: %s m\n' % \
@@ -193,7 +207,7 @@ class KmallSPO(Kmall):
         # common_sensor_status = common[2]
         # logger.debug("common part -> sensor status: %d" % common_sensor_status)
 
-        data_blk = struct.unpack("<2If2d3f", self.data[28:68])
+        data_blk = struct.unpack_from("<2If2d3f", self.data, 28)
         # time_sec = data_blk[0]
         # logger.debug('sensor time sec: %s' % time_sec)
         # time_nanosec = data_blk[1]
@@ -228,32 +242,75 @@ class KmallSPO(Kmall):
 
 
 class KmallSVP(Kmall):
+    # each sample (20 B)
+    sample_dtype = np.dtype([('depth', '<f4'), ('speed', '<f4'), ('padding', '<u4'), ('temp', '<f4'),
+                             ('sal', '<f4')])
+
     def __init__(self, data):
         super().__init__(data)
 
         header_struct = '<2H4BIdd'
-        svp_header = struct.unpack(header_struct, self.data[20:48])
+        svp_header = struct.unpack_from(header_struct, self.data, 20)
         self.num_entries = svp_header[1]
         logger.debug("svp samples: %s" % (self.num_entries,))
         self.acquisition_time = Kmall.kmall_datetime(svp_header[3])
         logger.debug("acquisition time: %s" % self.acquisition_time.strftime('%Y-%m-%d %H:%M:%S.%f'))
 
-        fields_struct = '<2fI2f'  # 20B
-        self.depth = np.zeros(self.num_entries)
-        self.speed = np.zeros(self.num_entries)
-        self.temp = np.zeros(self.num_entries)
-        self.sal = np.zeros(self.num_entries)
-        for i in range(self.num_entries):
-            start_field = 48 + i * 20
-            end_field = 48 + (i + 1) * 20
-            svp_field = struct.unpack(fields_struct, self.data[start_field:end_field])
-            self.depth[i] = svp_field[0]
-            self.speed[i] = svp_field[1]
-            self.temp[i] = svp_field[3]
-            self.sal[i] = svp_field[4]
+        samples = np.frombuffer(self.data, dtype=self.sample_dtype, count=self.num_entries, offset=48)
+        self.depth = samples['depth'].astype(np.float64)
+        self.speed = samples['speed'].astype(np.float64)
+        self.temp = samples['temp'].astype(np.float64)
+        self.sal = samples['sal'].astype(np.float64)
         logger.debug("depths: %s" % (self.depth, ))
         logger.debug("speeds: %s" % (self.speed, ))
 
-        final_length = struct.unpack("<I", self.data[-4:])
+        final_length = struct.unpack_from("<I", self.data, len(self.data) - 4)
         self.is_valid = final_length != self.length
         logger.debug('#SVP is valid: %s' % self.is_valid)
+
+
+class KmallPartitions:
+    """Reassemble the datagrams (e.g., #MRZ) that were split in several partitions to fit in UDP packets
+
+    Each partition has the datagram header, the partition info, a chunk of the datagram body and the final length.
+    The partitions of a datagram share the header (same type and time). When a partition of another datagram is
+    received, the incomplete datagram is dropped.
+    """
+
+    def __init__(self) -> None:
+        self._key = None
+        self._partitions = dict()
+        self.dropped = 0  # incomplete datagrams
+
+    def add(self, data: bytes) -> Optional[bytes]:
+        """Add the passed datagram, returning the complete datagram (None while waiting for other partitions)"""
+        nr_of_datagrams, datagram_nr = struct.unpack_from("<2H", data, 20)
+        if nr_of_datagrams <= 1:
+            return data
+
+        key = bytes(memoryview(data)[4:20])
+        if key != self._key:
+            if len(self._partitions) > 0:
+                logger.debug("dropping incomplete datagram: %d/%d partitions"
+                             % (len(self._partitions), nr_of_datagrams))
+                self.dropped += 1
+            self._key = key
+            self._partitions = dict()
+        self._partitions[datagram_nr] = data
+        if len(self._partitions) < nr_of_datagrams:
+            return None
+
+        try:
+            partitions = [memoryview(self._partitions[nr]) for nr in range(1, nr_of_datagrams + 1)]
+        except KeyError:
+            logger.warning("invalid partition numbers: %s/%d" % (sorted(self._partitions.keys()), nr_of_datagrams))
+            partitions = None
+        self._key = None
+        self._partitions = dict()
+        if partitions is None:
+            return None
+
+        body = b''.join([partition[24:-4] for partition in partitions])
+        length = 24 + len(body) + 4
+        return struct.pack("<I", length) + partitions[0][4:20].tobytes() + struct.pack("<2H", 1, 1) + body + \
+            struct.pack("<I", length)
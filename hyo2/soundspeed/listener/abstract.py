@@ -2,19 +2,21 @@ import logging
 import time
 import socket
 import struct
-from threading import Thread, Event
 from typing import Optional
 
+from hyo2.soundspeed.listener.stats import ListenerStats
+
 logger = logging.getLogger(__name__)
 
 
-class AbstractListener(Thread):
-    """Common abstract listener"""
+class AbstractListener:
+    """Common abstract listener
+
+    The datagrams are received by a ListenerHost, that calls receive() for each datagram on the listener socket.
+    """
 
     def __init__(self, port: int = 4001, ip: str = "0.0.0.0", timeout: int = 1,
-                 datagrams: Optional[list] = None,
-                 target: Optional[object] = None, name: Optional[str] = "Abstract") -> None:
-        Thread.__init__(self, target=target, name=name)
+                 datagrams: Optional[list] = None) -> None:
         self.name = self.__class__.__name__
         self.desc = "Abstract listener"  # a human-readable description
         self.ip = ip
@@ -25,10 +27,13 @@ class AbstractListener(Thread):
         if not self.datagrams:
             self.datagrams = list()
 
-        self.shutdown = Event()
         self.sock_in = None
         self.data = None
         self.sender = None
+        self.id = None  # id of the last received datagram (if any)
+
+        # recently received datagrams and statistics
+        self.stats = ListenerStats()
 
     def init_sockets(self) -> bool:
         self.sock_in = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -60,40 +65,20 @@ class AbstractListener(Thread):
 
         return True
 
-    def stop(self) -> None:
-        """Stop the process"""
-        self.shutdown.set()
-
-    def run(self) -> None:
-        """Start the simulation"""
-
-        # logger.debug("%s start" % self.name)
-        if not self.init_sockets():
-            return
-
-        count = 0
-        while True:
-            if self.shutdown.is_set():
-                # logger.debug("shutdown")
-                break
-            # if (count % 20) == 0:
-            #     logger.debug("%s: listening" % self.__class__.__name__)
-            count += 1
-
-            try:
-                self.data, self.sender = self.sock_in.recvfrom(2 ** 16)
-
-            except socket.timeout:
-                # logger.info("socket timeout")
-                time.sleep(0.1)
-                continue
+    def receive(self, data: bytes, sender: tuple) -> None:
+        """Parse the passed datagram, and add it to the statistics"""
+        rx_time = time.time()
+        self.data = data
+        self.sender = sender
 
+        start = time.perf_counter()
+        try:
             self.parse()
-
-        self.data = None
-        self.sender = None
-        self.sock_in.close()
-        # logger.debug("%s end" % self.name)
+        except Exception:
+            self.stats.add_dropped()
+            raise
+        finally:
+            self.stats.add(data, dg_id=self.id, parse_time=time.perf_counter() - start, rx_time=rx_time)
 
     def parse(self) -> None:
         raise Exception("Unimplemented function")
@@ -104,4 +89,5 @@ class AbstractListener(Thread):
         msg += "  <ip: %s>\n" % self.ip
         msg += "  <port: %s>\n" % self.port
         msg += "  <multicast: %s>\n" % self.is_multicast
+        msg += "%s" % self.stats
         return msg
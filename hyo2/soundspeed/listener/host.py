@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from threading import Thread, Lock
+from typing import Optional  # noqa: F401
+
+from hyo2.soundspeed.listener.abstract import AbstractListener
+
+logger = logging.getLogger(__name__)
+
+
+class ListenerProtocol(asyncio.DatagramProtocol):
+    """Pass the received datagrams to the parse() hook of a listener"""
+
+    def __init__(self, listener: AbstractListener) -> None:
+        self.listener = listener
+
+    def datagram_received(self, data: bytes, addr: tuple) -> None:
+        try:
+            self.listener.receive(data=data, sender=addr)
+        except Exception as e:
+            logger.warning("%s: unable to parse datagram from %s -> %s" % (self.listener.name, addr, e))
+
+    def error_received(self, exc: Exception) -> None:
+        logger.warning("%s: %s" % (self.listener.name, exc))
+
+
+class ListenerHost:
+    """A single asyncio event loop, run in a background thread, receiving the UDP datagrams of all the listeners
+
+    Each listener gets a datagram endpoint on its socket, and its parse() hook is called in the loop thread.
+    The methods of this class can be called from any thread (e.g., the GUI or the server), while the latest
+    parsed datagrams are read from the attributes of the listeners.
+    """
+
+    def __init__(self, timeout: float = 2.0, name: str = "ListenerHost") -> None:
+        self.timeout = timeout
+        self.name = name
+
+        self._loop = None  # type: Optional[asyncio.AbstractEventLoop]
+        self._thread = None  # type: Optional[Thread]
+        self._lock = Lock()
+        self._transports = dict()
+
+    @property
+    def is_running(self) -> bool:
+        return (self._thread is not None) and self._thread.is_alive()
+
+    def is_listening(self, listener: AbstractListener) -> bool:
+        return listener in self._transports
+
+    def start(self) -> None:
+        with self._lock:
+            if self.is_running:
+                return
+
+            self._loop = asyncio.new_event_loop()
+            self._thread = Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+            logger.debug("started")
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_forever()
+        finally:
+            for transport in self._transports.values():
+                transport.close()
+            self._transports.clear()
+            if hasattr(self._loop, 'shutdown_asyncgens'):  # Python 3.6+
+                self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+            self._loop.close()
+
+    def _call(self, coro) -> bool:
+        """Run the passed coroutine in the loop thread, and wait for its result"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(self.timeout)
+        except Exception as e:
+            future.cancel()
+            logger.warning("%s: %s" % (self.name, e))
+            return False
+
+    def add(self, listener: AbstractListener) -> bool:
+        """Start to receive the datagrams for the passed listener"""
+        self.start()
+        return self._call(self._add(listener))
+
+    async def _add(self, listener: AbstractListener) -> bool:
+        if listener in self._transports:
+            return True
+
+        if not listener.init_sockets():
+            return False
+
+        try:
+            transport, _ = await self._loop.create_datagram_endpoint(lambda: ListenerProtocol(listener),
+                                                                     sock=listener.sock_in)
+        except Exception:
+            listener.sock_in.close()
+            raise
+        self._transports[listener] = transport
+        logger.debug("%s: listening on port %d" % (listener.name, listener.port))
+        return True
+
+    def remove(self, listener: AbstractListener) -> bool:
+        """Stop to receive the datagrams for the passed listener"""
+        if not self.is_running:
+            return True
+        return self._call(self._remove(listener))
+
+    async def _remove(self, listener: AbstractListener) -> bool:
+        transport = self._transports.pop(listener, None)
+        if transport is not None:
+            transport.close()
+            listener.data = None
+            listener.sender = None
+            logger.debug("%s: not listening" % listener.name)
+        return True
+
+    def stop(self) -> None:
+        """Close all the endpoints and stop the event loop"""
+        with self._lock:
+            if not self.is_running:
+                return
+
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(self.timeout)
+            self._thread = None
+            logger.debug("stopped")
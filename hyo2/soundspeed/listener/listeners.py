@@ -1,6 +1,6 @@
-import time
 import logging
 
+from hyo2.soundspeed.listener.host import ListenerHost
 from hyo2.soundspeed.listener.sis.sis4 import Sis4
 from hyo2.soundspeed.listener.sis.sis5 import Sis5
 from hyo2.soundspeed.listener.sippican.sippican import Sippican
@@ -26,6 +26,9 @@ class Listeners:
         self.sippican = Sippican(port=self.prj.setup.sippican_listen_port, prj=prj)
         self.mvp = Mvp(port=self.prj.setup.mvp_listen_port, prj=prj)
 
+        # a single event loop receives the datagrams for all the listeners
+        self.host = ListenerHost()
+
     @property
     def sippican_to_process(self):
         return self.sippican.new_ssp.is_set()
@@ -45,66 +48,44 @@ class Listeners:
             self.mvp.new_ssp.clear()
 
     def listen_sis4(self):
-        if not self.sis4.is_alive():
-            self.sis4.start()
-            time.sleep(0.1)
-            logger.debug("start")
-        return self.sis4.is_alive()
+        return self.host.add(self.sis4)
 
     def stop_listen_sis4(self):
-        if self.sis4.is_alive():
-            self.sis4.stop()
-            self.sis4.join(2)
-            logger.debug("stop")
-        return not self.sis4.is_alive()
+        return self.host.remove(self.sis4)
 
     def listen_sis5(self):
-        if not self.sis5.is_alive():
-            self.sis5.start()
-            time.sleep(0.1)
-            logger.debug("start")
-        return self.sis5.is_alive()
+        return self.host.add(self.sis5)
 
     def stop_listen_sis5(self):
-        if self.sis5.is_alive():
-            self.sis5.stop()
-            self.sis5.join(2)
-            logger.debug("stop")
-        return not self.sis5.is_alive()
+        return self.host.remove(self.sis5)
 
     def listen_sippican(self):
-        if not self.sippican.is_alive():
-            self.sippican.start()
-            time.sleep(0.1)
-            logger.debug("start")
-        return self.sippican.is_alive()
+        return self.host.add(self.sippican)
 
     def stop_listen_sippican(self):
-        if self.sippican.is_alive():
-            self.sippican.stop()
-            self.sippican.join(2)
-            logger.debug("stop")
-        return not self.sippican.is_alive()
+        return self.host.remove(self.sippican)
 
     def listen_mvp(self):
-        if not self.mvp.is_alive():
-            self.mvp.start()
-            time.sleep(0.1)
-            logger.debug("start")
-        return self.mvp.is_alive()
+        return self.host.add(self.mvp)
 
     def stop_listen_mvp(self):
-        if self.mvp.is_alive():
-            self.mvp.stop()
-            self.mvp.join(2)
-            logger.debug("stop")
-        return not self.mvp.is_alive()
+        return self.host.remove(self.mvp)
+
+    def stats(self):
+        """Return the current receive statistics of each listener"""
+        return {
+            'sis4': self.sis4.stats.snapshot(),
+            'sis5': self.sis5.stats.snapshot(),
+            'sippican': self.sippican.stats.snapshot(),
+            'mvp': self.mvp.stats.snapshot(),
+        }
 
     def stop(self):
         self.stop_listen_sis4()
         self.stop_listen_sis5()
         self.stop_listen_sippican()
         self.stop_listen_mvp()
+        self.host.stop()
 
     def __repr__(self):
         msg = "<Listeners>\n"
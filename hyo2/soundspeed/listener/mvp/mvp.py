@@ -10,9 +10,8 @@ from hyo2.soundspeed.formats.readers import mvp
 class Mvp(AbstractListener):
     """MVP listener"""
 
-    def __init__(self, port, prj, timeout=1, ip="0.0.0.0", target=None, name="Km"):
-        super(Mvp, self).__init__(port=port, ip=ip, timeout=timeout,
-                                  target=target, name=name)
+    def __init__(self, port, prj, timeout=1, ip="0.0.0.0"):
+        super(Mvp, self).__init__(port=port, ip=ip, timeout=timeout)
         self.desc = "MVP"
         self.prj = prj
 
@@ -12,9 +12,8 @@ from hyo2.soundspeed.listener.abstract import AbstractListener
 class Sippican(AbstractListener):
     """Sippican listener"""
 
-    def __init__(self, port, prj, timeout=1, ip="0.0.0.0", target=None, name="Sippican"):
-        super(Sippican, self).__init__(port=port, ip=ip, timeout=timeout,
-                                       target=target, name=name)
+    def __init__(self, port, prj, timeout=1, ip="0.0.0.0"):
+        super(Sippican, self).__init__(port=port, ip=ip, timeout=timeout)
         self.desc = "Sippican"
         self.prj = prj
 
@@ -0,0 +1,37 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LazyDatagram:
+    """Received datagram, with the body decoded only on the first access to one of its fields
+
+    The header fields (e.g., id, dg_time) are parsed at reception with the passed header class (Km or Kmall).
+    The other fields are decoded by the passed datagram class when one of them is first accessed, then cached.
+    """
+
+    def __init__(self, data: bytes, datagram_class: type, header_class: type) -> None:
+        self._datagram_class = datagram_class
+        self._datagram = None
+        self.__dict__.update(vars(header_class(data)))
+
+    @property
+    def is_decoded(self) -> bool:
+        return self._datagram is not None
+
+    def decode(self) -> object:
+        """Return the fully decoded datagram"""
+        if self._datagram is None:
+            self._datagram = self._datagram_class(self.data)
+        return self._datagram
+
+    def __getattr__(self, name: str) -> object:
+        # only called for the fields not parsed with the header and not yet cached
+        if name.startswith('__') or ('_datagram_class' not in self.__dict__):
+            raise AttributeError(name)
+        value = getattr(self.decode(), name)
+        setattr(self, name, value)
+        return value
+
+    def __str__(self) -> str:
+        return str(self.decode())
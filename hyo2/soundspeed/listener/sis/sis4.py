@@ -3,11 +3,10 @@ import operator
 import logging
 import functools
 import time
-import struct
-from typing import Optional
 
 from hyo2.soundspeed.listener.abstract import AbstractListener
-from hyo2.soundspeed.formats import km, kmall
+from hyo2.soundspeed.formats import km
+from hyo2.soundspeed.listener.sis.lazy import LazyDatagram
 
 logger = logging.getLogger(__name__)
 
@@ -15,10 +14,8 @@ logger = logging.getLogger(__name__)
 class Sis4(AbstractListener):
     """Kongsberg SIS listener"""
 
-    def __init__(self, port: int, datagrams: list, timeout: int = 1, ip: str = "0.0.0.0",
-                 target: Optional[object] = None, name: str = "SIS4") -> None:
-        super(Sis4, self).__init__(port=port, datagrams=datagrams, ip=ip, timeout=timeout,
-                                  target=target, name=name)
+    def __init__(self, port: int, datagrams: list, timeout: int = 1, ip: str = "0.0.0.0") -> None:
+        super(Sis4, self).__init__(port=port, datagrams=datagrams, ip=ip, timeout=timeout)
         self.desc = "Kongsberg SIS4"
 
         # A few Nones to accommodate the potential types of datagrams that are currently supported
@@ -77,53 +74,49 @@ class Sis4(AbstractListener):
         self._parse_sis_4()
 
     def _parse_sis_4(self) -> None:
-        this_data = self.data[:]
+        this_data = self.data
 
-        self.id = struct.unpack("<BB", this_data[0:2])[1]
+        self.id = this_data[1]
 
-        try:
-            name = km.Km.datagrams[self.id]
-        except KeyError:
-            name = "Unknown name"
-
-        logger.info("%s > DG %d/0x%x/%c [%s] > sz: %.2f KB"
-                    % (self.sender, self.id, self.id, self.id, name, len(this_data) / 1024))
+        if self.id not in km.Km.datagrams:
+            self.stats.add_unknown(self.id)
 
         if not (self.id in self.datagrams):
             return
 
+        # only the header is parsed here, the body is decoded on the first access to one of its fields
         if self.id == 0x42:
-            self.bist = km.KmBist(this_data)
+            self.bist = LazyDatagram(this_data, km.KmBist, km.Km)
 
         elif self.id == 0x47:
-            self.surface_ssp = km.KmSsp(this_data)
+            self.surface_ssp = LazyDatagram(this_data, km.KmSsp, km.Km)
 
         elif self.id == 0x49:
-            self.installation = km.KmInstallation(this_data)
+            self.installation = LazyDatagram(this_data, km.KmInstallation, km.Km)
 
         elif self.id == 0x4e:
-            self.range_angle78 = km.KmRangeAngle78(this_data)
+            self.range_angle78 = LazyDatagram(this_data, km.KmRangeAngle78, km.Km)
 
         elif self.id == 0x50:
-            self.nav = km.KmNav(this_data)
+            self.nav = LazyDatagram(this_data, km.KmNav, km.Km)
 
         elif self.id == 0x52:
-            self.runtime = km.KmRuntime(this_data)
+            self.runtime = LazyDatagram(this_data, km.KmRuntime, km.Km)
 
         elif self.id == 0x55:
-            self.ssp = km.KmSvp(this_data)
+            self.ssp = LazyDatagram(this_data, km.KmSvp, km.Km)
 
         elif self.id == 0x57:
-            self.svp_input = km.KmSvpInput(this_data)
+            self.svp_input = LazyDatagram(this_data, km.KmSvpInput, km.Km)
 
         elif self.id == 0x58:
-            self.xyz88 = km.KmXyz88(this_data)
+            self.xyz88 = LazyDatagram(this_data, km.KmXyz88, km.Km)
 
         elif self.id == 0x59:
-            self.seabed_image89 = km.KmSeabedImage89(this_data)
+            self.seabed_image89 = LazyDatagram(this_data, km.KmSeabedImage89, km.Km)
 
         elif self.id == 0x6b:
-            self.watercolumn = km.KmWatercolumn(this_data)
+            self.watercolumn = LazyDatagram(this_data, km.KmWatercolumn, km.Km)
 
         else:
             logger.error("Missing parser for datagram type: %s" % self.id)
@@ -3,11 +3,10 @@ import operator
 import logging
 import functools
 import time
-import struct
-from typing import Optional
 
 from hyo2.soundspeed.listener.abstract import AbstractListener
 from hyo2.soundspeed.formats import kmall
+from hyo2.soundspeed.listener.sis.lazy import LazyDatagram
 
 logger = logging.getLogger(__name__)
 
@@ -15,10 +14,8 @@ logger = logging.getLogger(__name__)
 class Sis5(AbstractListener):
     """Kongsberg SIS5 listener"""
 
-    def __init__(self, port: int, datagrams: list, timeout: int = 1, ip: str = "0.0.0.0",
-                 target: Optional[object] = None, name: Optional[str] = "SIS5") -> None:
-        super(Sis5, self).__init__(port=port, datagrams=datagrams, ip=ip, timeout=timeout,
-                                   target=target, name=name)
+    def __init__(self, port: int, datagrams: list, timeout: int = 1, ip: str = "0.0.0.0") -> None:
+        super(Sis5, self).__init__(port=port, datagrams=datagrams, ip=ip, timeout=timeout)
         self.desc = "Kongsberg SIS5"
 
         # Datagram id
@@ -29,6 +26,9 @@ class Sis5(AbstractListener):
         self.spo = None
         self.svp = None
 
+        # the #MRZ datagrams larger than an UDP packet are received in partitions
+        self._mrz_partitions = kmall.KmallPartitions()
+
     def __repr__(self) -> str:
         msg = "%s" % super(Sis5, self).__repr__()
         # msg += "  <has data loaded: %s>\n" % self.has_data_loaded
@@ -66,29 +66,31 @@ class Sis5(AbstractListener):
         self._parse_sis_5()
 
     def _parse_sis_5(self) -> None:
-        this_data = self.data[:]
+        this_data = self.data
         # logger.debug("SIS 5: %s" % this_data)
 
-        self.id = b''.join(struct.unpack("<I4c", this_data[:8])[1:5])
-        try:
-            name = kmall.Kmall.datagrams[self.id]
-        except KeyError:
-            name = "Unknown name"
+        self.id = bytes(memoryview(this_data)[4:8])
+        if self.id not in kmall.Kmall.datagrams:
+            self.stats.add_unknown(self.id)
 
         if self.id not in self.datagrams:
             return
 
-        logger.info("%s > DG %s [%s] > sz: %.2f KB"
-                    % (self.sender, self.id, name, len(this_data) / 1024))
-
+        # only the header is parsed here, the body is decoded on the first access to one of its fields
         if self.id == b'#MRZ':
-            self.mrz = kmall.KmallMRZ(this_data)
+            dropped = self._mrz_partitions.dropped
+            this_data = self._mrz_partitions.add(this_data)
+            if self._mrz_partitions.dropped > dropped:
+                self.stats.add_dropped(self._mrz_partitions.dropped - dropped)
+            if this_data is None:  # waiting for the other partitions
+                return
+            self.mrz = LazyDatagram(this_data, kmall.KmallMRZ, kmall.Kmall)
 
         elif self.id == b'#SPO':
-            self.spo = kmall.KmallSPO(this_data)
+            self.spo = LazyDatagram(this_data, kmall.KmallSPO, kmall.Kmall)
 
         elif self.id == b'#SVP':
-            self.svp = kmall.KmallSVP(this_data)
+            self.svp = LazyDatagram(this_data, kmall.KmallSVP, kmall.Kmall)
 
         else:
             logger.error("Missing parser for datagram type: %s" % self.id)
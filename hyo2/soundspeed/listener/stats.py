@@ -0,0 +1,95 @@
+import logging
+import time
+from collections import Counter, deque
+from threading import Lock
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ListenerStats:
+    """Ring buffer of the recently received datagrams, with the live statistics of a listener
+
+    The statistics are updated in the receiving thread, and can be polled from any other thread.
+    The rates are calculated on the datagrams received in the last `window` seconds (up to the buffer size).
+    """
+
+    def __init__(self, size: int = 128, window: float = 5.0) -> None:
+        self.size = size
+        self.window = window
+
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._recent = deque(maxlen=self.size)  # (receive time, datagram id, data)
+            self._parse_times = deque(maxlen=self.size)
+            self.packets = 0
+            self.bytes = 0
+            self.dropped = 0
+            self.ids = Counter()
+            self.unknown_ids = Counter()
+
+    def add(self, data: bytes, dg_id: Optional[object] = None, parse_time: float = 0.0,
+            rx_time: Optional[float] = None) -> None:
+        """Add a received datagram, with the time (in seconds) to parse it"""
+        if rx_time is None:
+            rx_time = time.time()
+        with self._lock:
+            self._recent.append((rx_time, dg_id, data))
+            self._parse_times.append(parse_time)
+            self.packets += 1
+            self.bytes += len(data)
+            self.ids[dg_id] += 1
+
+    def add_dropped(self, count: int = 1) -> None:
+        with self._lock:
+            self.dropped += count
+
+    def add_unknown(self, dg_id: object) -> None:
+        with self._lock:
+            self.unknown_ids[dg_id] += 1
+
+    @property
+    def recent(self) -> list:
+        """Return the recently received datagrams as (receive time, datagram id, data) tuples"""
+        with self._lock:
+            return list(self._recent)
+
+    def snapshot(self, now: Optional[float] = None) -> dict:
+        """Return the current statistics"""
+        if now is None:
+            now = time.time()
+        with self._lock:
+            sizes = [len(data) for rx_time, _, data in self._recent if rx_time >= now - self.window]
+            span = self.window
+            if (len(sizes) == len(self._recent)) and (len(self._recent) == self.size):  # buffer shorter than window
+                span = max(now - self._recent[0][0], 1e-3)
+            parse_times = np.array(self._parse_times) * 1000.0
+
+            stats = {
+                'packets': self.packets,
+                'bytes': self.bytes,
+                'packets_per_sec': len(sizes) / span,
+                'bytes_per_sec': sum(sizes) / span,
+                'dropped': self.dropped,
+                'ids': dict(self.ids),
+                'unknown_ids': dict(self.unknown_ids),
+                'last_rx_time': self._recent[-1][0] if len(self._recent) > 0 else None,
+            }
+
+        for percentile in [50, 95, 99]:
+            stats['parse_ms_p%d' % percentile] = \
+                float(np.percentile(parse_times, percentile)) if parse_times.size > 0 else None
+        return stats
+
+    def __repr__(self) -> str:
+        stats = self.snapshot()
+        msg = "  <packets: %d [%.1f/s]>\n" % (stats['packets'], stats['packets_per_sec'])
+        msg += "  <bytes: %d [%.1f KB/s]>\n" % (stats['bytes'], stats['bytes_per_sec'] / 1024)
+        msg += "  <dropped: %d>\n" % stats['dropped']
+        msg += "  <unknown ids: %s>\n" % stats['unknown_ids']
+        return msg
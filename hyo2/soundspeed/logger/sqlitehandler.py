@@ -1,5 +1,8 @@
 import sqlite3
 import logging
+import threading
+import collections
+import sys
 import time
 
 initial_sql = """CREATE TABLE IF NOT EXISTS log(
@@ -34,42 +37,139 @@ insertion_sql = """INSERT INTO log(
                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
                """
 
-count_logs_sql = "SELECT COUNT(*) FROM log"
+max_rowid_sql = "SELECT MAX(rowid) FROM log"
 
-delete_logs_sql = "DELETE FROM log WHERE rowid NOT in (SELECT rowid FROM log ORDER BY rowid DESC LIMIT 3000)"
+delete_logs_sql = "DELETE FROM log WHERE rowid <= ?"
 
 
 class SQLiteHandler(logging.Handler):
-    """ Thread-safe logging handler for SQLite. """
+    """ Thread-safe logging handler for SQLite.
 
-    def __init__(self, db='logger.db'):
+    The records are queued by 'emit' and written by a dedicated writer thread (started at the first record) in a
+    single transaction every 'flush_interval' seconds, or as soon as 'batch_size' records are queued. When the queue
+    is full, the oldest records are dropped. Only the latest 'max_logs' rows are kept in the db.
+    """
+
+    def __init__(self, db='logger.db', max_logs=10000, max_queue_size=10000, batch_size=500, flush_interval=1.0):
         logging.Handler.__init__(self)
         self.db = db
+        self.max_logs = max_logs
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = collections.deque(maxlen=max_queue_size)
+        self._cond = threading.Condition()
+        self._writing = 0  # records taken by the writer and not yet committed
+        self._flushing = 0  # callers waiting in 'flush'
+        self._dropped = 0
+        self._closing = False
+        self._writer = None
+
         conn = sqlite3.connect(self.db)
         conn.execute(initial_sql)
-        logs_nr = conn.execute(count_logs_sql).fetchone()[0]
-        if logs_nr > 10000:  # if there are more than 10,000 logs, delete them excepct the last 3,000
-            conn.execute(delete_logs_sql)
-        conn.commit()  # not efficient, but thread-safe
+        self._prune(conn)
+        conn.commit()
+        conn.close()
+
+    @property
+    def dropped(self):
+        """Number of records dropped because the queue was full"""
+        return self._dropped
 
     def format_time(self, record):
         """ Create a time stamp """
         record.dbtime = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
 
     def emit(self, record):
-        self.format(record)
-        self.format_time(record)
-        if record.exc_info:  # for exceptions
-            record.exc_text = logging._defaultFormatter.formatException(record.exc_info)
-        else:
-            record.exc_text = ""
-
-        # Insert the log record
-        rd = record.__dict__
-        tup = (rd['dbtime'], rd['name'], rd['levelno'], rd['levelname'],
-               rd['msg'], rd['module'], rd['funcName'],
-               rd['lineno'], rd['exc_text'], rd['process'],
-               rd['thread'], rd['threadName'],)
+        try:
+            self.format(record)
+            self.format_time(record)
+            if record.exc_info:  # for exceptions
+                record.exc_text = logging._defaultFormatter.formatException(record.exc_info)
+            else:
+                record.exc_text = ""
+
+            # Queue the log record
+            rd = record.__dict__
+            tup = (rd['dbtime'], rd['name'], rd['levelno'], rd['levelname'],
+                   rd['msg'], rd['module'], rd['funcName'],
+                   rd['lineno'], rd['exc_text'], rd['process'],
+                   rd['thread'], rd['threadName'],)
+
+        except Exception:
+            self.handleError(record)
+            return
+
+        with self._cond:
+            if self._closing:
+                return
+            if len(self._queue) == self._queue.maxlen:  # the oldest record is dropped
+                self._dropped += 1
+            self._queue.append(tup)
+
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="SQLiteHandler",
+                                                daemon=True)
+                self._writer.start()
+            elif len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self):
+        """Wait for the queued records to be written"""
+        with self._cond:
+            if self._writer is None:
+                return
+            self._flushing += 1
+            self._cond.notify_all()
+            while (len(self._queue) > 0 or self._writing > 0) and self._writer.is_alive():
+                self._cond.wait(timeout=self.flush_interval)
+            self._flushing -= 1
+
+    def close(self):
+        """Write the queued records and stop the writer thread"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            writer = self._writer
+
+        if writer is not None:
+            writer.join()
+
+        logging.Handler.close(self)
+
+    def _write_loop(self):
         conn = sqlite3.connect(self.db)
-        conn.execute(insertion_sql, tup)
-        conn.commit()  # not efficient, but thread-safe
+
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closing or (self._flushing > 0 and len(self._queue) > 0) or
+                                    len(self._queue) >= self.batch_size, timeout=self.flush_interval)
+                if len(self._queue) == 0:
+                    if self._closing:
+                        break
+                    continue
+
+                batch = list(self._queue)
+                self._queue.clear()
+                self._writing = len(batch)
+
+            try:
+                with conn:
+                    conn.executemany(insertion_sql, batch)
+                    self._prune(conn)
+
+            except sqlite3.Error as e:
+                if logging.raiseExceptions:
+                    sys.stderr.write("unable to write %d log records to %s: %s\n" % (len(batch), self.db, e))
+
+            with self._cond:
+                self._writing = 0
+                self._cond.notify_all()
+
+        conn.close()
+
+    def _prune(self, conn):
+        """Delete the oldest rows beyond the latest 'max_logs' ones"""
+        max_rowid = conn.execute(max_rowid_sql).fetchone()[0]
+        if max_rowid is not None and max_rowid > self.max_logs:
+            conn.execute(delete_logs_sql, (max_rowid - self.max_logs,))
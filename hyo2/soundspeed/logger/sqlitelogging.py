@@ -37,6 +37,7 @@ class SqliteLogging:
     def deactivate_user_db(self):
         logger.info("END logger for user processing")
         logging.getLogger().removeHandler(self.user)
+        self.user.flush()
         self._user_active = False
 
     def activate_server_db(self):
@@ -47,4 +48,5 @@ class SqliteLogging:
     def deactivate_server_db(self):
         logger.info("END logger for server processing")
         logging.getLogger().removeHandler(self.server)
+        self.server.flush()
         self._server_active = False
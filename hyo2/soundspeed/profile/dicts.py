@@ -201,6 +201,23 @@ class Dicts:
 
     ])
 
+    # maximum number of sound speed samples accepted by the Kongsberg systems
+    # ('EM' + the model number in the datagram headers, with 'default' used for the unknown models)
+    kng_max_points = OrderedDict([
+
+        ('EM2040', 1000),
+        ('EM710', 1000),
+        ('EM302', 1000),
+        ('EM122', 1000),
+        ('EM3000', 570),
+        ('EM3020', 570),  # EM3002
+        ('EM1002', 570),
+        ('EM300', 570),
+        ('EM120', 570),
+        ('default', 1000),
+
+    ])
+
     uom_symbols = OrderedDict([
 
         ('unknown', 'NA'),
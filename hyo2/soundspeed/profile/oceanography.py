@@ -319,18 +319,19 @@ class Oceanography:
         h = pr - p
         xk = h * cls.atg(s=s, t=t, p=p)
 
-        t += + 0.5 * xk
+        # not in place: the passed temperature and pressure may be arrays (e.g., from d2p)
+        t = t + 0.5 * xk
         q = xk
-        p += 0.5 * h
+        p = p + 0.5 * h
         xk = h * cls.atg(s=s, t=t, p=p)
 
-        t += 0.29289322 * (xk - q)
+        t = t + 0.29289322 * (xk - q)
         q = 0.58578644 * xk + 0.121320344 * q
         xk = h * cls.atg(s=s, t=t, p=p)
 
-        t += 1.707106781 * (xk - q)
+        t = t + 1.707106781 * (xk - q)
         q = 3.414213562 * xk - 4.121320344 * q
-        p += 0.5 * h
+        p = p + 0.5 * h
         xk = h * cls.atg(s=s, t=t, p=p)
 
         return t + (xk - 2.0 * q) / 6.0
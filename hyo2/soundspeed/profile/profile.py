@@ -1,6 +1,7 @@
 import os
 import time
 import math
+import heapq
 import numpy as np
 import logging
 
@@ -337,60 +338,42 @@ class Profile:
 
         # Calculate local mean and std dev for each sample, use 2 neighbors on either sides.
         # Endpoints treated separately. Target: single point fliers
-        for i in range(2, nr_samples - 2):
-            speed_sum = 0
-            speed_sum_sq = 0
-            for k in range(-2, 3):
-                if k == 0:  # skip itself
-                    continue
-                speed_sum += speed[i + k]
-                speed_sum_sq += speed[i + k] * speed[i + k]
+        if nr_samples > 4:
+            # shifted views of the 4 neighbors (skipping the sample itself) for the samples in [2, nr_samples - 2)
+            neighbors = [speed[0:-4], speed[1:-3], speed[3:-1], speed[4:]]
+            speed_sum = neighbors[0] + neighbors[1] + neighbors[2] + neighbors[3]
+            speed_sum_sq = neighbors[0] * neighbors[0] + neighbors[1] * neighbors[1] + \
+                neighbors[2] * neighbors[2] + neighbors[3] * neighbors[3]
 
             variance = ((4 * speed_sum_sq) - speed_sum * speed_sum) / (4 * 3)  # unbiased variance
-            speed_mean[i] = speed_sum / 4
-            if variance < 0:
-                variance = 0
-            sigma[i] = np.sqrt(variance)  # Local standard deviation
-            if sigma[i] < sigma_min_th:
-                sigma[i] = sigma_min_th
+            speed_mean[2:-2] = speed_sum / 4
+            sigma[2:-2] = np.sqrt(np.maximum(variance, 0))  # Local standard deviation
+            sigma[2:-2] = np.maximum(sigma[2:-2], sigma_min_th)
 
         # Endpoints (use only three neighboring points). Relax tolerance.
         c_end = 1.3  # Relaxed tolerance factor at endpoints.
-        ends_i = [0, 1, nr_samples - 2, nr_samples - 1]
-        index = [(1, 2, 3), (0, 2, 3), (nr_samples - 4, nr_samples - 3, nr_samples - 1),
-                 (nr_samples - 4, nr_samples - 3, nr_samples - 2)]
-        for k in range(4):
-            speed_sum = 0
-            speed_sum_sq = 0
-            i = ends_i[k]  # Point number
-            for j in range(3):
-                ind_kj = index[k][j]
-                speed_sum += speed[ind_kj]
-                speed_sum_sq += speed[ind_kj] * speed[ind_kj]
-
-            variance = ((3 * speed_sum_sq) - speed_sum * speed_sum) / (3 * 2)  # unbiased variance
-            speed_mean[i] = speed_sum / 3
-            if variance < 0:
-                variance = 0
-            sigma[i] = np.sqrt(variance)
-            if sigma[i] < sigma_min_th:
-                sigma[i] = sigma_min_th
-            sigma[i] *= c_end  # Relax tolerance for end pts
+        ends_i = np.array([0, 1, nr_samples - 2, nr_samples - 1])
+        index = np.array([(1, 2, 3), (0, 2, 3), (nr_samples - 4, nr_samples - 3, nr_samples - 1),
+                          (nr_samples - 4, nr_samples - 3, nr_samples - 2)])
+        neighbors = [speed[index[:, 0]], speed[index[:, 1]], speed[index[:, 2]]]
+        speed_sum = neighbors[0] + neighbors[1] + neighbors[2]
+        speed_sum_sq = neighbors[0] * neighbors[0] + neighbors[1] * neighbors[1] + neighbors[2] * neighbors[2]
+
+        variance = ((3 * speed_sum_sq) - speed_sum * speed_sum) / (3 * 2)  # unbiased variance
+        speed_mean[ends_i] = speed_sum / 3
+        sigma[ends_i] = np.maximum(np.sqrt(np.maximum(variance, 0)), sigma_min_th) * c_end  # Relax tolerance for end pts
 
         # identify the sample to filter
         nr_std_dev = 2  # number of standard deviations to use for error band.
         tolerance_factor = 1.3  # Tolerance factor.
         depth_th = 33.0  # Depth at which to relax error band.
-        factor = tolerance_factor
-        stat_filtered = np.zeros(nr_samples, dtype=bool)
-        for i in range(nr_samples):
-            if depth[i] > depth_th:
-                factor = 1.0
-            th = factor * nr_std_dev * sigma[i]
-            if np.absolute(speed[i] - speed_mean[i]) > th:
-                logger.debug("statistical filtering for sample #%d (%.2f, %.2f, th: %.2f)"
-                             % (i, speed[i], speed_mean[i], th))
-                stat_filtered[i] = True
+        # the tolerance factor is relaxed from the first sample deeper than the depth threshold
+        factor = np.where(np.logical_or.accumulate(depth > depth_th), 1.0, tolerance_factor)
+        th = factor * nr_std_dev * sigma
+        stat_filtered = np.absolute(speed - speed_mean) > th
+        for i in np.flatnonzero(stat_filtered):
+            logger.debug("statistical filtering for sample #%d (%.2f, %.2f, th: %.2f)"
+                         % (i, speed[i], speed_mean[i], th[i]))
 
         # finally apply the statistical filtering
         filtered_ii = np.zeros(len(self.proc_valid), dtype=bool)
@@ -444,35 +427,28 @@ class Profile:
             logger.debug("cosine avg -> storage: rows %s, columns %s" % (storage.shape[0], storage.shape[1]))
 
         # populate bin values (row #0)
-        for i in range(storage.shape[1]):
-            storage[0][i] = z_min + (- bin_width + i) * bin_size
+        storage[0] = z_min + (np.arange(storage.shape[1]) - bin_width) * bin_size
         if verbose:
             logger.debug("cosine avg -> storage bin values: %s" % (storage[0],))
 
-        # populate weights
-        for i, z in enumerate(zs):
-
-            # calculate the index of the central bin value
-            center_idx = int((z - z_min) / bin_size + .5) + bin_width
-            # if debug:
-            #     logger.debug("cosine avg -> z: %s, center index: %s" % (z, center_idx))
+        # populate weights: calculate the index of the central bin value for each sample, and then
+        # the (samples x window) indices of the bins in the averaging windows
+        center_idx = ((zs - z_min) / bin_size + .5).astype(int) + bin_width
+        bin_idx = center_idx[:, np.newaxis] + np.arange(-bin_width, bin_width + 1)[np.newaxis, :]
 
-            # calculate the differences from the current z values in the averaging windows
-            z_diff = z - storage[0][center_idx - bin_width:center_idx + bin_width + 1]
-            # if debug:
-            #     logger.debug("cosine avg -> z: %s, z diff: %s" % (z, z_diff))
+        # calculate the differences from the current z values in the averaging windows
+        z_diff = zs[:, np.newaxis] - storage[0][bin_idx]
 
-            # Insure that weight will be .1 at a window width from point I
-            bin_weights = 1.0 + np.cos(2.69 * z_diff / window_width[i])
-            bin_weights *= np.absolute(z_diff) < window_width[i]  # set to 0 when outside the window width
-            # if debug:
-            #     logger.debug("cosine avg -> z: %s, bin weights: %s" % (z, bin_weights))
-
-            for j, name in enumerate(names):
-                # summing up for all the types, row is j + 1 since the first row is for bin values
-                storage[1 + j][center_idx - bin_width:center_idx + bin_width + 1] += records[name][i] * bin_weights
+        # Insure that weight will be .1 at a window width from point I
+        bin_weights = 1.0 + np.cos(2.69 * z_diff / window_width[:, np.newaxis])
+        bin_weights *= np.absolute(z_diff) < window_width[:, np.newaxis]  # set to 0 when outside the window width
 
-            storage[-1][center_idx - bin_width:center_idx + bin_width + 1] += bin_weights
+        # summing up for all the types, row is j + 1 since the first row is for bin values
+        bin_idx = bin_idx.ravel()
+        for j, name in enumerate(names):
+            storage[1 + j] = np.bincount(bin_idx, weights=(records[name][:, np.newaxis] * bin_weights).ravel(),
+                                         minlength=storage.shape[1])
+        storage[-1] = np.bincount(bin_idx, weights=bin_weights.ravel(), minlength=storage.shape[1])
 
         if verbose:
             logger.debug("cosine avg -> storage weights: %s" % (storage[-1],))
@@ -495,28 +471,21 @@ class Profile:
 
         # logger.debug(self.proc.depth)
 
-        # insert created data into the self.proc arrays
-        last_depth = 0.0
-        for row in storage.T:
+        # skip the bins above the surface
+        storage = np.compress(storage[0] >= 0.0, storage, axis=1)
 
-            # index of where the storage record falls
-            d_th = float(row[0])
-            if d_th < last_depth:
-                continue
-            last_depth = d_th
-            try:
-                z_bools = np.logical_and(self.proc_valid, self.proc.depth > d_th)
-                i = np.argwhere(z_bools)[0]
-            except IndexError:
-                i = zs.size
-
-            self.proc.depth = np.insert(self.proc.depth, i, d_th)
-            self.proc.source = np.insert(self.proc.source, i, Dicts.sources['smoothing'])
-            self.proc.flag = np.insert(self.proc.flag, i, Dicts.flags['valid'])
-            for j, name in enumerate(names):
-                setattr(self.proc, name, np.insert(getattr(self.proc, name), i, row[j + 1]))
+        # each bin goes before the first valid sample that is deeper (or at the end, if none)
+        valid_ii = np.flatnonzero(self.proc_valid)
+        deepest = np.maximum.accumulate(self.proc.depth[valid_ii])
+        deeper_ii = np.searchsorted(deepest, storage[0], side='right')
+        insert_ii = np.append(valid_ii, self.proc.depth.size)[deeper_ii]
 
-            # logger.debug(self.proc.depth)
+        # insert created data into the self.proc arrays (in a single pass)
+        self.proc.depth = np.insert(self.proc.depth, insert_ii, storage[0])
+        self.proc.source = np.insert(self.proc.source, insert_ii, Dicts.sources['smoothing'])
+        self.proc.flag = np.insert(self.proc.flag, insert_ii, Dicts.flags['valid'])
+        for j, name in enumerate(names):
+            setattr(self.proc, name, np.insert(getattr(self.proc, name), insert_ii, storage[j + 1]))
 
         # since we inserted new samples
         self.proc.num_samples = self.proc.depth.size
@@ -1214,62 +1183,99 @@ class Profile:
 
     # - thinning
 
-    def thin(self, tolerance):
-        """Thin the sis data"""
+    def thin(self, tolerance, max_points=None):
+        """Thin the sis data
+
+        When max_points is passed, the samples are kept by decreasing Douglas-Peucker importance until
+        the tolerance is met or the number of samples reaches max_points.
+        """
         # logger.info("thinning the sis samples")
 
         # if the profile is too short, we just pass it back
-        if self.sis.depth[self.sis_valid].size < 100:
+        nr_valid = self.sis.depth[self.sis_valid].size
+        if (nr_valid < 100) and ((max_points is None) or (nr_valid <= max_points)):
             self.sis.flag[self.sis_valid] = Dicts.flags['thin']
-            logger.debug("skipping thinning for short profile (%d samples)" % self.sis.depth[self.sis_valid].size)
+            logger.debug("skipping thinning for short profile (%d samples)" % nr_valid)
             return True
 
         # - 1000 points for: EM2040, EM710, EM302 and EM122;
         # - 570 points for: EM3000, EM3002, EM1002, EM300, EM120
+        # (see Dicts.kng_max_points and SoundSpeedLibrary.kng_max_points)
         flagged = self.sis.flag[self.sis_valid][:]
         idx_start = 0
-        idx_end = self.sis.depth[self.sis_valid].size - 1
+        idx_end = nr_valid - 1
         # logger.debug('first: %s, last: %s[%s]'
         #              % (self.sis.depth[self.sis_valid][idx_start],
         #                 self.sis.depth[self.sis_valid][idx_end],
         #                 self.sis.flag[self.sis_valid][idx_end]))
-        self.douglas_peucker_1d(idx_start, idx_end, tolerance=tolerance, data=flagged)
+        if max_points is None:
+            self.douglas_peucker_1d(idx_start, idx_end, tolerance=tolerance, data=flagged)
+        else:
+            self.douglas_peucker_1d_ranked(idx_start, idx_end, tolerance=tolerance, max_points=max_points,
+                                           data=flagged)
         self.sis.flag[self.sis_valid] = flagged[:]
 
         # logger.info("thinned: %s" % self.sis.flag[self.sis_thinned].size)
         return True
 
+    @classmethod
+    def _douglas_peucker_split(cls, start, end, speed, depth):
+        """Return the index and the distance of the sample farthest from the segment chord"""
+        if end - start < 2:
+            return start, 0.0
+
+        slope = (speed[end] - speed[start]) / (depth[end] - depth[start])
+        dists = np.absolute(speed[start] + slope * (depth[start + 1:end] - depth[start]) - speed[start + 1:end])
+        dists[np.isnan(dists)] = 0
+
+        max_ind = int(np.argmax(dists))
+        return start + 1 + max_ind, dists[max_ind]
+
     def douglas_peucker_1d(self, start, end, tolerance, data):
-        """ Recursive implementation """
-        # logger.debug("dp: %s, %s" % (start, end))
+        """ Iterative implementation (explicit stack of segments) """
+        speed = self.sis.speed[self.sis_valid]
+        depth = self.sis.depth[self.sis_valid]
 
-        # We always keep end points
-        data[start] = Dicts.flags['thin']
-        data[end] = Dicts.flags['thin']
+        segments = [(start, end)]
+        while segments:
+            start, end = segments.pop()
+            # logger.debug("dp: %s, %s" % (start, end))
 
-        slope = (self.sis.speed[self.sis_valid][end] - self.sis.speed[self.sis_valid][start]) / \
-                (self.sis.depth[self.sis_valid][end] - self.sis.depth[self.sis_valid][start])
+            # We always keep end points
+            data[start] = Dicts.flags['thin']
+            data[end] = Dicts.flags['thin']
 
-        max_dist = 0
-        max_ind = 0
-        for ind in range(start + 1, end):
-            dist = abs(self.sis.speed[self.sis_valid][start] +
-                       slope * (self.sis.depth[self.sis_valid][ind] - self.sis.depth[self.sis_valid][start]) -
-                       self.sis.speed[self.sis_valid][ind])
+            max_ind, max_dist = self._douglas_peucker_split(start, end, speed, depth)
+            if max_dist <= tolerance:
+                continue
 
-            if dist > max_dist:
-                max_dist = dist
-                max_ind = ind
+            data[max_ind] = Dicts.flags['thin']
+            segments.append((max_ind, end))
+            segments.append((start, max_ind))
 
-        if max_dist <= tolerance:
-            return
+    def douglas_peucker_1d_ranked(self, start, end, tolerance, max_points, data):
+        """ Keep the samples by decreasing importance (priority queue of the segment errors) """
+        speed = self.sis.speed[self.sis_valid]
+        depth = self.sis.depth[self.sis_valid]
+
+        # We always keep end points
+        data[start] = Dicts.flags['thin']
+        data[end] = Dicts.flags['thin']
+        nr_points = 2 if end > start else 1
+
+        max_ind, max_dist = self._douglas_peucker_split(start, end, speed, depth)
+        segments = [(-max_dist, start, end, max_ind)]
+        while segments and (nr_points < max_points):
+            neg_dist, start, end, max_ind = heapq.heappop(segments)
+            if -neg_dist <= tolerance:
+                break
 
-        else:
             data[max_ind] = Dicts.flags['thin']
-            # print(max_ind, max_dist, data[max_ind])
-            self.douglas_peucker_1d(start, max_ind, tolerance, data=data)
-            self.douglas_peucker_1d(max_ind, end, tolerance, data=data)
-            return
+            nr_points += 1
+
+            for seg_start, seg_end in ((start, max_ind), (max_ind, end)):
+                seg_ind, seg_dist = self._douglas_peucker_split(seg_start, seg_end, speed, depth)
+                heapq.heappush(segments, (-seg_dist, seg_start, seg_end, seg_ind))
 
     # - debugging
 
@@ -1368,19 +1374,24 @@ class Profile:
         depths = self.proc.depth[self.proc_dqa_valid] - draft
         speeds = self.proc.speed[self.proc_dqa_valid]
 
-        ray_paths = []
-        for launch in thetas_deg:
-
-            params = RayTracing.get_svp_layer_parameters(np.deg2rad(launch), depths, speeds)
-            if travel_times is None:
-                tt = np.arange(res, params[-2][-1], res)  # make travel_times to reach end of profile
-            else:
-                tt = np.array(travel_times)
+        # layer parameters for all the launch angles in a single call (angles x layers)
+        launches = np.deg2rad(np.asarray(thetas_deg, dtype=np.float64))
+        params = RayTracing.get_svp_layer_parameters(launches, depths, speeds)
+        end_times = params[-2][:, -1]
+        if travel_times is None:
+            # make travel_times to reach end of the longest profile, then truncate them per angle
+            tt = np.arange(res, np.max(end_times), res)
+            nr_times = [max(int(math.ceil((end_time - res) / res)), 0) for end_time in end_times]
+        else:
+            tt = np.atleast_1d(np.array(travel_times, dtype=np.float64))
+            nr_times = [len(tt)] * len(launches)
 
-            rays = RayTracing.ray_trace(tt, depths, speeds, params, b_project=b_project)
-            rays[:, 0] += draft
+        rays = RayTracing.ray_trace_many(tt, launches, depths, speeds, params=params, b_project=b_project)
+        rays[..., 0] += draft
 
-            ray_paths.append(RayPath(np.vstack((tt, rays.transpose())).transpose()))
+        ray_paths = []
+        for i, nr in enumerate(nr_times):
+            ray_paths.append(RayPath(np.column_stack((tt[:nr], rays[i, :nr]))))
 
         return ray_paths
 
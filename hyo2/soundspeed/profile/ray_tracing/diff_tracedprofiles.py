@@ -26,93 +26,43 @@ class DiffTracedProfiles:
         if self.new_tp is None:
             raise RuntimeError("first set the new traced profile")
 
-        for ang in range(len(self.new_tp.rays)):
-            # logger.info("[angle: %d]" % ang)
-            ray_new = self.new_tp.rays[ang]
-            ray_old = self.old_tp.rays[ang]
+        ray_new = np.asarray(self.new_tp.rays, dtype=np.float64)
+        ray_old = np.asarray(self.old_tp.rays, dtype=np.float64)
+        nr_angles, _, nr_samples = ray_new.shape
+        angles = np.arange(nr_angles)
 
-            new_t = list()
-            new_x = list()
-            new_z = list()
+        # first retrieve common areas for both profiles (and reset the 0 values)
+        common = (ray_new[:, 0] != -1) & (ray_old[:, 0] != -1)
+        has_common = common.any(axis=1)
+        first = np.argmax(common, axis=1)
+        last = nr_samples - 1 - np.argmax(common[:, ::-1], axis=1)
 
-            old_t = list()
-            old_x = list()
-            old_z = list()
+        new_rel = ray_new - ray_new[angles, :, first][:, :, np.newaxis]
+        old_rel = ray_old - ray_old[angles, :, first][:, :, np.newaxis]
 
-            init_done = False
-            init_new_t = None
-            init_new_x = None
-            init_new_z = None
-            init_old_t = None
-            init_old_x = None
-            init_old_z = None
+        # stop to the minimum common time
+        min_time = np.minimum(new_rel[angles, 0, last], old_rel[angles, 0, last])
+        new_keep = self._before_first_exceeding(common, new_rel[:, 0], min_time)
+        old_keep = self._before_first_exceeding(common, old_rel[:, 0], min_time)
 
-            # first retrieve common areas for both profiles (and reset the 0 values)
-            for idx in range(len(ray_new[0])):
+        # the comparison stops at the first angle without a common area
+        nr_compared = nr_angles if has_common.all() else np.argmin(has_common) + 1
 
-                if ray_new[0][idx] == -1:
-                    continue
-                if ray_old[0][idx] == -1:
-                    continue
-
-                if not init_done:
-                    # logger.debug("begin z: %s/%s" % (ray_new[2][idx], ray_old[2][idx]))
-                    init_new_t = ray_new[0][idx]
-                    init_new_x = ray_new[1][idx]
-                    init_new_z = ray_new[2][idx]
-                    init_old_t = ray_old[0][idx]
-                    init_old_x = ray_old[1][idx]
-                    init_old_z = ray_old[2][idx]
-                    init_done = True
-
-                new_t.append(ray_new[0][idx] - init_new_t)
-                new_x.append(ray_new[1][idx] - init_new_x)
-                new_z.append(ray_new[2][idx] - init_new_z)
-
-                old_t.append(ray_old[0][idx] - init_old_t)
-                old_x.append(ray_old[1][idx] - init_old_x)
-                old_z.append(ray_old[2][idx] - init_old_z)
-
-            # logger.debug("end z: %s/%s" % (new_z[-1], old_z[-1]))
-
-            if (len(new_t) == 0) or (len(old_t) == 0):
-                self.new_rays.append(np.array([list(), list(), list()]))
-                self.old_rays.append(np.array([list(), list(), list()]))
-                return
-
-            new_is_longer = False
-            min_time = new_t[-1]
-            if new_t[-1] > old_t[-1]:
-                min_time = old_t[-1]
-                new_is_longer = True
-            # logger.debug("new is longer: %s" % new_is_longer)
-            # logger.debug("min time: %s" % min_time)
-
-            n_t = list()
-            n_x = list()
-            n_z = list()
-
-            # stop to the minimum common time
-            for idx in range(len(new_t)):
-                if new_t[idx] > min_time:
-                    break
-
-                n_t.append(new_t[idx])
-                n_x.append(new_x[idx])
-                n_z.append(new_z[idx])
-
-            o_t = list()
-            o_x = list()
-            o_z = list()
-
-            # stop to the minimum common time
-            for idx in range(len(old_t)):
-                if old_t[idx] > min_time:
-                    break
-
-                o_t.append(old_t[idx])
-                o_x.append(old_x[idx])
-                o_z.append(old_z[idx])
-
-            self.new_rays.append(np.array([n_t, n_x, n_z]))
-            self.old_rays.append(np.array([o_t, o_x, o_z]))
+        self.new_rays = list()
+        self.old_rays = list()
+        for ang in range(nr_compared):
+            self.new_rays.append(new_rel[ang][:, new_keep[ang]])
+            self.old_rays.append(old_rel[ang][:, old_keep[ang]])
+
+        # depth tolerance at the end of each new ray
+        keep = new_keep[:nr_compared]
+        last_kept = nr_samples - 1 - np.argmax(keep[:, ::-1], axis=1)
+        new_z_ends = np.where(keep.any(axis=1), new_rel[np.arange(nr_compared), 2, last_kept], np.nan)
+        self.max_tolerances = new_z_ends * self.variable_allowable_error + self.fixed_allowable_error
+
+    @classmethod
+    def _before_first_exceeding(cls, common, times, min_time):
+        """Mask of the common samples preceding the first one with time greater than the passed minimum time"""
+        exceeding = common & (times > min_time[:, np.newaxis])
+        cut = np.where(exceeding.any(axis=1), np.argmax(exceeding, axis=1), times.shape[1])
+        return common & (np.arange(times.shape[1])[np.newaxis, :] < cut[:, np.newaxis])
@@ -97,10 +97,8 @@ class PlotTracedProfiles:
         new_x_ends = [ray[1][-1] for ray in self._d.new_rays]
         old_z_ends = [ray[2][-1] for ray in self._d.old_rays]
         new_z_ends = [ray[2][-1] for ray in self._d.new_rays]
-        up_tol = [(ray[2][-1] - ray[2][-1] * self._d.variable_allowable_error - self._d.fixed_allowable_error)
-                  for ray in self._d.new_rays]
-        down_tol = [(ray[2][-1] + ray[2][-1] * self._d.variable_allowable_error + self._d.fixed_allowable_error)
-                    for ray in self._d.new_rays]
+        up_tol = np.array(new_z_ends) - self._d.max_tolerances
+        down_tol = np.array(new_z_ends) + self._d.max_tolerances
 
         # error plot axis
         err_ax = fig.add_subplot(1, 2, 2)
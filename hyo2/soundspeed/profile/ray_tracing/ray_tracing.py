@@ -9,7 +9,61 @@ class RayTracing:
 
     @classmethod
     def get_svp_layer_parameters(cls, launch_angle_radians, depths, speeds):
-        return cls.get_svp_layer_parameters_slow(launch_angle_radians, depths, speeds)
+        """Vectorized computation of the layer parameters for one or more launch angles
+
+        When a 1-D array of launch angles is passed, gamma, radius, total_time and total_range are
+        returned as 2-D arrays (angles x layers). The gradient does not depend on the angle, so it is always 1-D.
+        """
+        speed = np.array(speeds, np.float64)  # need double precision for this computation
+        depth = np.array(depths, np.float64)
+        depth[0] = 0.0  # assume zero for top layer
+
+        launch = np.array(launch_angle_radians, np.float64)
+        is_scalar = launch.ndim == 0
+        launch = np.atleast_1d(launch)[:, np.newaxis]
+
+        delta_depth = np.diff(depth)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gradient = np.diff(speed) / delta_depth
+
+            # Snell's law: sin(gamma) / speed is constant along the ray
+            sin_gamma = (sin(launch) / speed[0]) * speed[np.newaxis, :]
+            gamma = arcsin(sin_gamma)
+            gamma[:, 0] = launch[:, 0]
+            # once the ray turns (invalid arcsin), it stays invalid for all the following layers
+            gamma[np.logical_or.accumulate(np.isnan(gamma), axis=1)] = np.nan
+
+            g_top = gamma[:, :-1]
+            g_bot = gamma[:, 1:]
+            is_nadir = g_top == 0
+            is_straight = ~is_nadir & (gradient == 0)
+            is_curved = ~is_nadir & ~is_straight
+
+            # nadir beam (could cause division by zero errors in the other cases)
+            dt_nadir = delta_depth / ((speed[1:] + speed[:-1]) / 2.0)
+            # constant gradient: no curvature
+            dt_straight = delta_depth / (speed[:-1] * cos(g_top))
+            dr_straight = delta_depth * tan(g_top)
+            # constant non-zero gradient: circular arc
+            layer_radius = speed[:-1] / (gradient * sin(g_top))
+            dt_curved = log(tan(g_bot / 2.0) / tan(g_top / 2.0)) / gradient
+            dr_curved = layer_radius * (cos(g_top) - cos(g_bot))
+
+            delta_time = np.where(is_nadir, dt_nadir, np.where(is_straight, dt_straight, dt_curved))
+            delta_range = np.where(is_nadir, 0.0, np.where(is_straight, dr_straight, dr_curved))
+
+        nr_angles = launch.shape[0]
+        radius = np.zeros((nr_angles, len(depth)), np.float64)
+        radius[:, :-1] = np.where(is_curved, layer_radius, 0.0)
+        total_time = np.zeros((nr_angles, len(depth)), np.float64)
+        np.cumsum(delta_time, axis=1, out=total_time[:, 1:])
+        total_range = np.zeros((nr_angles, len(depth)), np.float64)
+        np.cumsum(delta_range, axis=1, out=total_range[:, 1:])
+
+        if is_scalar:
+            return gradient, gamma[0], radius[0], total_time[0], total_range[0]
+
+        return gradient, gamma, radius, total_time, total_range
 
     @classmethod
     def get_svp_layer_parameters_slow(cls, launch_angle_radians, depths, speeds):
@@ -54,6 +108,83 @@ class RayTracing:
 
     @classmethod
     def ray_trace(cls, travel_times, depths, speeds, params, b_project=False):
+        """Return a (times x 2) array of depth/range values, where -1 denotes out of range"""
+        travel_times = np.atleast_1d(np.asarray(travel_times, np.float64))
+        gradient, gamma, radius, total_time, total_range = params
+        table = (gradient, gamma[np.newaxis], radius[np.newaxis], total_time[np.newaxis], total_range[np.newaxis])
+        return cls._ray_trace_table(travel_times, depths, speeds, table, b_project=b_project)[0]
+
+    @classmethod
+    def ray_trace_many(cls, travel_times, angles, depths, speeds, params=None, b_project=False):
+        """Ray trace several launch angles (in radians) for the same travel times in a single pass
+
+        The returned (angles x times x 2) array holds depth/range values, where -1 denotes out of range.
+        The layer parameters can be passed when already computed for the same angles.
+        """
+        travel_times = np.atleast_1d(np.asarray(travel_times, np.float64))
+        if params is None:
+            params = cls.get_svp_layer_parameters(np.atleast_1d(angles), depths, speeds)
+        return cls._ray_trace_table(travel_times, depths, speeds, params, b_project=b_project)
+
+    @classmethod
+    def _ray_trace_table(cls, travel_times, depths, speeds, params, b_project=False):
+        gradient, gamma, radius, total_time, total_range = params
+        nr_angles, nr_depths = total_time.shape
+        nr_layers = nr_depths - 1
+
+        speed = np.array(speeds, np.float64)
+        depth = np.array(depths, np.float64)
+        depth[0] = 0.0  # assume zero for top layer
+
+        # end layer for each angle and travel time (-1 becomes the top layer), with a single search on all the
+        # angles: the times are replaced by their ranks, so that the rows of each angle are exactly offset
+        unique_times, ranks = np.unique(np.concatenate([total_time.ravel(), travel_times]), return_inverse=True)
+        ranks = ranks.ravel()
+        row_offsets = np.arange(nr_angles)[:, np.newaxis]
+        table_ranks = ranks[:total_time.size].reshape(total_time.shape) + row_offsets * (unique_times.size + 1)
+        time_ranks = ranks[total_time.size:] + row_offsets * (unique_times.size + 1)
+        nr_end_layers = table_ranks.ravel().searchsorted(time_ranks) - row_offsets * nr_depths - 1
+        np.clip(nr_end_layers, 0, None, out=nr_end_layers)
+
+        valid = np.ones(nr_end_layers.shape, dtype=bool) if b_project else (nr_end_layers < nr_layers)
+        nr_next_layers = np.minimum(nr_end_layers + 1, nr_layers)
+        rows = np.arange(nr_angles)[:, np.newaxis]
+
+        times = np.broadcast_to(travel_times, nr_end_layers.shape)
+        time_top = total_time[rows, nr_end_layers]
+        time_bot = total_time[rows, nr_next_layers]
+        gamma_end = gamma[rows, nr_end_layers]
+        radius_end = radius[rows, nr_end_layers]
+        gradient_end = gradient[np.minimum(nr_end_layers, nr_layers - 1)]
+        speed_top = speed[nr_end_layers]
+        depth_top = depth[nr_end_layers]
+        range_top = total_range[rows, nr_end_layers]
+        tau = times - time_top
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            # no curvature: linear interpolation of the speed within the layer (if any)
+            time_span = time_bot - time_top
+            ratio = np.divide(times - time_top, time_span, out=(times >= time_top).astype(np.float64),
+                              where=time_span != 0)
+            ratio = np.where(nr_end_layers < nr_layers, np.clip(ratio, 0.0, 1.0), 0.0)
+            end_speed = speed_top + ratio * (speed[nr_next_layers] - speed_top)
+            avg_speed = (speed_top + end_speed) / 2.0
+            straight_depth = avg_speed * tau * cos(gamma_end) + depth_top
+            straight_range = avg_speed * tau * sin(gamma_end) + range_top
+
+            # constant non-zero gradient: circular arc
+            end_gamma = 2 * arctan(tan(gamma_end / 2.0) * exp(gradient_end * tau))
+            curved_depth = radius_end * (sin(end_gamma) - sin(gamma_end)) + depth_top
+            curved_range = radius_end * (-cos(end_gamma) + cos(gamma_end)) + range_top
+
+        is_straight = radius_end == 0
+        ret = np.full(nr_end_layers.shape + (2,), -1.0)  # create an array where -1 denotes out of range
+        ret[..., 0] = np.where(valid, np.where(is_straight, straight_depth, curved_depth), -1.0)
+        ret[..., 1] = np.where(valid, np.where(is_straight, straight_range, curved_range), -1.0)
+        return ret
+
+    @classmethod
+    def ray_trace_slow(cls, travel_times, depths, speeds, params, b_project=False):
 
         nr_layers = len(depths) - 1
 
@@ -0,0 +1,158 @@
+import math
+import numpy as np
+from scipy.interpolate import interp1d
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TracedProfile:
+    """Rays traced through a sound speed profile for a fan of launch angles (0 to half swath, 1-degree step)
+
+    All the rays are computed at once in (angles x samples) arrays: `rays` is an (angles x 3 x samples) array
+    with travel time, across-track distance and depth for each angle.
+    """
+
+    def __init__(self, ssp, half_swath=70, avg_depth=10000, tss_depth=None, tss_value=None):
+        self.avg_depth = float(avg_depth)
+        self.half_swath = float(half_swath)
+
+        # select samples for the ray tracing (must be deeper than the transducer depth)
+        vi = ssp.proc_valid
+        depths = np.array(ssp.proc.depth[vi], dtype=np.float64)
+        speeds = np.array(ssp.proc.speed[vi], dtype=np.float64)
+
+        # skip samples at depth less than the draft
+        if tss_depth is not None:
+            below_draft = depths > tss_depth
+            depths = depths[below_draft]
+            speeds = speeds[below_draft]
+
+        # stop after the first sample deeper than the avg depth (safer)
+        deeper = np.flatnonzero(depths > self.avg_depth)
+        if len(deeper) > 0:
+            depths = depths[:deeper[0] + 1]
+            speeds = speeds[:deeper[0] + 1]
+
+        if tss_depth is not None:
+            depths = np.insert(depths, 0, tss_depth)
+        if tss_value is not None:
+            speeds = np.insert(speeds, 0, tss_value)
+
+        # remove extension value (if any)
+        if len(depths) > 3:
+            if (depths[-1] - depths[-2]) > 1000:
+                logger.info("removed latest extension depth: %s" % depths[-1])
+                depths = depths[:-1]
+
+        if len(depths) == 0:
+            raise RuntimeError("invalid profile with zero valid depth values")
+
+        logger.info("profile timestamp: %s" % ssp.meta.utc_time)
+        logger.debug("valid samples: %d" % (len(depths)), )
+        logger.debug("depth: min %.2f, max %.2f" % (depths[0], depths[-1]))
+
+        # ray-trace a few angles (ref: Lurton, An Introduction to UA, p.50-52)
+        angles = np.arange(0, int(math.ceil(self.half_swath + 1)))
+        total_t, total_x, total_z = self._trace(depths, speeds[:len(depths)], np.radians(90.0 - angles))
+
+        if len(depths) > 1:
+            self.harmonic_means = (total_z[-1] - total_z[0]) / (total_t[:, -1] - total_t[:, 0])
+
+            # interpolate between 0 and 5000 meters with decimetric resolution
+            interp_z = np.linspace(0, 5000, num=25001, endpoint=True)
+            fx = interp1d(total_z, total_x, kind='cubic', axis=1, bounds_error=False, fill_value=-1)
+            ft = interp1d(total_z, total_t, kind='cubic', axis=1, bounds_error=False, fill_value=-1)
+
+            self.rays = np.empty((len(angles), 3, len(interp_z)), dtype=np.float64)
+            self.rays[:, 0] = ft(interp_z)
+            self.rays[:, 1] = fx(interp_z)
+            self.rays[:, 2] = interp_z
+
+        else:
+            self.harmonic_means = np.full(len(angles), depths[0])
+
+            self.rays = np.empty((len(angles), 3, 1), dtype=np.float64)
+            self.rays[:, 0] = total_t
+            self.rays[:, 1] = total_x
+            self.rays[:, 2] = total_z
+
+        logger.debug("rays: %d (%d samples per-ray)" % (len(self.rays), len(self.rays[0][0])))
+        self.date_time = ssp.meta.utc_time
+        self.latitude = ssp.meta.latitude
+        self.longitude = ssp.meta.longitude
+        self.data = [depths, speeds]
+
+    @classmethod
+    def _trace(cls, depths, speeds, betas):
+        """Return travel time and across-track distance (angles x samples) and the depths of the traced samples
+
+        The ray angles (betas) are measured from the horizontal.
+        """
+        dz = np.diff(depths)
+        dc = np.diff(speeds)
+
+        # Snell's law: cos(beta) / speed is constant along the ray, until the ray turns horizontal and
+        # the constant is reset to the speed where that happened (clipping of the invalid beta cosines)
+        snell = np.minimum((np.cos(betas) / speeds[0])[:, np.newaxis],
+                           1.0 / np.maximum.accumulate(speeds)[np.newaxis, :])
+        nr_invalid = np.count_nonzero(speeds[1:] * snell[:, :-1] > 1.0)
+        if nr_invalid > 0:
+            logger.warning("invalid beta cos: %d (clipped)" % nr_invalid)
+        beta_cos = np.clip(speeds[np.newaxis, :] * snell, -1.0, 1.0)
+        beta_cos[:, 0] = np.cos(betas)
+        beta = np.arccos(beta_cos)
+
+        b_top = beta[:, :-1]
+        b_bot = beta[:, 1:]
+        cos_top = np.cos(b_top)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # "constant speed" case: no curvature
+            dx_straight = dz / np.tan(b_bot)
+            dt_straight = np.sqrt(dx_straight ** 2 + dz ** 2) / speeds[1:]
+
+            # constant gradient case
+            gradient = dc / dz  # Lurton, (2.64)
+            curve = np.where(cos_top == 0, 0.0, speeds[:-1] / (gradient * cos_top))  # Lurton, (2.66)
+            dx_curved = curve * (np.sin(b_top) - np.sin(b_bot))  # Lurton, (2.67)
+            dt_curved = np.abs((1 / gradient) *
+                               np.log((speeds[1:] / speeds[:-1]) *
+                                      np.abs((1 + np.sin(b_top)) / (1 + np.sin(b_bot)))))  # Lurton, (2.70)
+
+            dx = np.where(dc == 0, dx_straight, dx_curved)
+            dt = np.where(dc == 0, dt_straight, dt_curved)
+
+        # samples at the same depth only adjust the ray angle
+        traced = dz != 0
+        total_z = np.concatenate(([depths[0]], depths[0] + np.cumsum(dz[traced])))
+        total_x = np.zeros((len(betas), len(total_z)), dtype=np.float64)
+        np.cumsum(dx[:, traced], axis=1, out=total_x[:, 1:])
+        total_t = np.zeros((len(betas), len(total_z)), dtype=np.float64)  # total travel time
+        np.cumsum(dt[:, traced], axis=1, out=total_t[:, 1:])
+
+        return total_t, total_x, total_z
+
+    def str_rays(self):
+        msg = str()
+        for ang in range(len(self.rays)):
+            msg += "[%d]\n" % ang
+
+            for idx in range(len(self.rays[ang][0])):
+                msg += "%10.2f %10.2f %10.2f\n" \
+                       % (self.rays[ang][0][idx], self.rays[ang][1][idx], self.rays[ang][2][idx])
+        return msg
+
+    def __repr__(self):
+        msg = "<%s>\n" % self.__class__.__name__
+
+        msg += "  <timestamp: %s>\n" % self.date_time
+        msg += "  <latitude: %.7f>\n" % self.latitude
+        msg += "  <longitude: %.7f>\n" % self.longitude
+        msg += "  <avg depth: %.3f>\n" % self.avg_depth
+        msg += "  <half swatch: %.1f>\n" % self.half_swath
+        msg += "  <profile valid samples: %d>" % len(self.data[0])
+        msg += "  <rays: %d>\n" % len(self.rays)
+        msg += "  <samples per ray: %d>\n" % len(self.rays[0][0])
+
+        return msg
@@ -181,8 +181,10 @@ class Server(Thread):
             lat_idx, lon_idx = self.prj.atlases.woa13.grid_coords(lat=lat, lon=lon, server_mode=True)
         elif self.prj.setup.server_source == 'RTOFS':  # RTOFS case
             lat_idx, lon_idx = self.prj.atlases.rtofs.grid_coords(lat=lat, lon=lon, datestamp=tm, server_mode=True)
+            self.prj.atlases.rtofs.prefetch(datestamp=tm)  # the next day is loaded in background
         elif self.prj.setup.server_source == 'GoMOFS':  # GoMOFS case
             lat_idx, lon_idx = self.prj.atlases.gomofs.grid_coords(lat=lat, lon=lon, datestamp=tm, server_mode=True)
+            self.prj.atlases.gomofs.prefetch(datestamp=tm)  # the next day is loaded in background
         else:
             raise RuntimeError('unable to understand server source: %s' % self.prj.setup.server_source)
         # logger.debug('lat idx: %s [last: %s]' % (lat_idx, self.lat_idx_last))
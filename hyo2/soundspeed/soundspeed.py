@@ -440,34 +440,26 @@ class SoundSpeedLibrary:
         self.ssp = reader.ssp
         logger.debug("data file successfully parsed!")
 
-        # retrieve atlases data for each retrieved profile
-        for pr in self.ssp.l:
-
-            if self.use_woa09() and self.has_woa09() and not skip_atlas:
-                pr.woa09 = self.atlases.woa09.query(lat=pr.meta.latitude, lon=pr.meta.longitude,
-                                                    datestamp=pr.meta.utc_time)
-
-            if self.use_woa13() and self.has_woa13() and not skip_atlas:
-                pr.woa13 = self.atlases.woa13.query(lat=pr.meta.latitude, lon=pr.meta.longitude,
-                                                    datestamp=pr.meta.utc_time)
-
-            if self.use_rtofs() and not skip_atlas:
-                # noinspection PyBroadException
-                try:
-                    pr.rtofs = self.atlases.rtofs.query(lat=pr.meta.latitude, lon=pr.meta.longitude,
-                                                        datestamp=pr.meta.utc_time)
-                except Exception:
-                    pr.rtofs = None
-                    logger.warning("unable to retrieve RTOFS data")
-
-            if self.use_gomofs() and not skip_atlas:
-                # noinspection PyBroadException
-                try:
-                    pr.gomofs = self.atlases.gomofs.query(lat=pr.meta.latitude, lon=pr.meta.longitude,
-                                                          datestamp=pr.meta.utc_time)
-                except Exception:
-                    pr.gomofs = None
-                    logger.warning("unable to retrieve GOMOFS data")
+        # retrieve atlases data for all the retrieved profiles (each atlas grid is loaded once)
+        if skip_atlas:
+            return
+        points = [(pr.meta.latitude, pr.meta.longitude, pr.meta.utc_time) for pr in self.ssp.l]
+
+        if self.use_woa09() and self.has_woa09():
+            for pr, woa09 in zip(self.ssp.l, self.atlases.woa09.query_many(points)):
+                pr.woa09 = woa09
+
+        if self.use_woa13() and self.has_woa13():
+            for pr, woa13 in zip(self.ssp.l, self.atlases.woa13.query_many(points)):
+                pr.woa13 = woa13
+
+        if self.use_rtofs():
+            for pr, rtofs in zip(self.ssp.l, self.atlases.rtofs.query_many(points)):
+                pr.rtofs = rtofs
+
+        if self.use_gomofs():
+            for pr, gomofs in zip(self.ssp.l, self.atlases.gomofs.query_many(points)):
+                pr.gomofs = gomofs
 
     # --- receive data
 
@@ -686,20 +678,15 @@ class SoundSpeedLibrary:
             # special case for Kongsberg asvp format
             if name == 'asvp':
 
-                tolerances = [0.01, 0.03, 0.06, 0.1, 0.5]
-                for tolerance in tolerances:
-
-                    if not self.prepare_sis(thin_tolerance=tolerance):
-                        logger.warning("issue in preparing the data for SIS")
-                        return False
+                tolerance = 0.01
+                if not self.prepare_sis(thin_tolerance=tolerance,
+                                        thin_max_points=self.kng_max_points()):
+                    logger.warning("issue in preparing the data for SIS")
+                    return False
 
-                    si = self.cur.sis_thinned
-                    thin_profile_length = self.cur.sis.flag[si].size
-                    logger.debug("thin profile size: %d (with tolerance: %.3f)" % (thin_profile_length, tolerance))
-                    if thin_profile_length < 1000:
-                        break
-
-                    logger.info("too many samples, attempting with a lower tolerance")
+                si = self.cur.sis_thinned
+                thin_profile_length = self.cur.sis.flag[si].size
+                logger.debug("thin profile size: %d (with tolerance: %.3f)" % (thin_profile_length, tolerance))
 
             # special case (currently only used for Fugro ISS)
             if name == 'ncei':
@@ -862,13 +849,30 @@ class SoundSpeedLibrary:
         db.disconnect()
         return lst
 
-    def db_retrieve_profile(self, pk: int) -> ProfileList:
-        """Retrieve a profile by primary key"""
+    def db_retrieve_profile(self, pk: int, tables: Optional[tuple] = None) -> ProfileList:
+        """Retrieve a profile by primary key (optionally, only the 'data', 'proc' and/or 'sis' samples)"""
         db = ProjectDb(projects_folder=self.projects_folder, project_name=self.current_project)
-        ssp = db.profile_by_pk(pk=pk)
+        ssp = db.profile_by_pk(pk=pk, tables=tables)
         db.disconnect()
         return ssp
 
+    def db_query_casts(self, bbox: Optional[tuple] = None, time_range: Optional[tuple] = None,
+                       sensor_types: Optional[list] = None) -> Optional[list]:
+        """Retrieve the pks of the profiles in the passed bounding box, time range and sensor types"""
+        db = ProjectDb(projects_folder=self.projects_folder, project_name=self.current_project)
+        pks = db.query_casts(bbox=bbox, time_range=time_range, sensor_types=sensor_types)
+        db.disconnect()
+        return pks
+
+    def db_nearest_cast(self, longitude: float, latitude: float, time_range: Optional[tuple] = None,
+                        sensor_types: Optional[list] = None) -> Optional[int]:
+        """Retrieve the pk of the profile nearest to the passed position (optionally, in a time range)"""
+        db = ProjectDb(projects_folder=self.projects_folder, project_name=self.current_project)
+        pk = db.nearest_cast(longitude=longitude, latitude=latitude, time_range=time_range,
+                             sensor_types=sensor_types)
+        db.disconnect()
+        return pk
+
     def db_import_data_from_db(self, input_db_path: str) -> tuple:
         """Import profiles from another db"""
         in_projects_folder = os.path.dirname(input_db_path)
@@ -1036,10 +1040,10 @@ class SoundSpeedLibrary:
         avg_depth = 10000.0  # just a very deep value
         half_swath_angle = 70.0  # a safely large angle
 
-        ssp1 = self.db_retrieve_profile(pk1)
+        ssp1 = self.db_retrieve_profile(pk1, tables=('proc', ))
         tp1 = TracedProfile(ssp=ssp1.cur, avg_depth=avg_depth,
                             half_swath=half_swath_angle)
-        ssp2 = self.db_retrieve_profile(pk2)
+        ssp2 = self.db_retrieve_profile(pk2, tables=('proc', ))
 
         tp2 = TracedProfile(ssp=ssp2.cur, avg_depth=avg_depth,
                             half_swath=half_swath_angle)
@@ -1056,10 +1060,10 @@ class SoundSpeedLibrary:
         half_swath_angle = 70.0  # a safely large angle
 
         try:
-            ssp1 = self.db_retrieve_profile(pk1)
+            ssp1 = self.db_retrieve_profile(pk1, tables=('proc', ))
             tp1 = TracedProfile(ssp=ssp1.cur, avg_depth=avg_depth,
                                 half_swath=half_swath_angle)
-            ssp2 = self.db_retrieve_profile(pk2)
+            ssp2 = self.db_retrieve_profile(pk2, tables=('proc', ))
 
             tp2 = TracedProfile(ssp=ssp2.cur, avg_depth=avg_depth,
                                 half_swath=half_swath_angle)
@@ -1104,7 +1108,7 @@ class SoundSpeedLibrary:
             logger.error("missing the sound speed of surface sensor")
             return None
 
-        prof = self.db_retrieve_profile(pk).cur
+        prof = self.db_retrieve_profile(pk, tables=('proc', )).cur
         cast_speed = prof.interpolate_proc_speed_at_depth(depth=surface_depth)
         speed_diff = abs(cast_speed - surface_speed)
 
@@ -1143,12 +1147,12 @@ class SoundSpeedLibrary:
                 logger.error("missing the launch angle to be checked")
                 return None
 
-        profile = self.db_retrieve_profile(pk).cur
+        profile = self.db_retrieve_profile(pk, tables=('proc', )).cur
 
         if pk_ref is None:
             ref_profile = self.ref.cur
         else:
-            ref_profile = self.db_retrieve_profile(pk_ref).cur
+            ref_profile = self.db_retrieve_profile(pk_ref, tables=('proc', )).cur
 
         return ref_profile.compare_profile(profile, angle)
 
@@ -1431,7 +1435,11 @@ class SoundSpeedLibrary:
         return True
 
     def prepare_sis(self, apply_thin: Optional[bool] = True, apply_12k: Optional[bool] = True,
-                    thin_tolerance: Optional[float] = 0.01) -> bool:
+                    thin_tolerance: Optional[float] = 0.01, thin_max_points: Optional[int] = None) -> bool:
+        """Prepare the sis samples, optionally thinned to a maximum number of samples
+
+        The thin_max_points budget includes the surface and 12000 m samples possibly added after the thinning.
+        """
         if not self.has_ssp():
             logger.warning("no profile!")
             return False
@@ -1439,7 +1447,10 @@ class SoundSpeedLibrary:
         self.cur.clone_proc_to_sis()
 
         if apply_thin:
-            if not self.cur.thin(tolerance=thin_tolerance):
+            max_points = None
+            if thin_max_points is not None:
+                max_points = thin_max_points - (2 if apply_12k else 1)
+            if not self.cur.thin(tolerance=thin_tolerance, max_points=max_points):
                 logger.warning("thinning issue")
                 return False
         else:
@@ -1629,6 +1640,26 @@ class SoundSpeedLibrary:
     def listen_mvp(self) -> bool:
         return self.listeners.listen_mvp()
 
+    def kng_max_points(self) -> int:
+        """Maximum number of sound speed samples accepted by the listened Kongsberg system
+
+        The model is retrieved from the latest datagrams received by the SIS listeners.
+        """
+        model = None
+        for datagram in [self.listeners.sis4.xyz88, self.listeners.sis4.nav, self.listeners.sis4.runtime]:
+            if datagram is not None:
+                model = datagram.model
+                break
+        if model is None:
+            for datagram in [self.listeners.sis5.mrz, self.listeners.sis5.spo]:
+                if datagram is not None:
+                    model = datagram.sounder_id
+                    break
+
+        if model is None:
+            return Dicts.kng_max_points['default']
+        return Dicts.kng_max_points.get('EM%d' % model, Dicts.kng_max_points['default'])
+
     def stop_listen_sis4(self) -> bool:
         return self.listeners.stop_listen_sis4()
 
@@ -1641,6 +1672,10 @@ class SoundSpeedLibrary:
     def stop_listen_mvp(self) -> bool:
         return self.listeners.stop_listen_mvp()
 
+    def listeners_stats(self) -> dict:
+        """Return the receive statistics (e.g., packets/s, parse times, drops) of each listener"""
+        return self.listeners.stats()
+
     # --- clients
 
     def transmit_ssp(self) -> bool:
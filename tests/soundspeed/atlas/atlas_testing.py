@@ -0,0 +1,182 @@
+import threading
+from datetime import datetime as dt, timedelta
+
+import numpy as np
+from netCDF4 import Dataset
+
+
+class WoaTesting:
+    """Checks of the WOA atlases against a per-cell search on a synthetic atlas
+
+    The test case sets 'lat', 'lon', 'depth', 'bottom' (the number of sea levels for each cell), 'land' and 'rng',
+    and provides the grids used for a date with 'month_grids'.
+    """
+
+    def write_grids(self, path, var, num_times, num_levels, mean):
+        """Write the mean and standard deviation grids of the passed variable, masked below the bottom"""
+        shape = (num_times, num_levels) + self.land.shape
+        ds = Dataset(path, "w")
+        ds.createDimension('time', num_times)
+        ds.createDimension('depth', num_levels)
+        ds.createDimension('lat', self.lat.size)
+        ds.createDimension('lon', self.lon.size)
+        ds.createVariable('lat', 'f4', ('lat',))[:] = self.lat
+        ds.createVariable('lon', 'f4', ('lon',))[:] = self.lon
+        ds.createVariable('depth', 'f4', ('depth',))[:] = self.depth[:num_levels]
+        ds.createVariable('time', 'f4', ('time',))[:] = (np.arange(num_times) + 0.5) * 365.0 / num_times
+        below_bottom = np.arange(num_levels)[:, np.newaxis, np.newaxis] >= self.bottom[np.newaxis]
+        for grid_name, values in [(var + '_an', mean + np.round(self.rng.normal(0.0, 1.0, shape), 1)),
+                                  (var + '_sd', np.round(np.abs(self.rng.normal(0.5, 0.3, shape)), 1))]:
+            values[self.rng.random(shape) < 0.05] = 60.0 if var == 't' else 600.0  # invalid values
+            grid = ds.createVariable(grid_name, 'f4', ('time', 'depth', 'lat', 'lon'), fill_value=9.96921E36,
+                                     zlib=True)
+            grid[:] = np.ma.masked_array(values, mask=np.broadcast_to(below_bottom, shape))
+        ds.close()
+
+    def month_grids(self, woa, datestamp):
+        """Return the monthly and the seasonal grids (levels x lats x lons) used for the passed date, by name"""
+        raise NotImplementedError
+
+    def reference(self, woa, lat, lon, datestamp):
+        """Per-cell and per-level search of the nearest valid values"""
+        grids = dict()
+        for name, (monthly, seasonal) in self.month_grids(woa, datestamp).items():
+            grid = np.ma.array(seasonal, copy=True)
+            grid[0:monthly.shape[0]] = monthly
+            grids[name] = np.ma.filled(grid.astype(np.float64), np.nan)
+
+        values = {name: np.zeros(self.depth.size) for name in ['t', 's', 't_min', 't_max', 's_min', 's_max']}
+        dists = {name: np.full(self.depth.size, np.inf) for name in ['ts', 't_sd', 's_sd']}
+        lat_base_idx = np.abs(self.lat - lat).argmin()
+        lon_base_idx = np.abs((self.lon - lon + 180.0) % 360.0 - 180.0).argmin()
+        for lat_idx in range(lat_base_idx - woa.search_radius, lat_base_idx + woa.search_radius + 1):
+            if (lat_idx < 0) or (lat_idx >= self.lat.size):
+                continue
+            for lon_idx in range(lon_base_idx - woa.search_radius, lon_base_idx + woa.search_radius + 1):
+                lon_idx %= self.lon.size
+                if self.land[lat_idx, lon_idx]:
+                    continue
+                dist = woa.g.distance(lon, lat, self.lon[lon_idx], self.lat[lat_idx])
+
+                for i in range(self.depth.size):
+                    t_an, s_an = grids['t_an'][i, lat_idx, lon_idx], grids['s_an'][i, lat_idx, lon_idx]
+                    t_sd, s_sd = grids['t_sd'][i, lat_idx, lon_idx], grids['s_sd'][i, lat_idx, lon_idx]
+                    if (dist < dists['ts'][i]) and (t_an < 50.0) and (500.0 > s_an >= 0):
+                        values['t'][i], values['s'][i] = t_an, s_an
+                        dists['ts'][i] = dist
+                    if (dist < dists['t_sd'][i]) and (50.0 > t_sd > -2):
+                        values['t_min'][i] = max(np.float32(t_an) - np.float32(t_sd), -2.0)
+                        values['t_max'][i] = np.float32(t_an) + np.float32(t_sd)
+                        dists['t_sd'][i] = dist
+                    if (dist < dists['s_sd'][i]) and (500.0 > s_sd >= 0):
+                        values['s_min'][i] = max(np.float32(s_an) - np.float32(s_sd), 0.0)
+                        values['s_max'][i] = np.float32(s_an) + np.float32(s_sd)
+                        dists['s_sd'][i] = dist
+
+        valid = np.isfinite(dists['ts'])
+        num_values = np.count_nonzero(valid)
+        missing_sd = np.flatnonzero(~(np.isfinite(dists['t_sd']) & np.isfinite(dists['s_sd'])))
+        num_sd_values = missing_sd[0] if missing_sd.size > 0 else num_values
+        return {
+            'mean': (values['t'][valid], values['s'][valid]),
+            'min': (values['t_min'][valid][:num_sd_values], values['s_min'][valid][:num_sd_values]),
+            'max': (values['t_max'][valid][:num_sd_values], values['s_max'][valid][:num_sd_values]),
+        }
+
+    def check_profiles(self, profiles, expected):
+        self.assertIsNotNone(profiles)
+        names = ['mean'] + [name for name in ['min', 'max'] if expected[name][0].size > 0]
+        self.assertEqual(len(profiles.l), len(names))
+        for name, profile in zip(names, profiles.l):
+            temp, sal = expected[name]
+            np.testing.assert_array_almost_equal(profile.data.temp, temp, decimal=5)
+            np.testing.assert_array_almost_equal(profile.data.sal, sal, decimal=5)
+            np.testing.assert_array_equal(profile.data.depth, self.depth[:temp.size])
+
+    def check_query(self, woa, lat, lon, datestamp):
+        profiles = woa.query(lat=lat, lon=lon, datestamp=datestamp)
+        self.check_profiles(profiles, self.reference(woa, lat, lon, datestamp))
+        return profiles
+
+    def check_query_many(self, woa, points):
+        """Query the (lat, lon, date) points at once, with None for the invalid ones"""
+        results = woa.query_many(points)
+        self.assertEqual(len(results), len(points))
+        for (lat, lon, datestamp), profiles in zip(points, results):
+            if lat is None:
+                self.assertIsNone(profiles)
+                continue
+            self.check_profiles(profiles, self.reference(woa, lat, lon, datestamp))
+        return results
+
+
+class ForecastTesting:
+    """Checks of the forecast atlases (RTOFS, GoMOFS) served from a local folder with synthetic days
+
+    The test case sets 'day', writes the days with 'write_day', and provides 'new_atlas' (an atlas on the server
+    folder) and 'reference' (the depths and salinities of the nearest valid nodes read from the netCDF files).
+    """
+
+    @classmethod
+    def spy(cls, atlas, name, calls):
+        """Record the calls to the passed method of the atlas"""
+        method = getattr(atlas, name)
+
+        def wrapper(*args):
+            calls.append(args)
+            return method(*args)
+
+        setattr(atlas, name, wrapper)
+
+    @classmethod
+    def wait_prefetch(cls, atlas, day):
+        for thread in threading.enumerate():
+            if thread.name == "%s %s" % (atlas._prefetcher.name, day):
+                thread.join(timeout=5.0)
+
+    def check_query(self, atlas, lat, lon, day=None, model_day=None):
+        profiles = atlas.query(lat=lat, lon=lon, datestamp=day or self.day, server_mode=True)
+        depth, sal = self.reference(atlas, lat, lon, model_day or self.day)
+
+        self.assertIsNotNone(profiles)
+        np.testing.assert_array_almost_equal(profiles.l[0].data.depth, depth)
+        np.testing.assert_array_almost_equal(profiles.l[0].data.sal, sal, decimal=5)
+
+        # the in-situ temperatures as retrieved without the cache
+        direct = self.new_atlas(use_cache=False)
+        expected = direct.query(lat=lat, lon=lon, datestamp=model_day or self.day)
+        direct.clear_data()
+        np.testing.assert_array_almost_equal(profiles.l[0].data.temp, expected.l[0].data.temp, decimal=5)
+        return profiles
+
+    def check_prefetch_slow_open(self, module, point, uncached_point):
+        """Read the data in use while the (remote) open of the next day hangs in the passed atlas module"""
+        next_day = self.day + timedelta(days=1)
+        self.write_day(next_day)
+        atlas = self.new_atlas()
+        self.check_query(atlas, *point)
+
+        opening = threading.Event()
+        release = threading.Event()
+        timeouts = list()
+        dataset = module.Dataset
+
+        def slow_dataset(path, *args, **kwargs):
+            if next_day.strftime("%Y%m%d") in path:
+                opening.set()
+                timeouts.append(not release.wait(timeout=5.0))
+            return dataset(path, *args, **kwargs)
+
+        module.Dataset = slow_dataset
+        try:
+            atlas.prefetch(dt(next_day.year, next_day.month, next_day.day) - timedelta(hours=1))
+            self.assertTrue(opening.wait(timeout=5.0))
+            self.check_query(atlas, *uncached_point)
+            self.assertTrue(atlas._prefetcher.is_pending(next_day))
+            release.set()
+            self.wait_prefetch(atlas, next_day)
+        finally:
+            module.Dataset = dataset
+        self.assertNotIn(True, timeouts)
+        self.check_query(atlas, *point, day=next_day, model_day=next_day)
+        atlas.clear_data()
@@ -0,0 +1,55 @@
+import unittest
+from datetime import datetime as dt, date
+
+from hyo2.soundspeed.atlas.abstract import AbstractAtlas
+
+
+class FakeAtlas(AbstractAtlas):
+    """Atlas recording the queried dates"""
+
+    def __init__(self):
+        super(FakeAtlas, self).__init__(data_folder=None, prj=None)
+        self.queried = list()
+
+    def is_present(self):
+        return True
+
+    def query(self, lat, lon, datestamp=None, server_mode=False):
+        if lat is None:
+            raise RuntimeError("invalid latitude")
+        self.queried.append(datestamp)
+        return "%s %s %s" % (lat, lon, datestamp)
+
+    def download_db(self):
+        return True
+
+
+class TestSoundSpeedAtlasAbstract(unittest.TestCase):
+
+    def test_query_many(self):
+        atlas = FakeAtlas()
+        points = [(1.0, 2.0, dt(2019, 5, 2, 12, 30)),
+                  (3.0, 4.0, date(2019, 5, 1)),
+                  (5.0, 6.0, dt(2019, 5, 2, 0, 10)),
+                  (7.0, 8.0, "2019-05-03")]
+
+        results = atlas.query_many(points)
+
+        self.assertEqual(results, ["1.0 2.0 2019-05-02", "3.0 4.0 2019-05-01", "5.0 6.0 2019-05-02", None])
+        # grouped by day
+        self.assertEqual(atlas.queried, [date(2019, 5, 1), date(2019, 5, 2), date(2019, 5, 2)])
+
+    def test_query_many_failures(self):
+        atlas = FakeAtlas()
+        points = [(1.0, 2.0, date(2019, 5, 2)), (None, 5.0, date(2019, 5, 1))]
+        with self.assertRaises(RuntimeError):
+            atlas.query_many(points)
+
+        # e.g., for the remote data
+        atlas.skip_failed_queries = True
+        self.assertEqual(atlas.query_many(points), ["1.0 2.0 2019-05-02", None])
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedAtlasAbstract))
+    return s
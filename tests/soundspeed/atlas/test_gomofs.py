@@ -2,10 +2,17 @@ import unittest
 import os
 import shutil
 import logging
+from datetime import date, datetime as dt, timedelta
+
+import numpy as np
+from netCDF4 import Dataset
 
 from hyo2.soundspeedmanager import AppInfo
+from hyo2.soundspeed.atlas import gomofs as gomofs_module
 from hyo2.soundspeed.atlas.gomofs import Gomofs
+from hyo2.soundspeed.atlas.gridindex import GridIndex
 from hyo2.soundspeed.soundspeed import SoundSpeedLibrary
+from tests.soundspeed.atlas.atlas_testing import ForecastTesting
 
 logger = logging.getLogger()
 
@@ -43,7 +50,169 @@ class TestSoundSpeedAtlasGomofs(unittest.TestCase):
         prj.close()
 
 
+class TestSoundSpeedAtlasGomofsServerFolder(ForecastTesting, unittest.TestCase):
+
+    def setUp(self):
+        self.data_folder = os.path.join(os.path.abspath(os.path.dirname(__file__)), "gomofs_synthetic")
+        self.server_folder = os.path.join(self.data_folder, "server")
+        self.rng = np.random.default_rng(17)
+
+        # a small synthetic GoMOFS grid, slightly curvilinear
+        rows, cols = np.mgrid[0:30, 0:40]
+        self.lat = 40.0 + 0.1 * rows + 0.01 * cols
+        self.lon = -70.0 + 0.1 * cols - 0.02 * rows
+        self.depth = np.array([0.0, 10.0, 20.0, 50.0, 100.0, 200.0])
+        self.day = date(2020, 1, 5)
+        self.write_day(self.day)
+
+    def tearDown(self):
+        if os.path.exists(self.data_folder):
+            shutil.rmtree(self.data_folder)
+
+    def path(self, day):
+        return os.path.join(self.server_folder, day.strftime("%Y%m"),
+                            "nos.gomofs.regulargrid.n003.%s.t00z.nc" % day.strftime("%Y%m%d"))
+
+    def write_day(self, day):
+        os.makedirs(os.path.dirname(self.path(day)), exist_ok=True)
+        shape = (1, self.depth.size) + self.lat.shape
+        ds = Dataset(self.path(day), "w")
+        ds.createDimension('time', shape[0])
+        ds.createDimension('Depth', shape[1])
+        ds.createDimension('ny', shape[2])
+        ds.createDimension('nx', shape[3])
+        ds.createVariable('Depth', 'f4', ('Depth',))[:] = self.depth
+        ds.createVariable('Latitude', 'f8', ('ny', 'nx'))[:] = self.lat
+        ds.createVariable('Longitude', 'f8', ('ny', 'nx'))[:] = self.lon
+        for var, mean in [('temp', 10.0), ('salt', 32.0)]:
+            grid = ds.createVariable(var, 'f4', ('time', 'Depth', 'ny', 'nx'), fill_value=-99999.0)
+            grid[:] = np.ma.masked_array(self.rng.normal(mean, 1.0, shape), mask=self.rng.random(shape) < 0.3)
+        ds.close()
+
+    def new_atlas(self, use_cache=True):
+        gomofs = Gomofs(data_folder=self.data_folder, prj=None)
+        gomofs.server_folder = self.server_folder
+        gomofs.use_cache = use_cache
+        gomofs.cache.tile_size = 8
+        return gomofs
+
+    def reference(self, gomofs, lat, lon, model_day):
+        """Nearest valid node for each level, in the nearest nodes to the position read from the netCDF file"""
+        with Dataset(self.path(model_day)) as ds:
+            t = np.ma.filled(ds.variables['temp'][0], np.nan)
+            s = np.ma.filled(ds.variables['salt'][0], np.nan)
+
+        dists = np.linalg.norm(GridIndex.ecef(self.lat, self.lon) - GridIndex.ecef(lat, lon), axis=-1)
+        nodes = np.unravel_index(np.argsort(dists, axis=None)[:gomofs._search_window ** 2], dists.shape)
+
+        depth, sal = list(), list()
+        for i in range(self.depth.size):
+            valid = np.flatnonzero(~np.isnan(t[i][nodes]) & ~np.isnan(s[i][nodes]))
+            if valid.size == 0:
+                continue
+            depth.append(self.depth[i])
+            sal.append(s[i][nodes][valid[0]])
+        return np.array(depth), np.array(sal)
+
+    def test_query(self):
+        for use_cache in [True, False]:
+            gomofs = self.new_atlas(use_cache=use_cache)
+            for lat, lon in [(41.0, -69.0), (42.3, -67.5), (40.05, -69.95), (43.0, -67.0)]:
+                self.check_query(gomofs, lat, lon)
+            self.assertIsNone(gomofs.query(lat=30.0, lon=-69.0, datestamp=self.day))
+            gomofs.clear_data()
+
+    def test_cached_tiles(self):
+        gomofs = self.new_atlas()
+        opens, reads = list(), list()
+        self.spy(gomofs, '_open_file', opens)
+        self.spy(gomofs, '_read_tile', reads)
+        self.check_query(gomofs, 40.75, -69.25)
+        self.assertEqual(len(opens), 1)
+        num_reads = len(reads)
+        self.assertTrue(num_reads > 0)
+
+        # the repeated queries read the tiles in memory
+        self.check_query(gomofs, 40.75, -69.25)
+        self.check_query(gomofs, 40.7, -69.3)
+        self.assertEqual(len(opens), 1)
+        self.assertEqual(len(reads), num_reads)
+        gomofs.clear_data()
+
+        # a new instance reads the coordinates and the tiles from the disk cache, without opening the file
+        gomofs = self.new_atlas()
+        opens, reads = list(), list()
+        self.spy(gomofs, '_open_file', opens)
+        self.spy(gomofs, '_read_tile', reads)
+        self.check_query(gomofs, 40.75, -69.25)
+        self.assertEqual(opens, [])
+        self.assertEqual(reads, [])
+
+        # the file is opened when a tile is not in the cache
+        self.check_query(gomofs, 43.0, -67.0)
+        self.assertEqual(opens, [(self.day,)])
+        self.assertTrue(len(reads) > 0)
+        gomofs.clear_data()
+
+    def test_no_cache(self):
+        gomofs = self.new_atlas(use_cache=False)
+        self.check_query(gomofs, 41.0, -69.0)
+        self.assertFalse(os.path.exists(gomofs.cache.folder))
+        gomofs.clear_data()
+
+    def test_prefetch_next_day(self):
+        next_day = self.day + timedelta(days=1)
+        self.write_day(next_day)
+        gomofs = self.new_atlas()
+        opens = list()
+        self.spy(gomofs, '_open_file', opens)
+        self.check_query(gomofs, 40.75, -69.25)
+        nc_file = gomofs._file
+
+        # the next day is loaded in background before midnight, then swapped in
+        gomofs.prefetch(dt(2020, 1, 5, 23, 0))
+        self.wait_prefetch(gomofs, next_day)
+        self.assertEqual(opens, [(self.day,), (next_day,)])
+        self.check_query(gomofs, 40.75, -69.25, day=next_day, model_day=next_day)
+        self.assertEqual(gomofs._model_day, next_day)
+        self.assertEqual(len(opens), 2)
+        self.assertFalse(nc_file.isopen())
+        gomofs.clear_data()
+
+    def test_prefetch_unpublished_day(self):
+        next_day = self.day + timedelta(days=1)
+        gomofs = self.new_atlas()
+        gomofs.prefetch_retry = 0.0
+        opens = list()
+        self.spy(gomofs, '_open_file', opens)
+        self.check_query(gomofs, 40.75, -69.25)
+        nc_file = gomofs._file
+
+        # the next day is not on the server yet: the data in use are kept, with their opened files
+        gomofs.prefetch(dt(2020, 1, 5, 23, 0))
+        self.wait_prefetch(gomofs, next_day)
+        self.check_query(gomofs, 40.75, -69.25, day=next_day, model_day=self.day)
+        self.check_query(gomofs, 43.0, -67.0, day=next_day, model_day=self.day)  # a tile not in the cache
+        self.assertEqual(gomofs._last_loaded_day, next_day)
+        self.assertEqual(gomofs._model_day, self.day)
+        self.assertIs(gomofs._file, nc_file)
+        self.assertTrue(nc_file.isopen())
+        self.assertEqual(opens, [(self.day,)])
+
+        # then swapped in when published
+        self.write_day(next_day)
+        gomofs.prefetch(dt(2020, 1, 6, 0, 30))
+        self.wait_prefetch(gomofs, next_day)
+        self.check_query(gomofs, 40.75, -69.25, day=next_day, model_day=next_day)
+        self.assertEqual(gomofs._model_day, next_day)
+        gomofs.clear_data()
+
+    def test_prefetch_slow_open(self):
+        self.check_prefetch_slow_open(gomofs_module, (40.75, -69.25), (43.0, -67.0))  # a tile not in the cache
+
+
 def suite():
     s = unittest.TestSuite()
     s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedAtlasGomofs))
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedAtlasGomofsServerFolder))
     return s
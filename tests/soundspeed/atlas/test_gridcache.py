@@ -0,0 +1,70 @@
+import unittest
+import os
+import shutil
+import time
+from datetime import date
+
+import numpy as np
+
+from hyo2.soundspeed.atlas.gridcache import GridCache
+
+
+class TestSoundSpeedAtlasGridCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), "grid_cache")
+        self.grid = np.arange(3 * 40 * 50, dtype=np.float32).reshape((3, 40, 50))
+        self.reads = list()
+
+    def tearDown(self):
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+    def read_tile(self, lat_slice, lon_slice):
+        self.reads.append((lat_slice.start, lon_slice.start))
+        return {'temp': self.grid[:, lat_slice, lon_slice], 'sal': self.grid[:, lat_slice, lon_slice] + 1}
+
+    def test_block(self):
+        cache = GridCache(folder=self.cache_dir, tile_size=16)
+        day = date(2019, 3, 2)
+        block = cache.block(day=day, lat_slice=slice(14, 19), lon_slice=slice(46, 50), grid_shape=(40, 50),
+                            read_tile=self.read_tile)
+        np.testing.assert_array_equal(block['temp'], self.grid[:, 14:19, 46:50])
+        np.testing.assert_array_equal(block['sal'], self.grid[:, 14:19, 46:50] + 1)
+        self.assertEqual(sorted(self.reads), [(0, 32), (0, 48), (16, 32), (16, 48)])
+
+        # reused across sessions
+        cache = GridCache(folder=self.cache_dir, tile_size=16)
+        block = cache.block(day=day, lat_slice=slice(20, 25), lon_slice=slice(40, 45), grid_shape=(40, 50),
+                            read_tile=self.read_tile)
+        np.testing.assert_array_equal(block['temp'], self.grid[:, 20:25, 40:45])
+        self.assertEqual(len(self.reads), 4)
+
+    def test_evict(self):
+        cache = GridCache(folder=self.cache_dir, tile_size=16)
+        cache.save_coords(date(2019, 3, 1), {'lat': np.arange(40.0)})
+        cache.save_coords(date(2019, 3, 2), {'lat': np.arange(40.0)})
+        cache.block(day=date(2019, 3, 2), lat_slice=slice(0, 5), lon_slice=slice(0, 5), grid_shape=(40, 50),
+                    read_tile=self.read_tile)
+        self.assertTrue(cache.has_coords(date(2019, 3, 1)))
+
+        # by age
+        old_path = os.path.join(self.cache_dir, "20190301", "coords.npz")
+        old_time = time.time() - 10 * 24 * 3600
+        os.utime(old_path, (old_time, old_time))
+        cache.max_age = 5
+        cache.evict()
+        self.assertFalse(cache.has_coords(date(2019, 3, 1)))
+        self.assertTrue(cache.has_coords(date(2019, 3, 2)))
+
+        # by size
+        cache.max_size = 0
+        cache.evict()
+        self.assertFalse(cache.has_coords(date(2019, 3, 2)))
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedAtlasGridCache))
+    return s
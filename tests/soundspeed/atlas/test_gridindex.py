@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+from hyo2.soundspeed.atlas.gridindex import GridIndex
+
+
+class TestSoundSpeedAtlasGridIndex(unittest.TestCase):
+
+    def setUp(self):
+        # a curvilinear grid, rotated by 30 degrees
+        rows, cols = np.meshgrid(np.arange(30), np.arange(40), indexing='ij')
+        self.lat, self.lon = self.position(rows, cols)
+
+    @classmethod
+    def position(cls, row, col):
+        angle = np.radians(30.0)
+        return 42.0 + 0.02 * (row * np.cos(angle) + col * np.sin(angle)), \
+            -68.0 + 0.02 * (col * np.cos(angle) - row * np.sin(angle))
+
+    def test_query(self):
+        self.lat[3, 4] = np.nan  # not indexed
+        index = GridIndex(lat=self.lat, lon=self.lon)
+
+        xyz = GridIndex.ecef(self.lat, self.lon)
+        rng = np.random.default_rng(0)
+        for _ in range(20):
+            lat, lon = self.position(rng.uniform(5.0, 25.0), rng.uniform(5.0, 35.0))
+            dists, lat_idx, lon_idx = index.query(lat, lon, k=9)
+
+            brute = np.linalg.norm(xyz - GridIndex.ecef(lat, lon), axis=-1)
+            brute[np.isnan(brute)] = np.inf
+            nearest = np.argsort(brute, axis=None)[:9]
+            np.testing.assert_array_equal(np.ravel_multi_index((lat_idx, lon_idx), self.lat.shape), nearest)
+            np.testing.assert_allclose(dists, brute.ravel()[nearest])
+            self.assertEqual(index.nearest(lat, lon), (lat_idx[0], lon_idx[0]))
+
+    def test_nearest(self):
+        index = GridIndex(lat=self.lat, lon=self.lon)
+        self.assertEqual(index.nearest(self.lat[10, 20], self.lon[10, 20]), (10, 20))
+        self.assertEqual(index.nearest(self.lat[0, 0] - 0.05, self.lon[0, 0]), (None, None))
+
+    def test_regular(self):
+        index = GridIndex(lat=np.arange(-10.0, 10.0, 0.5), lon=np.arange(170.0, 190.0, 0.5))
+        self.assertEqual(index.nearest(1.1, -175.1), (22, 30))
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedAtlasGridIndex))
+    return s
@@ -0,0 +1,64 @@
+import unittest
+import threading
+from datetime import date
+
+from hyo2.soundspeed.atlas.prefetcher import DayPrefetcher
+
+
+class TestSoundSpeedAtlasPrefetcher(unittest.TestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.loaded = list()
+        self.discarded = list()
+
+    def load_day(self, day):
+        self.release.wait(timeout=5.0)
+        self.loaded.append(day)
+        return "data %s" % day
+
+    def discard_day(self, data):
+        self.discarded.append(data)
+
+    def wait(self, prefetcher, day):
+        for thread in threading.enumerate():
+            if thread.name == "%s %s" % (prefetcher.name, day):
+                thread.join(timeout=5.0)
+
+    def test_request(self):
+        prefetcher = DayPrefetcher(load_day=self.load_day, discard_day=self.discard_day)
+        day = date(2019, 3, 2)
+
+        self.assertTrue(prefetcher.request(day))
+        self.assertFalse(prefetcher.request(day))  # already loading
+        self.assertTrue(prefetcher.is_pending(day))
+        self.assertIsNone(prefetcher.take(day))
+
+        self.release.set()
+        self.wait(prefetcher, day)
+        self.assertFalse(prefetcher.is_pending(day))
+        self.assertEqual(prefetcher.take(day), "data 2019-03-02")
+        self.assertIsNone(prefetcher.take(day))
+        self.assertEqual(self.loaded, [day])
+
+        # retried only after the minimum interval
+        self.assertFalse(prefetcher.request(day, min_interval=60.0))
+        self.assertTrue(prefetcher.request(day, min_interval=0.0))
+        self.wait(prefetcher, day)
+
+    def test_clear(self):
+        prefetcher = DayPrefetcher(load_day=self.load_day, discard_day=self.discard_day)
+        day = date(2019, 3, 2)
+
+        prefetcher.request(day)
+        prefetcher.clear()  # while loading
+        self.release.set()
+        self.wait(prefetcher, day)
+        self.assertIsNone(prefetcher.take(day))
+        self.assertEqual(self.discarded, ["data 2019-03-02"])
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedAtlasPrefetcher))
+    return s
@@ -2,10 +2,16 @@ import unittest
 import os
 import shutil
 import logging
+from datetime import date, datetime as dt, timedelta
+
+import numpy as np
+from netCDF4 import Dataset
 
 from hyo2.soundspeedmanager import AppInfo
+from hyo2.soundspeed.atlas import rtofs as rtofs_module
 from hyo2.soundspeed.atlas.rtofs import Rtofs
 from hyo2.soundspeed.soundspeed import SoundSpeedLibrary
+from tests.soundspeed.atlas.atlas_testing import ForecastTesting
 
 logger = logging.getLogger()
 
@@ -43,7 +49,179 @@ class TestSoundSpeedAtlasRtofs(unittest.TestCase):
         prj.close()
 
 
+class TestSoundSpeedAtlasRtofsServerFolder(ForecastTesting, unittest.TestCase):
+
+    def setUp(self):
+        self.data_folder = os.path.join(os.path.abspath(os.path.dirname(__file__)), "rtofs_synthetic")
+        self.server_folder = os.path.join(self.data_folder, "server")
+        self.rng = np.random.default_rng(17)
+
+        # a coarse synthetic RTOFS grid, with the longitudes starting at 74.16 E
+        self.lat = np.arange(-60.0, 60.0, 3.0)
+        self.lon = 74.16 + np.arange(120) * 3.0
+        self.lev = np.array([0.0, 10.0, 20.0, 50.0, 100.0, 200.0])
+        self.day = date(2020, 1, 5)
+        self.write_day(self.day)
+
+    def tearDown(self):
+        if os.path.exists(self.data_folder):
+            shutil.rmtree(self.data_folder)
+
+    def write_day(self, day):
+        folder = os.path.join(self.server_folder, "rtofs_global%s" % day.strftime("%Y%m%d"))
+        os.makedirs(folder)
+        shape = (3, self.lev.size, self.lat.size, self.lon.size)
+        for var, name, mean in [('temperature', "rtofs_glo_3dz_nowcast_daily_temp.nc", 10.0),
+                                ('salinity', "rtofs_glo_3dz_nowcast_daily_salt.nc", 35.0)]:
+            ds = Dataset(os.path.join(folder, name), "w")
+            ds.createDimension('time', shape[0])
+            ds.createDimension('lev', shape[1])
+            ds.createDimension('lat', shape[2])
+            ds.createDimension('lon', shape[3])
+            ds.createVariable('lev', 'f4', ('lev',))[:] = self.lev
+            ds.createVariable('lat', 'f8', ('lat',))[:] = self.lat
+            ds.createVariable('lon', 'f8', ('lon',))[:] = self.lon
+            grid = ds.createVariable(var, 'f4', ('time', 'lev', 'lat', 'lon'), fill_value=1e20)
+            grid[:] = np.ma.masked_array(self.rng.normal(mean, 1.0, shape), mask=self.rng.random(shape) < 0.3)
+            ds.close()
+
+    def new_atlas(self, use_cache=True):
+        rtofs = Rtofs(data_folder=self.data_folder, prj=None)
+        rtofs.server_folder = self.server_folder
+        rtofs.use_cache = use_cache
+        rtofs.cache.tile_size = 8
+        return rtofs
+
+    def reference(self, rtofs, lat, lon, model_day):
+        """Nearest valid node for each level, in the 5x5 nodes around the position read from the netCDF files"""
+        folder = os.path.join(self.server_folder, "rtofs_global%s" % model_day.strftime("%Y%m%d"))
+        with Dataset(os.path.join(folder, "rtofs_glo_3dz_nowcast_daily_temp.nc")) as ds:
+            t = np.ma.filled(ds.variables['temperature'][2], np.nan)
+        with Dataset(os.path.join(folder, "rtofs_glo_3dz_nowcast_daily_salt.nc")) as ds:
+            s = np.ma.filled(ds.variables['salinity'][2], np.nan)
+
+        if lon < self.lon[0]:
+            lon += 360.0
+        lat_idx = int(round((lat - self.lat[0]) / 3.0))
+        lon_idx = int(round((lon - self.lon[0]) / 3.0))
+        nodes = [(lat_idx + i, (lon_idx + j) % self.lon.size) for i in range(-2, 3) for j in range(-2, 3)]
+        dists = [rtofs.g.distance(lon, lat, self.lon[node[1]], self.lat[node[0]]) for node in nodes]
+
+        depth, sal = list(), list()
+        for i in range(self.lev.size):
+            valid = [k for k, node in enumerate(nodes) if not np.isnan(t[i][node]) and not np.isnan(s[i][node])]
+            if len(valid) == 0:
+                continue
+            depth.append(self.lev[i])
+            sal.append(s[i][nodes[min(valid, key=lambda k: dists[k])]])
+        return np.array(depth), np.array(sal)
+
+    def test_query(self):
+        # the safe case, and the split cases across the first longitude of the grid
+        points = [(10.0, 150.0), (-20.0, -179.9), (5.0, 74.5), (5.0, 77.0), (5.0, 72.0), (-31.0, 69.5)]
+        for use_cache in [True, False]:
+            rtofs = self.new_atlas(use_cache=use_cache)
+            for lat, lon in points:
+                self.check_query(rtofs, lat, lon)
+            rtofs.clear_data()
+        self.assertEqual(rtofs.grid_coords(5.0, 74.5, datestamp=self.day)[1], 0)
+        self.assertEqual(rtofs.grid_coords(5.0, 72.0, datestamp=self.day)[1], self.lon.size - 1)
+
+    def test_cached_tiles(self):
+        rtofs = self.new_atlas()
+        opens, reads = list(), list()
+        self.spy(rtofs, '_open_files', opens)
+        self.spy(rtofs, '_read_tile', reads)
+        self.check_query(rtofs, 5.0, 74.5)
+        self.assertEqual(len(opens), 1)
+        self.assertEqual(len(reads), 4)  # two tiles on each side of the split
+
+        # the repeated queries read the tiles in memory
+        self.check_query(rtofs, 5.0, 74.5)
+        self.check_query(rtofs, 6.0, 75.0)
+        self.assertEqual(len(opens), 1)
+        self.assertEqual(len(reads), 4)
+        rtofs.clear_data()
+
+        # a new instance reads the coordinates and the tiles from the disk cache, without opening the files
+        rtofs = self.new_atlas()
+        opens, reads = list(), list()
+        self.spy(rtofs, '_open_files', opens)
+        self.spy(rtofs, '_read_tile', reads)
+        self.check_query(rtofs, 5.0, 74.5)
+        self.assertEqual(opens, [])
+        self.assertEqual(reads, [])
+
+        # the files are opened when a tile is not in the cache
+        self.check_query(rtofs, -20.0, -100.0)
+        self.assertEqual(opens, [(self.day,)])
+        self.assertTrue(len(reads) > 0)
+        rtofs.clear_data()
+
+    def test_no_cache(self):
+        rtofs = self.new_atlas(use_cache=False)
+        self.check_query(rtofs, 5.0, 72.0)
+        self.assertFalse(os.path.exists(rtofs.cache.folder))
+        rtofs.clear_data()
+
+    def test_prefetch_next_day(self):
+        next_day = self.day + timedelta(days=1)
+        self.write_day(next_day)
+        rtofs = self.new_atlas()
+        opens = list()
+        self.spy(rtofs, '_open_files', opens)
+        self.check_query(rtofs, 10.0, 150.0)
+        file_temp = rtofs._file_temp
+        file_sal = rtofs._file_sal
+
+        # the next day is loaded in background before midnight, then swapped in
+        rtofs.prefetch(dt(2020, 1, 5, 23, 0))
+        self.wait_prefetch(rtofs, next_day)
+        self.assertEqual(opens, [(self.day,), (next_day,)])
+        self.check_query(rtofs, 10.0, 150.0, day=next_day, model_day=next_day)
+        self.assertEqual(rtofs._model_day, next_day)
+        self.assertEqual(len(opens), 2)
+        self.assertFalse(file_temp.isopen())
+        self.assertFalse(file_sal.isopen())
+        rtofs.clear_data()
+
+    def test_prefetch_unpublished_day(self):
+        next_day = self.day + timedelta(days=1)
+        rtofs = self.new_atlas()
+        rtofs.prefetch_retry = 0.0
+        opens = list()
+        self.spy(rtofs, '_open_files', opens)
+        self.check_query(rtofs, 10.0, 150.0)
+        file_temp = rtofs._file_temp
+        file_sal = rtofs._file_sal
+
+        # the next day is not on the server yet: the data in use are kept, with their opened files
+        rtofs.prefetch(dt(2020, 1, 5, 23, 0))
+        self.wait_prefetch(rtofs, next_day)
+        self.check_query(rtofs, 10.0, 150.0, day=next_day, model_day=self.day)
+        self.check_query(rtofs, -20.0, -100.0, day=next_day, model_day=self.day)  # a tile not in the cache
+        self.assertEqual(rtofs._last_loaded_day, next_day)
+        self.assertEqual(rtofs._model_day, self.day)
+        self.assertIs(rtofs._file_temp, file_temp)
+        self.assertTrue(file_temp.isopen())
+        self.assertIs(rtofs._file_sal, file_sal)
+        self.assertTrue(file_sal.isopen())
+        self.assertEqual(opens, [(self.day,)])
+
+        # then swapped in when published
+        self.write_day(next_day)
+        rtofs.prefetch(dt(2020, 1, 6, 0, 30))
+        self.wait_prefetch(rtofs, next_day)
+        self.check_query(rtofs, 10.0, 150.0, day=next_day, model_day=next_day)
+        self.assertEqual(rtofs._model_day, next_day)
+        rtofs.clear_data()
+
+    def test_prefetch_slow_open(self):
+        self.check_prefetch_slow_open(rtofs_module, (10.0, 150.0), (-20.0, -100.0))  # a tile not in the cache
+
+
 def suite():
     s = unittest.TestSuite()
     s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedAtlasRtofs))
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedAtlasRtofsServerFolder))
     return s
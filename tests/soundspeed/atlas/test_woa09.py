@@ -0,0 +1,114 @@
+import unittest
+import os
+import shutil
+from datetime import date
+
+import numpy as np
+from netCDF4 import Dataset
+
+from hyo2.soundspeed.atlas.woa09 import Woa09
+from tests.soundspeed.atlas.atlas_testing import WoaTesting
+
+
+class TestSoundSpeedAtlasWoa09(WoaTesting, unittest.TestCase):
+
+    def setUp(self):
+        self.data_folder = os.path.join(os.path.abspath(os.path.dirname(__file__)), "woa09_synthetic")
+        os.makedirs(self.data_folder)
+        self.rng = np.random.default_rng(9)
+
+        # a synthetic atlas on the WOA09 1-degree grid, with monthly grids shallower than the seasonal ones
+        self.lat = np.arange(-89.5, 90.0, 1.0)
+        self.lon = np.arange(0.5, 360.0, 1.0)
+        self.depth = np.array([0.0, 10.0, 20.0, 50.0])
+        self.bottom = self.rng.integers(0, self.depth.size + 1, (self.lat.size, self.lon.size))  # nr. of levels
+        self.bottom[:, [0, -1]] = 3  # the sea across the Greenwich meridian
+        self.land = self.bottom == 0
+
+        self.write_grids(os.path.join(self.data_folder, "temperature_annual_1deg.nc"), 't', 1, self.depth.size, 10.0)
+        self.write_grids(os.path.join(self.data_folder, "temperature_monthly_1deg.nc"), 't', 12, 2, 10.0)
+        self.write_grids(os.path.join(self.data_folder, "temperature_seasonal_1deg.nc"), 't', 4, self.depth.size, 10.0)
+        self.write_grids(os.path.join(self.data_folder, "salinity_monthly_1deg.nc"), 's', 12, 2, 35.0)
+        self.write_grids(os.path.join(self.data_folder, "salinity_seasonal_1deg.nc"), 's', 4, self.depth.size, 35.0)
+        np.savetxt(os.path.join(self.data_folder, "landsea.msk"), self.land.astype(float).reshape((-1, 10)),
+                   fmt='%d')
+
+    def tearDown(self):
+        if os.path.exists(self.data_folder):
+            shutil.rmtree(self.data_folder)
+
+    def month_grids(self, woa, datestamp):
+        jday = int(datestamp.strftime("%j"))
+        month_idx = np.argmin(np.abs((np.arange(12) + 0.5) * 365.0 / 12 - jday))
+        season_idx = np.argmin(np.abs((np.arange(4) + 0.5) * 365.0 / 4 - jday))
+        grids = dict()
+        for var, name in [('t', "temperature"), ('s', "salinity")]:
+            with Dataset(os.path.join(self.data_folder, "%s_monthly_1deg.nc" % name)) as monthly, \
+                    Dataset(os.path.join(self.data_folder, "%s_seasonal_1deg.nc" % name)) as seasonal:
+                for grid_name in [var + '_an', var + '_sd']:
+                    grids[grid_name] = (monthly.variables[grid_name][month_idx],
+                                        seasonal.variables[grid_name][season_idx])
+        return grids
+
+    def test_query(self):
+        woa = Woa09(data_folder=self.data_folder, prj=None)
+        points = [(43.1, -70.9), (-30.0, 15.0), (2.0, 0.2), (2.0, -0.3), (88.9, 45.0), (-60.2, 179.9)]
+        for month in [1, 4, 8]:
+            for lat, lon in points:
+                self.check_query(woa, lat, lon, date(2019, month, 15))
+
+    def test_query_many(self):
+        woa = Woa09(data_folder=self.data_folder, prj=None)
+        points = [(43.1, -70.9, date(2019, 3, 2)), (2.0, 0.2, date(2019, 8, 15)), (None, 15.0, date(2019, 3, 2)),
+                  (-30.0, 15.0, date(2019, 3, 2)), (-60.2, 179.9, date(2019, 8, 15))]
+        loaded = list()
+
+        def month_grids():
+            loaded.append((woa.month_idx, woa.season_idx))
+            return Woa09._month_grids(woa)
+
+        woa._month_grids = month_grids
+        self.check_query_many(woa, points)
+        self.assertEqual(len(loaded), 2)  # the nodes of all the points of a day are gathered at once
+        woa.close_datasets()
+
+    def test_missing_sd(self):
+        # no valid salinity standard deviations below the second level around the query
+        for name in ["salinity_monthly_1deg.nc", "salinity_seasonal_1deg.nc"]:
+            ds = Dataset(os.path.join(self.data_folder, name), "a")
+            ds.variables['s_sd'][:, 1:, 110:115, 60:65] = 600.0
+            ds.close()
+
+        woa = Woa09(data_folder=self.data_folder, prj=None)
+        profiles = woa.query(lat=22.5, lon=62.5, datestamp=date(2019, 3, 2))
+        self.assertEqual([profile.data.depth.size for profile in profiles.l], [self.depth.size, 1, 1])
+        self.check_query(woa, 22.5, 62.5, date(2019, 3, 2))
+
+    def test_cached_grids(self):
+        woa = Woa09(data_folder=self.data_folder, prj=None)
+        self.check_query(woa, 43.1, -70.9, date(2019, 3, 2))
+        self.assertTrue(os.path.exists(os.path.join(woa.cache_folder, "woa09_coords.npz")))
+        woa.close_datasets()
+
+        # a new instance loads the coordinates and the grids from the cache, without opening the netCDF files
+        woa = Woa09(data_folder=self.data_folder, prj=None)
+        self.assertTrue(woa.load_grids())
+        self.assertIsNone(woa.t_annual)
+        np.testing.assert_array_equal(woa.landsea, self.land)
+        self.check_query(woa, 43.1, -70.9, date(2019, 3, 2))
+        self.assertIsNone(woa.t_monthly)
+        self.assertIsInstance(woa._grids[(woa.month_idx, woa.season_idx)], np.memmap)
+
+    def test_no_grid_cache(self):
+        woa = Woa09(data_folder=self.data_folder, prj=None)
+        woa.use_grid_cache = False
+        for lat, lon in [(43.1, -70.9), (2.0, 0.2)]:
+            self.check_query(woa, lat, lon, date(2019, 6, 2))
+        self.assertFalse(os.path.exists(woa.cache_folder))
+        woa.close_datasets()
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedAtlasWoa09))
+    return s
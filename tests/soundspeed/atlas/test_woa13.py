@@ -0,0 +1,151 @@
+import unittest
+import os
+import shutil
+from datetime import date
+
+import numpy as np
+from netCDF4 import Dataset
+
+from hyo2.soundspeed.atlas.woa13 import Woa13
+from tests.soundspeed.atlas.atlas_testing import WoaTesting
+
+
+class TestSoundSpeedAtlasWoa13(WoaTesting, unittest.TestCase):
+
+    def setUp(self):
+        self.data_folder = os.path.join(os.path.abspath(os.path.dirname(__file__)), "woa13_synthetic")
+        self.rng = np.random.default_rng(13)
+
+        # a coarse synthetic atlas: 5-degree grid, with monthly grids shallower than the seasonal ones
+        self.lat = np.linspace(-87.5, 87.5, 36)
+        self.lon = np.linspace(-177.5, 177.5, 72)
+        self.depth = np.array([0.0, 5.0, 10.0, 20.0, 50.0, 100.0])
+        self.bottom = self.rng.integers(0, self.depth.size + 1, (self.lat.size, self.lon.size))  # nr. of levels
+        self.bottom[:, 0] = 3  # the sea across the anti-meridian
+        self.bottom[[0, -1], :] = 2  # and at the poles
+        self.land = self.bottom == 0
+
+        for folder in ["temp", "sal"]:
+            os.makedirs(os.path.join(self.data_folder, folder))
+        for i in range(17):
+            num_levels = 4 if 1 <= i <= 12 else self.depth.size
+            self.write_grids(os.path.join(self.data_folder, "temp", "woa13_decav_t%02d_04v2.nc" % i), 't', 1,
+                             num_levels, 10.0)
+            if i > 0:
+                self.write_grids(os.path.join(self.data_folder, "sal", "woa13_decav_s%02d_04v2.nc" % i), 's', 1,
+                                 num_levels, 35.0)
+
+        # the land/sea mask is stored with the two halves of the longitudes swapped
+        stored = np.hstack(np.hsplit(self.land.astype(float), 2)[::-1])
+        with open(os.path.join(self.data_folder, "landsea_04.msk"), "w") as fod:
+            fod.write("header\nheader\n")
+            for value in stored.ravel():
+                fod.write("0,0,%d\n" % value)
+
+    def tearDown(self):
+        if os.path.exists(self.data_folder):
+            shutil.rmtree(self.data_folder)
+
+    def month_grids(self, woa, datestamp):
+        woa.calc_indices(month=datestamp.month)
+        grids = dict()
+        # the salinity grids are listed from s01 (see Woa13.load_grids)
+        for var, folder, shift in [('t', "temp", 0), ('s', "sal", 1)]:
+            dss = [Dataset(os.path.join(self.data_folder, folder, "woa13_decav_%s%02d_04v2.nc" % (var, i + shift)))
+                   for i in (woa.month_idx, woa.season_idx)]
+            for name in [var + '_an', var + '_sd']:
+                grids[name] = tuple(ds.variables[name][0] for ds in dss)
+            for ds in dss:
+                ds.close()
+        return grids
+
+    def test_query(self):
+        woa = Woa13(data_folder=self.data_folder, prj=None)
+        woa.tile_size = 8
+        points = [(43.1, -70.9), (-30.0, 15.0), (2.0, 179.2), (2.0, -179.2), (88.9, 45.0), (-60.2, 100.3)]
+        for month in [1, 4, 8]:
+            for lat, lon in points:
+                self.check_query(woa, lat, lon, date(2019, month, 15))
+
+        # the anti-meridian and the poles
+        self.assertEqual(woa.grid_coords(lat=2.0, lon=179.2)[1], self.lon.size - 1)
+        self.assertEqual(woa.grid_coords(lat=88.9, lon=45.0)[0], self.lat.size - 1)
+
+    def test_query_many(self):
+        points = [(43.1, -70.9, date(2019, 3, 2)), (2.0, 179.2, date(2019, 8, 15)), (None, 15.0, date(2019, 3, 5)),
+                  (-30.0, 15.0, date(2019, 3, 28)), (88.9, 45.0, date(2019, 8, 1)), (-60.2, 100.3, date(2019, 3, 9))]
+        for use_grid_cache in [True, False]:
+            woa = Woa13(data_folder=self.data_folder, prj=None)
+            woa.use_grid_cache = use_grid_cache
+            woa.tile_size = 8
+            gathered = list()
+
+            def grid_profiles(lat_idxs, lon_idxs):
+                gathered.append(lat_idxs.size)
+                return Woa13._grid_profiles(woa, lat_idxs, lon_idxs)
+
+            woa._grid_profiles = grid_profiles
+            self.check_query_many(woa, points)
+            if use_grid_cache:  # the nodes of all the points of a month are gathered at once
+                self.assertEqual(len(gathered), 2)
+
+        # the failures are not hidden
+        def read_grids(lat_slice, lon_slice):
+            raise RuntimeError("troubles in db load")
+
+        woa = Woa13(data_folder=self.data_folder, prj=None)
+        woa.use_grid_cache = False
+        woa._read_grids = read_grids
+        with self.assertRaises(RuntimeError):
+            woa.query_many(points)
+
+    def test_cached_tiles(self):
+        woa = Woa13(data_folder=self.data_folder, prj=None)
+        woa.tile_size = 8
+        self.check_query(woa, 43.1, -70.9, date(2019, 3, 2))
+        self.assertTrue(len(os.listdir(woa.cache_folder)) > 0)
+
+        # a new instance reads the tiles from the .npy cache
+        woa = Woa13(data_folder=self.data_folder, prj=None)
+        woa.tile_size = 8
+        reads = list()
+
+        def read_grids(lat_slice, lon_slice):
+            reads.append((lat_slice, lon_slice))
+            return Woa13._read_grids(woa, lat_slice, lon_slice)
+
+        woa._read_grids = read_grids
+        self.check_query(woa, 43.1, -70.9, date(2019, 3, 2))
+        self.assertEqual(reads, [])
+        self.assertTrue(all([isinstance(tile, np.memmap) for tile in woa._tiles.values()]))
+
+    def test_no_grid_cache(self):
+        woa = Woa13(data_folder=self.data_folder, prj=None)
+        woa.use_grid_cache = False
+        for lat, lon in [(43.1, -70.9), (2.0, 179.2), (-88.9, -120.0)]:
+            self.check_query(woa, lat, lon, date(2019, 6, 2))
+        self.assertFalse(os.path.exists(woa.cache_folder))
+
+    def test_missing_sd(self):
+        # no valid temperature standard deviations below the second level around the query
+        for i in range(17):
+            ds = Dataset(os.path.join(self.data_folder, "temp", "woa13_decav_t%02d_04v2.nc" % i), "a")
+            ds.variables['t_sd'][0, 2:, 20:25, 30:35] = 60.0
+            ds.close()
+
+        woa = Woa13(data_folder=self.data_folder, prj=None)
+        profiles = woa.query(lat=22.5, lon=-17.5, datestamp=date(2019, 3, 2))
+        self.assertEqual([profile.data.depth.size for profile in profiles.l], [self.depth.size, 2, 2])
+        self.check_query(woa, 22.5, -17.5, date(2019, 3, 2))
+
+    def test_land(self):
+        woa = Woa13(data_folder=self.data_folder, prj=None)
+        woa.load_grids()
+        woa.landsea[:] = 1
+        self.assertIsNone(woa.query(lat=43.1, lon=-70.9, datestamp=date(2019, 3, 2)))
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedAtlasWoa13))
+    return s
@@ -1,6 +1,8 @@
 import unittest
 import sys
 
+import numpy as np
+
 from hyo2.soundspeed.base.geodesy import Geodesy
 
 from osgeo import gdal
@@ -104,6 +106,39 @@ class TestSoundSpeedGeodesy(unittest.TestCase):
         dist = g.distance(long_1=long_1, lat_1=lat_1, long_2=long_2, lat_2=lat_2)
         self.assertTrue((dist - 7037989.518) < 0.001)
 
+    def test_haversine_many(self):
+        dists = Geodesy.haversine_many(longs_1=-70.9395, lats_1=43.13555, longs_2=[14.9, -70.9395],
+                                       lats_2=[36.783333, 43.13555])
+        self.assertAlmostEqual(dists[0], Geodesy.haversine(long_1=-70.9395, lat_1=43.13555, long_2=14.9,
+                                                           lat_2=36.783333))
+        self.assertAlmostEqual(dists[1], 0.0)
+
+    def test_distance_many(self):
+        longs = np.array([[14.9, -70.0], [-69.0, 100.0]])
+        lats = np.array([[36.783333, 43.0], [44.0, -10.0]])
+
+        g = Geodesy()
+        dists = g.distance_many(long_0=-70.9395, lat_0=43.13555, longs=longs, lats=lats)
+        self.assertEqual(dists.shape, (2, 2))
+        self.assertTrue(abs(dists[0, 0] - 7037989.518) < 0.001)
+        for i in range(2):
+            for j in range(2):
+                self.assertAlmostEqual(dists[i, j], g.distance(-70.9395, 43.13555, longs[i, j], lats[i, j]), places=3)
+
+        dists = g.distance_many(long_0=-70.9395, lat_0=43.13555, longs=longs, lats=lats, units="km", spherical=True)
+        self.assertAlmostEqual(dists[0, 0], 7020.8516, places=3)
+
+    def test_distance_pairwise(self):
+        longs = [-70.9395, 14.9, -69.0]
+        lats = [43.13555, 36.783333, 44.0]
+
+        g = Geodesy()
+        dists = g.distance_pairwise(longs_1=longs, lats_1=lats, longs_2=longs[:2], lats_2=lats[:2])
+        self.assertEqual(dists.shape, (3, 2))
+        self.assertAlmostEqual(dists[0, 0], 0.0)
+        self.assertAlmostEqual(dists[0, 1], dists[1, 0])
+        self.assertAlmostEqual(dists[2, 1], g.distance(longs[2], lats[2], longs[1], lats[1]), places=3)
+
     def test_forward(self):
         # data retrieved from: http://geographiclib.sourceforge.net/cgi-bin/GeodSolve
         # ref: C. F. F. Karney, Algorithms for geodesics, J. Geodesy 87, 43–55 (2013); DOI: 10.1007/s00190-012-0578-z
@@ -0,0 +1,56 @@
+import unittest
+from types import SimpleNamespace
+
+from hyo2.soundspeed.client.client import Client
+from hyo2.soundspeed.listener.sis.sis4 import Sis4
+from hyo2.soundspeed.listener.sis.sis5 import Sis5
+from hyo2.soundspeed.soundspeed import SoundSpeedLibrary
+
+
+class StubProject:
+    """The parts of a SoundSpeedLibrary used to prepare the Kongsberg casts, with the listened model"""
+
+    kng_max_points = SoundSpeedLibrary.kng_max_points
+
+    def __init__(self) -> None:
+        self.setup = SimpleNamespace(sis_auto_apply_manual_casts=False)
+        self.listeners = SimpleNamespace(sis4=Sis4(port=0, datagrams=[0x50]), sis5=Sis5(port=0, datagrams=[b'#MRZ']))
+        self.thin_max_points = list()
+
+    def prepare_sis(self, apply_thin: bool, apply_12k: bool, thin_tolerance: float, thin_max_points: int) -> bool:
+        self.thin_max_points.append(thin_max_points)
+        return False  # nothing to transmit
+
+
+class TestSoundSpeedClient(unittest.TestCase):
+
+    def test_kng_max_points(self):
+        udp_max_points = (Client.UDP_DATA_LIMIT - Client.KNG_EXTRA_MAX_SIZE) // Client.KNG_SAMPLE_MAX_SIZE
+
+        prj = StubProject()
+        prj.listeners.sis4.xyz88 = SimpleNamespace(model=3020)  # EM3002
+        self.assertFalse(Client("SIS:127.0.0.1:4001:SIS").send_kng_format(prj=prj))
+        self.assertEqual(prj.thin_max_points, [570])
+
+        prj = StubProject()
+        prj.listeners.sis5.mrz = SimpleNamespace(sounder_id=2040)
+        self.assertFalse(Client("K-Ctrl:127.0.0.1:4001:KCTRL").send_kng_format(prj=prj))
+        self.assertEqual(prj.thin_max_points, [1000])
+
+        # no model received yet
+        prj = StubProject()
+        self.assertFalse(Client("SIS:127.0.0.1:4001:SIS").send_kng_format(prj=prj))
+        self.assertEqual(prj.thin_max_points, [1000])
+
+        # only limited by the datagram size for the other systems
+        prj = StubProject()
+        prj.listeners.sis4.xyz88 = SimpleNamespace(model=3020)
+        self.assertFalse(Client("QINSy:127.0.0.1:4001:QINSY").send_kng_format(prj=prj))
+        self.assertEqual(prj.thin_max_points, [udp_max_points])
+        self.assertTrue(udp_max_points > 1000)
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedClient))
+    return s
@@ -1,11 +1,13 @@
 import os
 import sys
+import sqlite3
 import unittest
 from datetime import datetime
 import numpy as np
 
 from hyo2.soundspeedmanager import AppInfo
 from hyo2.soundspeed.soundspeed import SoundSpeedLibrary
+from hyo2.soundspeed.db.db import ProjectDb
 from hyo2.soundspeed.profile.profilelist import ProfileList
 
 
@@ -59,6 +61,68 @@ class TestSoundSpeedDb(unittest.TestCase):
             pk = i % self.max_pk + 1
             test_pk(pk)
 
+    def test_compact_storage(self):
+        db = ProjectDb(projects_folder=self.lib.projects_folder, project_name=self.lib.current_project,
+                       compact_storage=True)
+        ssp = db.profile_by_pk(1)
+        ssp.cur.proc.speed[:] = 1500
+        self.assertTrue(db.add_casts(ssp))
+        self.assertEqual(len(db.list_profiles()), self.max_pk)
+
+        ssp = db.profile_by_pk(1)
+        self.assertTrue((ssp.cur.data.depth == self.depth).all())
+        self.assertTrue((ssp.cur.proc.depth == self.depth).all())
+        self.assertTrue((ssp.cur.proc.speed == 1500).all())
+        db.disconnect()
+
+    def test_list_profiles(self):
+        lst = self.lib.db_list_profiles()
+        self.assertEqual(len(lst), self.max_pk)
+        for row in lst:
+            self.assertEqual(row[20], '1415.00')  # surface sound speed
+            self.assertEqual(row[21], '0.00')  # min depth
+            self.assertEqual(row[22], '%0.2f' % self.depth[-1])  # max depth
+            self.assertEqual(row[23], '%0.2f' % self.depth[-1])  # max raw depth
+
+    def test_query_casts(self):
+        self.assertEqual(len(self.lib.db_query_casts()), self.max_pk)
+        self.assertEqual(self.lib.db_query_casts(bbox=(-76.0, 21.5, -74.0, 23.5)), [3, 4])
+        self.assertEqual(self.lib.db_query_casts(bbox=(100.0, 21.5, 120.0, 23.5)), [])
+        self.assertEqual(self.lib.db_query_casts(time_range=(None, datetime(1970, 1, 2))), [])
+        self.assertEqual(self.lib.db_nearest_cast(longitude=-75.5, latitude=22.2), 3)
+        self.assertEqual(self.lib.db_nearest_cast(longitude=105.0, latitude=-60.0), 1)
+
+    def test_update_from_version_3(self):
+        # downgrade the project to a version 3 db (before the samples blob, the summary and the spatial index)
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            for table in ['samples_blob', 'ssp_summary', 'ssp_index', 'ssp_rtree']:
+                conn.execute("DROP TABLE IF EXISTS %s" % table)
+            conn.execute("UPDATE library SET version=3")
+        conn.close()
+
+        db = ProjectDb(projects_folder=self.lib.projects_folder, project_name=self.lib.current_project)
+        self.assertEqual(db.get_db_version(), 6)
+        self.assertEqual(db.conn.execute("SELECT COUNT(*) FROM library").fetchone()[0], 1)
+
+        # the summary and the spatial index are backfilled from the stored casts
+        lst = db.list_profiles()
+        self.assertEqual(len(lst), self.max_pk)
+        for row in lst:
+            self.assertEqual(row[20], '1415.00')  # surface sound speed
+            self.assertEqual(row[22], '%0.2f' % self.depth[-1])  # max depth
+        self.assertEqual(db.query_casts(), list(range(1, self.max_pk + 1)))
+        self.assertEqual(db.query_casts(bbox=(-76.0, 21.5, -74.0, 23.5)), [3, 4])
+        self.assertEqual(db.nearest_cast(longitude=-75.5, latitude=22.2), 3)
+        ssp = db.profile_by_pk(2)
+        self.assertTrue((ssp.cur.proc.depth == self.depth).all())
+        db.disconnect()
+
+    def test_load_proc_only(self):
+        ssp = self.lib.db_retrieve_profile(1, tables=('proc', ))
+        self.assertTrue((ssp.cur.proc.depth == self.depth).all())
+        self.assertEqual(ssp.cur.data.num_samples, 0)
+
 
 def suite():
     s = unittest.TestSuite()
@@ -0,0 +1,154 @@
+import unittest
+import struct
+
+from hyo2.soundspeed.formats import km
+
+
+class TestSoundSpeedFormatsKm(unittest.TestCase):
+
+    @classmethod
+    def header(cls, dg_id):
+        return struct.pack("<BBHIIHH", 2, dg_id, 2040, 20190302, 3600000, 7, 100)
+
+    def test_xyz88(self):
+        data = self.header(0x58) + struct.pack("<HHfHHfi", 12000, 15000, 1.5, 3, 2, 1000.0, 0)
+        data += struct.pack("<fffHBbBbh", 10.0, -5.0, 0.5, 1, 2, -3, 0x00, 0, -105)
+        data += struct.pack("<fffHBbBbh", 99.0, 0.0, 0.5, 1, 2, 3, 0x80, 0, 0)
+        data += struct.pack("<fffHBbBbh", 12.0, 5.0, 0.5, 1, 2, 3, 0x01, 0, 0)
+        data += b'\x03\x00\x00'
+
+        xyz88 = km.KmXyz88(data)
+        self.assertEqual(xyz88.number_beams, 3)
+        self.assertEqual(list(xyz88.depth), [10.0, 99.0, 12.0])
+        self.assertEqual(list(xyz88.across), [-5.0, 0.0, 5.0])
+        self.assertAlmostEqual(xyz88.beam_incidence_angle_adjustment[0], -0.3)
+        self.assertAlmostEqual(xyz88.reflectivity[0], -10.5)
+        # the beam without a valid detection is skipped
+        self.assertAlmostEqual(xyz88.mean_depth, 12.5)
+
+    def test_svp(self):
+        data = self.header(0x55) + struct.pack("<IIHH", 20190302, 3600, 2, 1)
+        data += struct.pack("<II", 150, 15001) + struct.pack("<II", 1000, 14905) + b'\x03\x00\x00'
+
+        svp = km.KmSvp(data)
+        self.assertEqual(svp.num_entries, 2)
+        self.assertEqual(list(svp.depth), [1.5, 10.0])
+        self.assertEqual(list(svp.speed), [1500.1, 1490.5])
+
+    def test_ssp(self):
+        entries = [(0, 15001), (10, 14995), (20, 15123)]
+        data = self.header(0x47) + struct.pack("<H", len(entries))
+        data += b''.join([struct.pack("<HH", *entry) for entry in entries]) + b'\x03\x00\x00'
+
+        ssp = km.KmSsp(data)
+        self.assertEqual(ssp.num_entries, 3)
+        for count, entry in enumerate(entries):
+            time_offset, speed = struct.unpack("<HH", data[18 + 4 * count:22 + 4 * count])
+            self.assertEqual(ssp.time_offset[count], time_offset)
+            self.assertEqual(ssp.speed[count], speed / 10.0)
+
+    def test_range_angle78(self):
+        data = self.header(0x4e) + struct.pack("<HHHHfI", 15000, 2, 3, 3, 1000.0, 4)
+        sectors = [(-150, 250, 0.001, 0.0, 300000.0, 6512, 0, 0, 3000.0),
+                   (120, 0, 0.002, 0.5, 320000.0, 7000, 1, 1, 3500.0)]
+        data += b''.join([struct.pack("<hH3fH2Bf", *sector) for sector in sectors])
+        beams = [(-6000, 0, 0, 10, 5, -2, 0.1, -300, 0, 0),
+                 (0, 1, 0x80, 20, 6, 0, 0.05, 5, -1, 0),
+                 (6000, 1, 0, 30, 7, 3, 0.1, 100, 1, 2)]
+        data += b''.join([struct.pack("<h2BHBbfhbB", *beam) for beam in beams]) + b'\x03\x00\x00'
+
+        range_angle78 = km.KmRangeAngle78(data)
+        self.assertEqual(range_angle78.sound_speed, 1500.0)
+        self.assertEqual(range_angle78.number_sectors, 2)
+        self.assertEqual(range_angle78.number_beams, 3)
+
+        offset = 32
+        for count in range(2):
+            sector = struct.unpack("<hH3fH2Bf", data[offset:offset + 24])
+            self.assertEqual(range_angle78.tilt_angle[count], sector[0] / 100.0)
+            self.assertEqual(range_angle78.focus_range[count], sector[1] / 10.0)
+            self.assertEqual(range_angle78.signal_length[count], sector[2])
+            self.assertEqual(range_angle78.transmit_delay[count], sector[3])
+            self.assertEqual(range_angle78.center_frequency[count], sector[4])
+            self.assertEqual(range_angle78.absorption_coefficient[count], sector[5] / 100.0)
+            self.assertEqual(range_angle78.signal_waveform_id[count], sector[6])
+            self.assertEqual(range_angle78.transmit_sector_number[count], sector[7])
+            self.assertEqual(range_angle78.signal_bandwidth[count], sector[8])
+            offset += 24
+
+        for count in range(3):
+            beam = struct.unpack("<h2BHBbfhbB", data[offset:offset + 16])
+            self.assertEqual(range_angle78.angle[count], beam[0] / 100.0)
+            self.assertEqual(range_angle78.sector_number[count], beam[1])
+            self.assertEqual(range_angle78.detection_information[count], beam[2])
+            self.assertEqual(range_angle78.detection_window[count], beam[3])
+            self.assertEqual(range_angle78.quality_factor[count], beam[4])
+            self.assertEqual(range_angle78.d_corr[count], beam[5])
+            self.assertEqual(range_angle78.travel_time[count], beam[6])
+            self.assertEqual(range_angle78.reflectivity[count], beam[7] / 10.0)
+            self.assertEqual(range_angle78.realtime_cleaning_information[count], beam[8])
+            self.assertEqual(range_angle78.spare[count], beam[9])
+            offset += 16
+
+    def test_seabed_image89(self):
+        beams = [(-1, 0, 3, 2), (1, 0x80, 2, 1), (1, 0, 0, 0)]
+        samples = [[-100, -200, -300], [-150, 25], []]
+        body = struct.pack("<fH2h3H", 30000.0, 120, -150, -250, 10, 60, len(beams))
+        body += b''.join([struct.pack("<bB2H", *beam) for beam in beams])
+        body += b''.join([struct.pack("<%dh" % len(beam_samples), *beam_samples) for beam_samples in samples])
+        data = self.header(0x59) + body + b'\x03\x00\x00'
+
+        seabed_image89 = km.KmSeabedImage89(data)
+        self.assertEqual(seabed_image89.sampling_frequency, 30000.0)
+        self.assertEqual(seabed_image89.BSN, -15.0)
+        self.assertEqual(seabed_image89.BSO, -25.0)
+        self.assertEqual(seabed_image89.number_beams, 3)
+        self.assertEqual(seabed_image89.snippets_nr, 5)
+
+        offset = 32
+        for count in range(3):
+            beam = struct.unpack("<bB2H", data[offset:offset + 6])
+            self.assertEqual(seabed_image89.sorting_direction[count], beam[0])
+            self.assertEqual(seabed_image89.detection_information[count], beam[1])
+            self.assertEqual(seabed_image89.number_samples[count], beam[2])
+            self.assertEqual(seabed_image89.center_sample[count], beam[3])
+            offset += 6
+
+        self.assertEqual(len(seabed_image89.snippets), 3)
+        for count in range(3):
+            raw_samples = struct.unpack("<%dh" % beams[count][2], data[offset:offset + 2 * beams[count][2]])
+            self.assertEqual(list(seabed_image89.snippets[count]), [raw / 10.0 for raw in raw_samples])
+            offset += 2 * beams[count][2]
+
+        # datagram with the length field (not remote)
+        local = struct.pack("<I", len(data) + 1) + struct.pack("<BBHIIHH", 2, 0x59, 2040, 20190302, 3600000, 7, 100)
+        seabed_image89 = km.KmSeabedImage89(local + body + b'\x03\x00\x00', remote=False)
+        self.assertEqual([list(snippet) for snippet in seabed_image89.snippets],
+                         [[-10.0, -20.0, -30.0], [-15.0, 2.5], []])
+
+        # no beams
+        data = self.header(0x59) + struct.pack("<fH2h3H", 30000.0, 120, -150, -250, 10, 60, 0) + b'\x03\x00\x00'
+        seabed_image89 = km.KmSeabedImage89(data)
+        self.assertEqual(seabed_image89.number_beams, 0)
+        self.assertEqual(seabed_image89.snippets_nr, 0)
+        self.assertEqual(seabed_image89.snippets, [])
+
+    def test_watercolumn(self):
+        data = self.header(0x6b) + struct.pack("<6HIhBbB3B", 1, 1, 1, 2, 2, 15000, 123456, -30, 1, -2, 0, 0, 0, 0)
+        data += struct.pack("<hHBB", -200, 3000, 1, 0)
+        data += struct.pack("<h3H2B", -6000, 3, 2, 50, 1, 2) + b'\x01\x02'
+        data += struct.pack("<h3H2B", 6000, 4, 3, 60, 1, 3) + b'\x03\x04\x05'
+        data += b'\x03\x00\x00'
+
+        wc = km.KmWatercolumn(data)
+        self.assertEqual(list(wc.sector_frequency), [30000.0])
+        self.assertEqual(list(wc.beam_pointing_angle), [-60.0, 60.0])
+        self.assertEqual(list(wc.beam_num_samples), [2, 3])
+        self.assertEqual(list(wc.beam_number), [2, 3])
+        self.assertEqual(wc.samples, [b'\x01\x02', b'\x03\x04\x05'])
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedFormatsKm))
+    return s
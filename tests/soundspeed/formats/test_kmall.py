@@ -0,0 +1,73 @@
+import unittest
+import struct
+
+from hyo2.soundspeed.formats import kmall
+
+
+class TestSoundSpeedFormatsKmall(unittest.TestCase):
+
+    @classmethod
+    def datagram(cls, dg_id, body, partition=None):
+        length = 20 + len(body) + 4
+        if partition is not None:
+            length += 4
+            body = struct.pack("<2H", *partition) + body
+        return struct.pack("<I4sBBHII", length, dg_id, 0, 1, 2040, 1551484800, 500000000) + body + \
+            struct.pack("<I", length)
+
+    @classmethod
+    def mrz_body(cls):
+        body = struct.pack("<2H8B", 12, 7, 1, 0, 1, 0, 0, 0, 1, 0)
+        ping_info = [144, 0, 1.0] + [0] * 7 + [0.0] * 11 + [0] * 6 + [0.0] * 3 + [0, 0, 0.0] + [1, 48] + \
+                    [0.0, 1500.5, 0.0, 2.0, 0.0, 0.0] + [0] * 4 + [43.0, -70.0, 0.0]
+        body += struct.pack("<2Hf6BH11f2h2BHI3f2Hf2H6f4B2df", *ping_info) + bytes(48)
+        body += struct.pack("<4H4f4H", 32, 3, 3, 120, 0.0, 0.0, 0.0, 0.0, 0, 0, 0, 0)
+        for idx, (detection_type, detection_method, z) in enumerate([(0, 1, 20.0), (0, 0, 99.0), (0, 2, 30.0)]):
+            body += struct.pack('<H8BH6f2H18f4H', idx, 0, detection_type, detection_method, *([0] * 6),
+                                *([0.0] * 6), 0, 0, *([0.0] * 14), z, 0.0, 0.0, 0.0, 0, 0, 0, 0)
+        return body
+
+    def test_mrz(self):
+        mrz = kmall.KmallMRZ(self.datagram(b'#MRZ', self.mrz_body(), partition=(1, 1)))
+        self.assertEqual(mrz.tss, 1500.5)
+        self.assertEqual(len(mrz.soundings), 3)
+        self.assertEqual(list(mrz.soundings['sounding_index']), [0, 1, 2])
+        # the sounding without a valid detection is skipped
+        self.assertAlmostEqual(mrz.mean_depth, 23.0)
+
+    def test_partitions(self):
+        datagram = self.datagram(b'#MRZ', self.mrz_body(), partition=(1, 1))
+        body = self.mrz_body()
+        partitions = [self.datagram(b'#MRZ', body[:100], partition=(3, 1)),
+                      self.datagram(b'#MRZ', body[100:300], partition=(3, 2)),
+                      self.datagram(b'#MRZ', body[300:], partition=(3, 3))]
+
+        collector = kmall.KmallPartitions()
+        self.assertIsNone(collector.add(partitions[0]))
+        self.assertIsNone(collector.add(partitions[2]))
+        self.assertEqual(collector.add(partitions[1]), datagram)
+
+        # incomplete datagram
+        self.assertIsNone(collector.add(partitions[0]))
+        self.assertIsNone(collector.add(partitions[0][:12] + struct.pack("<I", 1551484801) + partitions[0][16:]))
+        self.assertEqual(collector.dropped, 1)
+
+        # not partitioned
+        self.assertEqual(collector.add(datagram), datagram)
+
+    def test_svp(self):
+        body = struct.pack('<2H4BIdd', 68, 2, 0, 0, 0, 0, 1551484800, 43.0, -70.0)
+        body += struct.pack('<2fI2f', 1.5, 1500.25, 0, 10.0, 35.0) + struct.pack('<2fI2f', 10.0, 1490.5, 0, 8.0, 34.5)
+
+        svp = kmall.KmallSVP(self.datagram(b'#SVP', body))
+        self.assertEqual(svp.num_entries, 2)
+        self.assertEqual(list(svp.depth), [1.5, 10.0])
+        self.assertEqual(list(svp.speed), [1500.25, 1490.5])
+        self.assertEqual(list(svp.temp), [10.0, 8.0])
+        self.assertEqual(list(svp.sal), [35.0, 34.5])
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedFormatsKmall))
+    return s
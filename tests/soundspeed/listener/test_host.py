@@ -0,0 +1,88 @@
+import unittest
+import socket
+import time
+from threading import Event
+
+from hyo2.soundspeed.listener.abstract import AbstractListener
+from hyo2.soundspeed.listener.host import ListenerHost
+
+
+class Collector(AbstractListener):
+
+    def __init__(self):
+        super(Collector, self).__init__(port=0, ip="127.0.0.1")
+        self.received = list()
+        self.got_data = Event()
+
+    def parse(self):
+        if self.data == b'bad':
+            raise RuntimeError("unable to parse")
+        self.received.append(self.data)
+        self.got_data.set()
+
+
+class TestSoundSpeedListenerHost(unittest.TestCase):
+
+    def setUp(self):
+        self.host = ListenerHost()
+        self.sock_out = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def tearDown(self):
+        self.sock_out.close()
+        self.host.stop()
+
+    def send(self, listener, data):
+        listener.got_data.clear()
+        self.sock_out.sendto(data, ("127.0.0.1", listener.sock_in.getsockname()[1]))
+        self.assertTrue(listener.got_data.wait(2.0))
+
+    def test_listeners(self):
+        listeners = [Collector(), Collector()]
+        for listener in listeners:
+            self.assertTrue(self.host.add(listener))
+            self.assertTrue(self.host.is_listening(listener))
+        self.assertTrue(self.host.add(listeners[0]))  # already listening
+
+        self.send(listeners[0], b'first')
+        self.send(listeners[1], b'second')
+        self.sock_out.sendto(b'bad', ("127.0.0.1", listeners[0].sock_in.getsockname()[1]))  # not stopping the host
+        self.send(listeners[0], b'third')
+        self.assertEqual(listeners[0].received, [b'first', b'third'])
+        self.assertEqual(listeners[1].received, [b'second'])
+        self.assertEqual(listeners[1].sender[0], "127.0.0.1")
+
+        self.assertTrue(self.host.remove(listeners[1]))
+        self.assertFalse(self.host.is_listening(listeners[1]))
+        self.assertIsNone(listeners[1].data)
+        self.assertTrue(self.host.is_listening(listeners[0]))
+
+        # listening again
+        self.assertTrue(self.host.add(listeners[1]))
+        self.send(listeners[1], b'fourth')
+        self.assertEqual(listeners[1].received, [b'second', b'fourth'])
+
+    def test_stop(self):
+        listener = Collector()
+        self.assertTrue(self.host.add(listener))
+        self.host.stop()
+        self.assertFalse(self.host.is_running)
+        self.assertFalse(self.host.is_listening(listener))
+        self.assertTrue(self.host.remove(listener))
+
+        # restarting
+        self.assertTrue(self.host.add(listener))
+        self.send(listener, b'data')
+        self.assertEqual(listener.received, [b'data'])
+
+    def test_latency(self):
+        listener = Collector()
+        self.assertTrue(self.host.add(listener))
+        start = time.time()
+        self.send(listener, b'data')
+        self.assertLess(time.time() - start, 0.1)
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedListenerHost))
+    return s
@@ -0,0 +1,43 @@
+import unittest
+import struct
+
+from hyo2.soundspeed.formats import km, kmall
+from hyo2.soundspeed.listener.sis.lazy import LazyDatagram
+
+
+class TestSoundSpeedListenerLazy(unittest.TestCase):
+
+    def test_km(self):
+        data = struct.pack("<BBHIIHH", 2, 0x55, 2040, 20190302, 3600000, 7, 100)
+        data += struct.pack("<IIHH", 20190302, 3600, 2, 1)
+        data += struct.pack("<II", 150, 15001) + struct.pack("<II", 1000, 14905) + b'\x03\x00\x00'
+
+        svp = LazyDatagram(data, km.KmSvp, km.Km)
+        self.assertEqual(svp.id, 0x55)
+        self.assertEqual(svp.dg_time, km.Km.km_time(20190302, 3600000))
+        self.assertFalse(svp.is_decoded)
+
+        self.assertEqual(list(svp.depth), [1.5, 10.0])
+        self.assertTrue(svp.is_decoded)
+        self.assertIs(svp.speed, svp.decode().speed)
+        self.assertEqual(svp.acquisition_time, km.Km.km_time(20190302, 3600000))
+
+        with self.assertRaises(AttributeError):
+            _ = svp.missing
+
+    def test_kmall(self):
+        body = struct.pack('<2H4BIdd', 68, 0, 0, 0, 0, 0, 1551484800, 43.0, -70.0)
+        data = struct.pack("<I4sBBHII", 20 + len(body) + 4, b'#SVP', 0, 1, 2040, 1551484800, 0) + body + \
+            struct.pack("<I", 20 + len(body) + 4)
+
+        svp = LazyDatagram(data, kmall.KmallSVP, kmall.Kmall)
+        self.assertEqual(svp.id, b'#SVP')
+        self.assertFalse(svp.is_decoded)
+        self.assertEqual(svp.num_entries, 0)
+        self.assertTrue(svp.is_decoded)
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedListenerLazy))
+    return s
@@ -0,0 +1,60 @@
+import unittest
+import struct
+
+from hyo2.soundspeed.listener.stats import ListenerStats
+from hyo2.soundspeed.listener.sis.sis4 import Sis4
+
+
+class TestSoundSpeedListenerStats(unittest.TestCase):
+
+    def test_stats(self):
+        stats = ListenerStats(size=4, window=5.0)
+        for i in range(6):
+            stats.add(bytes(100), dg_id=0x50, parse_time=0.001 * (i + 1), rx_time=100.0 + i)
+        stats.add_dropped()
+        stats.add_unknown(0x99)
+
+        recent = stats.recent
+        self.assertEqual(len(recent), 4)
+        self.assertEqual([rx_time for rx_time, _, _ in recent], [102.0, 103.0, 104.0, 105.0])
+
+        snapshot = stats.snapshot(now=105.0)
+        self.assertEqual(snapshot['packets'], 6)
+        self.assertEqual(snapshot['bytes'], 600)
+        self.assertEqual(snapshot['ids'], {0x50: 6})
+        self.assertEqual(snapshot['unknown_ids'], {0x99: 1})
+        self.assertEqual(snapshot['dropped'], 1)
+        self.assertEqual(snapshot['last_rx_time'], 105.0)
+        # the buffer only covers the last 3 seconds
+        self.assertAlmostEqual(snapshot['packets_per_sec'], 4 / 3.0)
+        self.assertAlmostEqual(snapshot['bytes_per_sec'], 400 / 3.0)
+        self.assertAlmostEqual(snapshot['parse_ms_p50'], 4.5)
+
+        snapshot = stats.snapshot(now=108.0)
+        self.assertAlmostEqual(snapshot['packets_per_sec'], 3 / 5.0)
+
+        stats.reset()
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot['packets'], 0)
+        self.assertEqual(snapshot['packets_per_sec'], 0.0)
+        self.assertIsNone(snapshot['parse_ms_p50'])
+
+    def test_listener(self):
+        header = struct.pack("<BBHIIHH", 2, 0x50, 2040, 20190302, 3600000, 7, 100)
+        listener = Sis4(port=0, datagrams=[0x50])
+        listener.receive(data=header + bytes(24), sender=("127.0.0.1", 4001))
+        listener.receive(data=b'\x02\xfe' + bytes(20), sender=("127.0.0.1", 4001))
+        with self.assertRaises(IndexError):
+            listener.receive(data=b'', sender=("127.0.0.1", 4001))
+
+        self.assertEqual(listener.nav.id, 0x50)
+        snapshot = listener.stats.snapshot()
+        self.assertEqual(snapshot['packets'], 3)
+        self.assertEqual(snapshot['unknown_ids'], {0xfe: 1})
+        self.assertEqual(snapshot['dropped'], 1)
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedListenerStats))
+    return s
@@ -0,0 +1,67 @@
+import unittest
+import logging
+import os
+import sqlite3
+
+from hyo2.soundspeed.logger.sqlitehandler import SQLiteHandler
+
+
+class TestSoundSpeedLoggingSqliteHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.db = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'handler.db')
+        self.logger = logging.getLogger('test_sqlitehandler')
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+
+    def tearDown(self):
+        if os.path.exists(self.db):
+            os.remove(self.db)
+
+    def count_logs(self):
+        conn = sqlite3.connect(self.db)
+        ret = conn.execute("SELECT COUNT(*) FROM log").fetchone()[0]
+        conn.close()
+        return ret
+
+    def test_flush_and_close(self):
+        handler = SQLiteHandler(db=self.db, flush_interval=10.0)
+        self.logger.addHandler(handler)
+        for i in range(1234):
+            self.logger.debug("message #%d" % i)
+        handler.flush()
+        self.assertEqual(self.count_logs(), 1234)
+
+        self.logger.info("last message")
+        self.logger.removeHandler(handler)
+        handler.close()
+        self.assertEqual(self.count_logs(), 1235)
+
+    def test_max_logs(self):
+        handler = SQLiteHandler(db=self.db, max_logs=100, batch_size=10)
+        self.logger.addHandler(handler)
+        for i in range(1000):
+            self.logger.debug("message #%d" % i)
+        self.logger.removeHandler(handler)
+        handler.close()
+        self.assertEqual(self.count_logs(), 100)
+
+    def test_drop_oldest(self):
+        handler = SQLiteHandler(db=self.db, max_queue_size=10, batch_size=1000, flush_interval=10.0)
+        self.logger.addHandler(handler)
+        for i in range(25):
+            self.logger.debug("message #%d" % i)
+        self.logger.removeHandler(handler)
+        handler.close()
+        self.assertEqual(handler.dropped, 15)
+
+        conn = sqlite3.connect(self.db)
+        messages = [row[0] for row in conn.execute("SELECT Message FROM log ORDER BY rowid").fetchall()]
+        conn.close()
+        self.assertEqual(messages, ["message #%d" % i for i in range(15, 25)])
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedLoggingSqliteHandler))
+    return s
@@ -0,0 +1,53 @@
+import unittest
+from datetime import datetime
+import numpy as np
+
+from hyo2.soundspeed.profile.profile import Profile
+from hyo2.soundspeed.profile.ray_tracing.tracedprofile import TracedProfile
+from hyo2.soundspeed.profile.ray_tracing.diff_tracedprofiles import DiffTracedProfiles
+
+
+class TestSoundSpeedDiffTracedProfiles(unittest.TestCase):
+
+    @classmethod
+    def make_traced_profile(cls, max_depth, bias):
+        ssp = Profile()
+        depths = np.arange(0.0, max_depth, 0.5)
+        ssp.init_proc(depths.size)
+        ssp.proc.depth[:] = depths
+        ssp.proc.speed[:] = 1450.0 + bias + depths
+        ssp.meta.utc_time = datetime.utcnow()
+        return TracedProfile(ssp=ssp, avg_depth=10000.0, half_swath=20.0)
+
+    def setUp(self):
+        self.old_tp = self.make_traced_profile(max_depth=100.0, bias=0.0)
+        self.new_tp = self.make_traced_profile(max_depth=80.0, bias=2.0)
+
+    def tearDown(self):
+        pass
+
+    def test_same_profile(self):
+        diff = DiffTracedProfiles(old_tp=self.old_tp, new_tp=self.old_tp)
+        diff.calc_diff()
+        self.assertEqual(len(diff.new_rays), 21)
+        for new_ray, old_ray in zip(diff.new_rays, diff.old_rays):
+            self.assertTrue(np.array_equal(new_ray, old_ray))
+            self.assertEqual(new_ray[0][0], 0.0)
+
+    def test_common_area(self):
+        diff = DiffTracedProfiles(old_tp=self.old_tp, new_tp=self.new_tp)
+        diff.calc_diff()
+        self.assertEqual(len(diff.new_rays), 21)
+        self.assertEqual(len(diff.max_tolerances), 21)
+        for ang, (new_ray, old_ray) in enumerate(zip(diff.new_rays, diff.old_rays)):
+            # both rays stop at the minimum common time (within a sample)
+            max_step = max(np.diff(new_ray[0]).max(), np.diff(old_ray[0]).max())
+            self.assertLessEqual(abs(new_ray[0][-1] - old_ray[0][-1]), max_step)
+            self.assertAlmostEqual(diff.max_tolerances[ang],
+                                   new_ray[2][-1] * diff.variable_allowable_error + diff.fixed_allowable_error)
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedDiffTracedProfiles))
+    return s
@@ -0,0 +1,64 @@
+import unittest
+import numpy as np
+
+from hyo2.soundspeed.profile.ray_tracing.ray_tracing import RayTracing
+
+
+class TestSoundSpeedRayTracing(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(42)
+        self.depths = np.insert(np.cumsum(rng.uniform(0.5, 2.0, 500)), 0, 1.0)
+        self.speeds = 1500.0 + np.cumsum(rng.normal(0.0, 0.3, len(self.depths)))
+        self.speeds[10:20] = self.speeds[10]  # a few constant-speed layers
+        self.angles = np.deg2rad([0.0, 5.0, 30.0, 45.0, 60.0, 75.0])
+
+    def tearDown(self):
+        pass
+
+    def test_layer_parameters_parity_with_slow(self):
+        for angle in self.angles:
+            slow = RayTracing.get_svp_layer_parameters_slow(angle, self.depths, self.speeds)
+            fast = RayTracing.get_svp_layer_parameters(angle, self.depths, self.speeds)
+            for s, f in zip(slow, fast):
+                self.assertEqual(s.shape, f.shape)
+                self.assertTrue(np.allclose(s, f, rtol=1e-9, atol=1e-9, equal_nan=True))
+
+    def test_layer_parameters_multiple_angles(self):
+        gradient, gamma, radius, total_time, total_range = \
+            RayTracing.get_svp_layer_parameters(self.angles, self.depths, self.speeds)
+        self.assertEqual(gradient.shape, (len(self.depths) - 1,))
+        for table in (gamma, radius, total_time, total_range):
+            self.assertEqual(table.shape, (len(self.angles), len(self.depths)))
+
+        for i, angle in enumerate(self.angles):
+            single = RayTracing.get_svp_layer_parameters(angle, self.depths, self.speeds)
+            self.assertTrue(np.allclose(single[3], total_time[i]))
+            self.assertTrue(np.allclose(single[4], total_range[i]))
+
+    def test_ray_trace_parity_with_slow(self):
+        for angle in self.angles:
+            params = RayTracing.get_svp_layer_parameters(angle, self.depths, self.speeds)
+            travel_times = np.arange(0.0, params[-2][-1] * 1.2, 0.005)
+            for b_project in (False, True):
+                slow = RayTracing.ray_trace_slow(travel_times, self.depths, self.speeds, params, b_project=b_project)
+                fast = RayTracing.ray_trace(travel_times, self.depths, self.speeds, params, b_project=b_project)
+                self.assertEqual(slow.shape, fast.shape)
+                self.assertTrue(np.allclose(slow, fast, rtol=1e-9, atol=1e-7))
+
+    def test_ray_trace_many(self):
+        params = RayTracing.get_svp_layer_parameters(self.angles, self.depths, self.speeds)
+        travel_times = np.arange(0.005, params[-2][0, -1], 0.005)
+        rays = RayTracing.ray_trace_many(travel_times, self.angles, self.depths, self.speeds)
+        self.assertEqual(rays.shape, (len(self.angles), len(travel_times), 2))
+
+        for i in range(len(self.angles)):
+            single = tuple([params[0]] + [table[i] for table in params[1:]])
+            ray = RayTracing.ray_trace(travel_times, self.depths, self.speeds, single)
+            self.assertTrue(np.allclose(rays[i], ray))
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedRayTracing))
+    return s
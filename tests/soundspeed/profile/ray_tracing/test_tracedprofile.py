@@ -0,0 +1,51 @@
+import unittest
+from datetime import datetime
+import numpy as np
+
+from hyo2.soundspeed.profile.profile import Profile
+from hyo2.soundspeed.profile.ray_tracing.tracedprofile import TracedProfile
+
+
+class TestSoundSpeedTracedProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.ssp = Profile()
+        depths = np.arange(0.0, 100.0, 0.5)
+        self.ssp.init_proc(depths.size)
+        self.ssp.proc.depth[:] = depths
+        self.ssp.proc.speed[:] = np.arange(1450.0, 1550.0, 0.5)
+        self.ssp.meta.latitude = 43.13555
+        self.ssp.meta.longitude = -70.9395
+        self.ssp.meta.utc_time = datetime.utcnow()
+
+    def tearDown(self):
+        pass
+
+    def test_rays_and_harmonic_means(self):
+        tp = TracedProfile(ssp=self.ssp, avg_depth=1000.0, half_swath=70.0)
+        self.assertEqual(len(tp.rays), 71)
+        self.assertEqual(len(tp.harmonic_means), 71)
+        self.assertEqual(tp.rays.shape, (71, 3, 25001))
+
+        # the nadir ray has no across-track distance, and the harmonic mean is within the profile speeds
+        nadir = tp.rays[0]
+        valid = nadir[0] != -1
+        self.assertTrue(np.allclose(nadir[1][valid], 0.0, atol=1e-6))
+        self.assertTrue(1450.0 < tp.harmonic_means[0] < 1550.0)
+
+        # larger angles take longer to reach the same depth
+        last = np.flatnonzero(valid)[-1]
+        self.assertTrue(np.all(np.diff(tp.rays[:, 0, last]) > 0.0))
+
+    def test_tss(self):
+        tp = TracedProfile(ssp=self.ssp, avg_depth=50.0, half_swath=10.0, tss_depth=5.0, tss_value=1455.0)
+        self.assertEqual(tp.data[0][0], 5.0)
+        self.assertEqual(tp.data[1][0], 1455.0)
+        self.assertGreater(tp.data[0][-1], 50.0)
+        self.assertEqual(len(tp.rays), 11)
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedTracedProfile))
+    return s
@@ -102,6 +102,16 @@ class TestSoundSpeedOceanography(unittest.TestCase):
 
         self.assertAlmostEqual(t0_calc, t0_ck, places=1)
 
+    def test_in_situ_temp_pressure_array(self):
+        # the pressure as returned by d2p
+        p = np.array([50.0])
+
+        t_calc = Oc.in_situ_temp(s=35.0, t=10.0, p=p, pr=2000)
+
+        self.assertAlmostEqual(float(t_calc), Oc.in_situ_temp(s=35.0, t=10.0, p=50.0, pr=2000), places=6)
+        self.assertAlmostEqual(float(Oc.pot_temp(s=35.0, t=t_calc, p=50.0, pr=2000)), 10.0, places=2)
+        np.testing.assert_array_equal(p, [50.0])
+
     def test_cr2s(self):
         cr_ck = 1.1
         t_ck = 40.0
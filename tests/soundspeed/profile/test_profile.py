@@ -0,0 +1,168 @@
+import unittest
+import numpy as np
+
+from hyo2.soundspeed.profile.dicts import Dicts
+from hyo2.soundspeed.profile.profile import Profile
+
+
+def loop_statistical_filter(speed, depth):
+    """Reference (per-sample loop) implementation of the statistical filter, returning the filtered samples"""
+    nr_samples = len(speed)
+    sigma = speed * 0.0
+    speed_mean = speed * 0.0
+    sigma_min_th = 0.2
+
+    for i in range(2, nr_samples - 2):
+        speed_sum = 0
+        speed_sum_sq = 0
+        for k in range(-2, 3):
+            if k == 0:
+                continue
+            speed_sum += speed[i + k]
+            speed_sum_sq += speed[i + k] * speed[i + k]
+        variance = ((4 * speed_sum_sq) - speed_sum * speed_sum) / (4 * 3)
+        speed_mean[i] = speed_sum / 4
+        if variance < 0:
+            variance = 0
+        sigma[i] = np.sqrt(variance)
+        if sigma[i] < sigma_min_th:
+            sigma[i] = sigma_min_th
+
+    c_end = 1.3
+    ends_i = [0, 1, nr_samples - 2, nr_samples - 1]
+    index = [(1, 2, 3), (0, 2, 3), (nr_samples - 4, nr_samples - 3, nr_samples - 1),
+             (nr_samples - 4, nr_samples - 3, nr_samples - 2)]
+    for k in range(4):
+        speed_sum = 0
+        speed_sum_sq = 0
+        i = ends_i[k]
+        for j in range(3):
+            speed_sum += speed[index[k][j]]
+            speed_sum_sq += speed[index[k][j]] * speed[index[k][j]]
+        variance = ((3 * speed_sum_sq) - speed_sum * speed_sum) / (3 * 2)
+        speed_mean[i] = speed_sum / 3
+        if variance < 0:
+            variance = 0
+        sigma[i] = np.sqrt(variance)
+        if sigma[i] < sigma_min_th:
+            sigma[i] = sigma_min_th
+        sigma[i] *= c_end
+
+    factor = 1.3
+    stat_filtered = np.zeros(nr_samples, dtype=bool)
+    for i in range(nr_samples):
+        if depth[i] > 33.0:
+            factor = 1.0
+        if np.absolute(speed[i] - speed_mean[i]) > factor * 2 * sigma[i]:
+            stat_filtered[i] = True
+    return stat_filtered
+
+
+class TestSoundSpeedProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.RandomState(7)
+
+    def tearDown(self):
+        pass
+
+    def make_profile(self, nr_samples):
+        ssp = Profile()
+        ssp.init_proc(nr_samples)
+        ssp.proc.depth[:] = np.cumsum(self.rng.uniform(0.1, 1.0, nr_samples))
+        ssp.proc.speed[:] = 1480.0 + np.cumsum(self.rng.normal(0.0, 0.2, nr_samples))
+        fliers = self.rng.randint(0, nr_samples, nr_samples // 20)
+        ssp.proc.speed[fliers] += self.rng.normal(0.0, 5.0, len(fliers))
+        ssp.proc.depth[nr_samples // 2:nr_samples // 2 + 10] -= 20.0  # depth going back above the threshold
+        ssp.proc.flag[self.rng.randint(0, nr_samples, nr_samples // 50)] = Dicts.flags['user']
+        return ssp
+
+    def test_statistical_filter_regression(self):
+        for nr_samples in (4, 5, 6, 200, 5000):
+            ssp = self.make_profile(nr_samples)
+            valid = ssp.proc_valid
+            expected = loop_statistical_filter(ssp.proc.speed[valid], ssp.proc.depth[valid])
+
+            ssp.statistical_filter()
+            filtered = ssp.proc.flag[valid] == Dicts.flags['filtered']
+            self.assertTrue(np.array_equal(filtered, expected))
+            self.assertFalse(np.any(ssp.proc.flag[~valid] == Dicts.flags['filtered']))
+
+    def test_cosine_smooth(self):
+        ssp = Profile()
+        ssp.init_proc(1001)
+        ssp.proc.depth[:] = np.linspace(0.0, 100.0, 1001)
+        ssp.proc.speed[:] = 1480.0 + 0.1 * ssp.proc.depth
+        ssp.proc.flag[500] = Dicts.flags['user']
+
+        ssp.cosine_smooth()
+        smoothed = ssp.proc.source == Dicts.sources['smoothing']
+        self.assertEqual(np.count_nonzero(smoothed), 101)  # 1-meter bins
+        self.assertEqual(ssp.proc.num_samples, 1001 + 101)
+        self.assertTrue(np.all(ssp.proc.flag[~smoothed] == Dicts.flags['smoothed']))
+        self.assertTrue(np.all(ssp.proc.flag[smoothed] == Dicts.flags['valid']))
+
+        # the bins are sorted and placed before the first deeper sample
+        self.assertTrue(np.all(np.diff(ssp.proc.depth) >= 0.0))
+        self.assertTrue(np.allclose(ssp.proc.depth[smoothed], np.arange(0.0, 101.0)))
+        # a linear profile is preserved away from the ends
+        self.assertTrue(np.allclose(ssp.proc.speed[smoothed][5:-5], 1480.0 + 0.1 * np.arange(5.0, 96.0)))
+
+    def make_sis_profile(self, depths, speeds):
+        ssp = Profile()
+        ssp.init_sis(len(depths))
+        ssp.sis.depth[:] = depths
+        ssp.sis.speed[:] = speeds
+        ssp.sis.flag[:] = Dicts.flags['valid']
+        return ssp
+
+    def test_thin_tolerance(self):
+        depths = np.cumsum(self.rng.uniform(0.1, 1.0, 3000))
+        speeds = 1480.0 + np.cumsum(self.rng.normal(0.0, 0.2, 3000))
+        tolerance = 0.1
+        ssp = self.make_sis_profile(depths, speeds)
+        self.assertTrue(ssp.thin(tolerance=tolerance))
+
+        thinned = ssp.sis_thinned
+        self.assertTrue(thinned[0] and thinned[-1])
+        self.assertLess(np.count_nonzero(thinned), 3000)
+        # the removed samples are within tolerance from the thinned profile
+        interp = np.interp(depths, depths[thinned], speeds[thinned])
+        self.assertLessEqual(np.absolute(interp - speeds).max(), tolerance + 1e-9)
+
+    def test_thin_long_profile(self):
+        # a steep convex profile mostly splits close to the end of each segment
+        depths = np.arange(0.0, 5000.0)
+        ssp = self.make_sis_profile(depths, 1480.0 + np.exp(depths / 50.0))
+        self.assertTrue(ssp.thin(tolerance=1e-6))
+        self.assertEqual(np.count_nonzero(ssp.sis_thinned), 5000)
+
+    def test_thin_max_points(self):
+        depths = np.cumsum(self.rng.uniform(0.1, 1.0, 3000))
+        speeds = 1480.0 + np.cumsum(self.rng.normal(0.0, 0.2, 3000))
+
+        # without a binding budget, the ranked selection matches the tolerance-based one
+        ssp_tol = self.make_sis_profile(depths, speeds)
+        ssp_tol.thin(tolerance=0.1)
+        ssp_rank = self.make_sis_profile(depths, speeds)
+        ssp_rank.thin(tolerance=0.1, max_points=3000)
+        self.assertTrue(np.array_equal(ssp_tol.sis_thinned, ssp_rank.sis_thinned))
+
+        # with a budget, the number of samples is the budget and the error decreases with it
+        last_error = None
+        for max_points in (570, 1000, 2000):
+            ssp = self.make_sis_profile(depths, speeds)
+            ssp.thin(tolerance=0.0, max_points=max_points)
+            thinned = ssp.sis_thinned
+            self.assertEqual(np.count_nonzero(thinned), max_points)
+            self.assertTrue(thinned[0] and thinned[-1])
+            error = np.absolute(np.interp(depths, depths[thinned], speeds[thinned]) - speeds).max()
+            if last_error is not None:
+                self.assertLessEqual(error, last_error)
+            last_error = error
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSoundSpeedProfile))
+    return s